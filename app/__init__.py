@@ -2,6 +2,8 @@ from flask import Flask
 from flask_bootstrap import Bootstrap
 from flask_sqlalchemy import SQLAlchemy
 from config import config
+from .cache import response_cache
+from .metrics import metrics
 
 bootstrap = Bootstrap()
 db = SQLAlchemy()
@@ -14,6 +16,8 @@ def create_app(config_name):
 
     bootstrap.init_app(app)
     db.init_app(app)
+    metrics.init_app(app)
+    response_cache.init_app(app)
 
     if app.config["SSL_REDIRECT"]:
         from flask_sslify import SSLify
@@ -2,4 +2,14 @@ from flask import Blueprint
 
 api = Blueprint("api", __name__)
 
-from . import facilities, waste_units, storage_tanks
+from . import (
+    errors,
+    facilities,
+    waste_units,
+    storage_tanks,
+    wells,
+    tiles,
+    timeseries,
+    sample_results,
+    search,
+)
@@ -0,0 +1,283 @@
+"""
+Batch create, update and delete for API collections
+"""
+
+import json
+from collections import Counter
+from flask import current_app, jsonify, request
+from .. import db, ingest
+from ..cache import response_cache
+from ..errors import ValidationError
+from ..models import Facility
+from ..pagination import parse_date
+from .errors import bad_request, conflict
+
+
+def read_items():
+    """
+    The items of a batch request: a JSON array, or with a Content-Type of
+    application/x-ndjson, one JSON value per line.
+    """
+    if request.mimetype == "application/x-ndjson":
+        items = []
+        lines = request.get_data(as_text=True).splitlines()
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise ValidationError(f"line {number} is not valid JSON")
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            raise ValidationError("expected a JSON array or NDJSON")
+
+    limit = current_app.config["ENVIROBASE_BATCH_MAX_ITEMS"]
+    if not items:
+        raise ValidationError("the batch is empty")
+    if len(items) > limit:
+        raise ValidationError(f"a batch may have at most {limit} items")
+    return items
+
+
+def coerce(column, value):
+    """
+    `value` as it is stored in `column`.
+
+    Raises ValueError with a message naming the column when `value` does
+    not fit it.
+    """
+    name, type_ = column.name, column.type
+    if value is None:
+        if not column.nullable:
+            raise ValueError(f"{name} may not be null")
+        return None
+    if isinstance(type_, db.Integer):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"{name} must be an integer")
+    elif isinstance(type_, db.Float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{name} must be a number")
+        value = float(value)
+    elif isinstance(type_, db.Date):
+        try:
+            value = parse_date(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a YYYY-MM-DD date")
+    elif isinstance(type_, db.String):
+        if not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+        if type_.length is not None and len(value) > type_.length:
+            raise ValueError(f"{name} must be at most {type_.length} characters")
+    return value
+
+
+class BatchResource(object):
+    """
+    Batch operations on the rows of one model.
+
+    Every item of a batch is validated before anything is written, and
+    the whole batch is then applied in one transaction with set-based
+    statements, see `ingest.merge`, `ingest.update` and `ingest.delete`.
+    The response lists the status of every item by its index.
+
+    Parameters
+    ----------
+    model : db.Model
+    fields : sequence of str
+        The columns items may set.
+    key : sequence of str, optional
+        The unique constraint created items are matched on. Items that
+        match a stored row update it. Without a key, rows cannot be
+        created in batches.
+    """
+
+    def __init__(self, model, fields, key=None):
+        self.model = model
+        self.table = model.__table__
+        (self.primary_key,) = model.__mapper__.primary_key
+        self.fields = list(fields)
+        self.key = list(key) if key else None
+
+    def _row(self, item, names, required=()):
+        if not isinstance(item, dict):
+            return None, ["item must be an object"]
+        row, errors = {}, []
+        for name in item:
+            if name not in names:
+                errors.append(f"unknown field {name!r}")
+        for name in required:
+            if item.get(name) is None:
+                errors.append(f"{name} is required")
+        for name in names:
+            if name in item and not (name in required and item[name] is None):
+                try:
+                    row[name] = coerce(self.table.c[name], item.get(name))
+                except ValueError as e:
+                    errors.append(str(e))
+        return row, errors
+
+    def _check_facilities(self, rows, errors):
+        if "facility_id" not in self.fields:
+            return
+        ids = {row.get("facility_id") for row in rows if row} - {None}
+        known = {
+            facility_id
+            for (facility_id,) in db.session.query(Facility.facility_id).filter(
+                Facility.facility_id.in_(ids)
+            )
+        }
+        for index, row in enumerate(rows):
+            if row and row.get("facility_id") not in known | {None}:
+                errors[index].append(f"facility {row['facility_id']} does not exist")
+
+    def _check_identity(self, rows, errors):
+        mapper = self.model.__mapper__
+        discriminator = mapper.polymorphic_on
+        if discriminator is None or discriminator.name not in self.fields:
+            return
+        identities = sorted(mapper.polymorphic_map)
+        for index, row in enumerate(rows):
+            if row and discriminator.name in row:
+                if row[discriminator.name] not in identities:
+                    errors[index].append(
+                        f"{discriminator.name} must be one of {', '.join(identities)}"
+                    )
+
+    def _check_duplicates(self, rows, errors, names):
+        seen = {}
+        for index, row in enumerate(rows):
+            if not row or errors[index]:
+                continue
+            value = tuple(row.get(name) for name in names)
+            if value in seen:
+                errors[index].append(f"same {', '.join(names)} as item {seen[value]}")
+            else:
+                seen[value] = index
+
+    def _stored(self, keys):
+        """The primary keys among `keys` that exist as rows of the model."""
+        query = self.model.query.with_entities(self.primary_key).filter(
+            self.primary_key.in_(keys)
+        )
+        return {key for (key,) in query}
+
+    def _invalid(self, items, errors):
+        invalid = [
+            {"index": index, "status": "invalid", "errors": messages}
+            for index, messages in enumerate(errors)
+            if messages
+        ]
+        return bad_request(
+            f"{len(invalid)} of {len(items)} items are invalid; nothing was changed",
+            items=invalid,
+        )
+
+    def _respond(self, ids, statuses):
+        name = self.primary_key.name
+        items = [
+            {"index": index, "status": status, name: id}
+            for index, (id, status) in enumerate(zip(ids, statuses))
+        ]
+        counts = Counter(statuses)
+        if set(counts) - {"unchanged", "not_found"}:
+            response_cache.invalidate(self.table.name)
+        return jsonify({"items": items, "counts": counts})
+
+    def _apply(self, operation, *args):
+        try:
+            return operation(self.table, *args), None
+        except db.engine.dialect.dbapi.IntegrityError as e:
+            # the database's message quotes the SQL and the conflicting
+            # values, so it is only logged
+            current_app.logger.warning(
+                "batch on %s failed: %s", self.table.name, str(e).strip()
+            )
+            diag = getattr(e, "diag", None)
+            constraint = getattr(diag, "constraint_name", None)
+            if constraint:
+                message = f"the batch violates {constraint}; nothing was changed"
+            else:
+                message = "the batch conflicts with stored rows; nothing was changed"
+            return None, conflict(message)
+
+    def create(self):
+        """
+        Insert new rows and update the rows matching an item's key.
+
+        Fields left out of an item are stored as null, as with a single
+        POST, so items should be full representations.
+        """
+        items = read_items()
+        required = list(self.key)
+        for column in self.table.columns:
+            if column.name in self.fields and not column.nullable:
+                if column.name not in required:
+                    required.append(column.name)
+
+        rows, errors = zip(*[self._row(item, self.fields, required) for item in items])
+        rows, errors = list(rows), list(errors)
+        self._check_facilities(rows, errors)
+        self._check_identity(rows, errors)
+        self._check_duplicates(rows, errors, self.key)
+        if any(errors):
+            return self._invalid(items, errors)
+
+        columns = [self.table.c[name] for name in self.fields]
+        report, error = self._apply(ingest.merge, rows, self.key, columns)
+        if error is not None:
+            return error
+        return self._respond(report["id"].tolist(), report["status"].tolist())
+
+    def update(self):
+        """Change the given fields of the rows identified by primary key."""
+        items = read_items()
+        name = self.primary_key.name
+        rows, errors = zip(
+            *[self._row(item, [name] + self.fields, [name]) for item in items]
+        )
+        rows, errors = list(rows), list(errors)
+        self._check_facilities(rows, errors)
+        self._check_identity(rows, errors)
+        self._check_duplicates(rows, errors, [name])
+        stored = self._stored([row[name] for row in rows if row and name in row])
+        for index, row in enumerate(rows):
+            if row and name in row and row[name] not in stored:
+                errors[index].append(f"{name} {row[name]} does not exist")
+        if any(errors):
+            return self._invalid(items, errors)
+
+        statuses, error = self._apply(ingest.update, rows)
+        if error is not None:
+            return error
+        return self._respond([row[name] for row in rows], statuses.tolist())
+
+    def delete(self):
+        """Delete rows by primary key, given as numbers or as objects."""
+        items = read_items()
+        name = self.primary_key.name
+        keys, errors = [], []
+        for item in items:
+            key = item.get(name) if isinstance(item, dict) else item
+            if isinstance(key, bool) or not isinstance(key, int):
+                keys.append(None)
+                errors.append([f"{name} must be an integer"])
+            else:
+                keys.append(key)
+                errors.append([])
+        self._check_duplicates([{name: key} for key in keys], errors, [name])
+        if any(errors):
+            return self._invalid(items, errors)
+
+        # only rows of the model itself, not of other subclasses sharing
+        # its table, may be deleted
+        stored = self._stored(keys)
+        deleted = []
+        if stored:
+            deleted, error = self._apply(ingest.delete, sorted(stored))
+            if error is not None:
+                return error
+        deleted = set(deleted)
+        statuses = ["deleted" if key in deleted else "not_found" for key in keys]
+        return self._respond(keys, statuses)
@@ -0,0 +1,30 @@
+"""
+Error responses for the API
+"""
+
+from flask import jsonify
+from . import api
+from ..errors import ValidationError
+
+
+def bad_request(message, **members):
+    response = jsonify({"error": "bad request", "message": message, **members})
+    response.status_code = 400
+    return response
+
+
+def conflict(message):
+    response = jsonify({"error": "conflict", "message": message})
+    response.status_code = 409
+    return response
+
+
+def not_implemented(message):
+    response = jsonify({"error": "not implemented", "message": message})
+    response.status_code = 501
+    return response
+
+
+@api.errorhandler(ValidationError)
+def validation_error(e):
+    return bad_request(e.args[0])
@@ -5,79 +5,87 @@ API for Facilities
 from datetime import datetime
 from flask import jsonify, request, current_app, url_for
 from . import api
+from .batch import BatchResource
 from .. import db
-from ..models import Facility
+from ..cache import response_cache
+from ..models import Facility, SampleResult
+from ..pagination import parse_args
+from ..search import match
+from .geojson import feature_collection
+
+
+def _feature(facility):
+    return {
+        "type": "Feature",
+        "properties": {
+            "facility_id": facility.facility_id,
+            "name": facility.name,
+            "address": facility.address,
+            "city": facility.city,
+            "state": facility.state,
+            "zipcode": facility.zipcode,
+        },
+        "geometry": {
+            "type": "Point",
+            "coordinates": [facility.longitude, facility.latitude],
+        },
+    }
+
+
+_properties = [
+    ("facility_id", Facility.facility_id),
+    ("name", Facility.name),
+    ("address", Facility.address),
+    ("city", Facility.city),
+    ("state", Facility.state),
+    ("zipcode", Facility.zipcode),
+]
 
 
 @api.route("/facilities/", methods=["GET"])
+@response_cache.cached("facility")
 def get_facilities():
-    facilities = Facility.query.all()
-    data = [
-        {
-            "type": "Feature",
-            "properties": {
-                "facility_id": facility.facility_id,
-                "name": facility.name,
-                "address": facility.address,
-                "city": facility.city,
-                "state": facility.state,
-                "zipcode": facility.zipcode,
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": [facility.longitude, facility.latitude],
-            },
-        }
-        for facility in facilities
-    ]
-    return jsonify({"type": "FeatureCollection", "features": data})
+    return feature_collection(
+        Facility.query,
+        Facility.facility_id,
+        _feature,
+        Facility,
+        geometry=Facility.geometry,
+        properties=_properties,
+    )
 
 
 @api.route("/facilities/<int:facility_id>", methods=["GET"])
+@response_cache.cached("facility")
 def get_facility(facility_id):
     facility = Facility.query.get_or_404(facility_id)
-    data = [
-        {
-            "type": "Feature",
-            "properties": {
-                "facility_id": faciltiy.facility_id,
-                "name": facility.name,
-                "address": facility.address,
-                "city": facility.city,
-                "state": facility.state,
-                "zipcode": facility.zipcode,
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": [facility.longitude, facility.latitude],
-            },
-        }
-    ]
-    return jsonify({"type": "FeatureCollection", "features": data})
+    return jsonify({"type": "FeatureCollection", "features": [_feature(facility)]})
 
 
 @api.route("/facilities/<name>", methods=["GET"])
+@response_cache.cached("facility")
 def get_facility_name(name):
-    facilites = Facility.query.filter(Facility.name.ilike("%" + name + "%")).all()
-    data = [
-        {
-            "type": "Feature",
-            "properties": {
-                "facility_id": facility.facility_id,
-                "name": facility.name,
-                "address": facility.address,
-                "city": facility.city,
-                "state": facility.state,
-                "zipcode": facility.zipcode,
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": [facility.longitude, facility.latitude],
-            },
-        }
-        for facility in facilities
-    ]
-    return jsonify({"type": "FeatureCollection", "features": data})
+    return feature_collection(
+        Facility.query.filter(match("facilities", name)),
+        Facility.facility_id,
+        _feature,
+        Facility,
+        geometry=Facility.geometry,
+        properties=_properties,
+    )
+
+
+@api.route("/facilities/<int:facility_id>/summary", methods=["GET"])
+def get_facility_summary(facility_id):
+    Facility.query.get_or_404(facility_id)
+    df = SampleResult.summary(
+        facility=facility_id,
+        wells=parse_args("sample_id", int),
+        params=request.args.getlist("param_cd"),
+    )
+    df["last_sample_date"] = df["last_sample_date"].dt.strftime("%Y-%m-%d")
+    df = df.astype(object).where(df.notna(), None)
+    return jsonify({"summary": df.to_dict(orient="records")})
 
 
 @api.route("/facilities/", methods=["POST"])
@@ -85,6 +93,7 @@ def new_facility():
     facility = Facility.from_json(request.json)
     db.session.add(facility)
     db.session.commit()
+    response_cache.invalidate(Facility.__tablename__)
     return (
         jsonify(facility.to_json()),
         201,
@@ -105,6 +114,7 @@ def edit_facility(facility_id):
     facility.updated_on = datetime.utcnow()
     db.session.add(facility)
     db.session.commit()
+    response_cache.invalidate(Facility.__tablename__)
     return jsonify(facility.to_json())
 
 
@@ -113,4 +123,27 @@ def delete_facility(facility_id):
     facility = Facility.query.get_or_404(facility_id)
     db.session.delete(facility)
     db.session.commit()
+    response_cache.invalidate(Facility.__tablename__)
     return {}
+
+
+_batch = BatchResource(
+    Facility,
+    ["name", "type", "address", "city", "state", "zipcode", "longitude", "latitude"],
+    key=["name"],
+)
+
+
+@api.route("/facilities/batch", methods=["POST"])
+def new_facilities():
+    return _batch.create()
+
+
+@api.route("/facilities/batch", methods=["PATCH"])
+def edit_facilities():
+    return _batch.update()
+
+
+@api.route("/facilities/batch", methods=["DELETE"])
+def delete_facilities():
+    return _batch.delete()
@@ -0,0 +1,181 @@
+"""
+GeoJSON FeatureCollection responses for the API
+"""
+
+import json
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from .. import db
+from ..pagination import filter_query, paginate
+from ..spatial import spatial_filter
+
+
+def _dumps(obj):
+    return json.dumps(obj, default=str)
+
+
+def _stream(features, members):
+    """Write pre-serialised features into a FeatureCollection, in batches."""
+    batch_size = current_app.config["ENVIROBASE_YIELD_PER"]
+
+    def generate():
+        yield '{"type": "FeatureCollection", '
+        for name, value in members.items():
+            yield f"{_dumps(name)}: {_dumps(value)}, "
+        yield '"features": ['
+        batch = []
+        separator = ""
+        for feature in features:
+            batch.append(feature)
+            if len(batch) == batch_size:
+                yield separator + ",".join(batch)
+                separator = ","
+                batch = []
+        if batch:
+            yield separator + ",".join(batch)
+        yield "]}"
+
+    return Response(stream_with_context(generate()), mimetype="application/geo+json")
+
+
+def stream_feature_collection(rows, to_feature, **members):
+    """
+    Stream a FeatureCollection of `rows` as a chunked response.
+
+    Features are serialised one at a time with `to_feature` and written in
+    batches of ENVIROBASE_YIELD_PER, so neither the rows nor the serialised
+    document are ever held in memory as a whole. Extra top-level members,
+    such as prev/next links, are written before the features.
+    """
+    return _stream((_dumps(to_feature(row)) for row in rows), members)
+
+
+def _text(value):
+    return db.cast(value, db.Text)
+
+
+def postgis_feature(geometry, properties, precision=None, simplify=None):
+    """
+    A SQL expression building one GeoJSON Feature as text.
+
+    Parameters
+    ----------
+    geometry : Column
+        The PostGIS geometry column.
+    properties : sequence of (str, Column)
+        Feature property names and the columns they are read from.
+    precision : int, optional
+        Maximum number of decimal places in coordinates.
+    simplify : float, optional
+        ST_Simplify tolerance, in degrees, applied before serialising.
+    """
+    if simplify:
+        geometry = func.ST_Simplify(geometry, simplify)
+    if precision is not None:
+        geojson = func.ST_AsGeoJSON(geometry, precision)
+    else:
+        geojson = func.ST_AsGeoJSON(geometry)
+    members = []
+    for name, column in properties:
+        members.extend([_text(name), column])
+    return _text(
+        func.json_build_object(
+            _text("type"),
+            _text("Feature"),
+            _text("geometry"),
+            db.cast(geojson, db.JSON),
+            _text("properties"),
+            func.json_build_object(*members),
+        )
+    )
+
+
+def _postgis_document(query, key):
+    """A query of the whole FeatureCollection of `query`'s features, built
+    with json_agg in key order."""
+    features = query.subquery()
+    return db.session.query(
+        _text(
+            func.json_build_object(
+                _text("type"),
+                _text("FeatureCollection"),
+                _text("features"),
+                func.coalesce(
+                    func.json_agg(
+                        aggregate_order_by(features.c.feature, features.c[key.key])
+                    ),
+                    db.cast("[]", db.JSON),
+                ),
+            )
+        )
+    )
+
+
+def _postgis_feature_collection(query, key, model, geometry, properties):
+    feature = postgis_feature(
+        geometry,
+        properties,
+        precision=request.args.get("precision", type=int),
+        simplify=request.args.get("simplify", type=float),
+    )
+    query = query.with_entities(key.label(key.key), feature.label("feature"))
+
+    if request.args.get("per_page") == "all":
+        if model is not None:
+            query = filter_query(query, model)
+        document = _postgis_document(query, key).scalar()
+        return Response(document, mimetype="application/geo+json")
+
+    pagination = paginate(query, key, model)
+    return _stream(
+        (row.feature for row in pagination.items),
+        {
+            "prev": pagination.prev_url(external=True),
+            "next": pagination.next_url(external=True),
+        },
+    )
+
+
+def feature_collection(
+    query, key, to_feature, model=None, geometry=None, properties=None
+):
+    """
+    Respond with a FeatureCollection of `query`.
+
+    By default one keyset page is returned with prev/next links. With
+    ``per_page=all`` the whole filtered collection is streamed from a
+    server-side cursor, ENVIROBASE_YIELD_PER rows at a time.
+
+    With ``engine=postgis``, and when the `geometry` column and feature
+    `properties` are given, PostgreSQL builds the features itself with
+    ST_AsGeoJSON and json_build_object, honouring the optional ``precision``
+    and ``simplify`` arguments. ``per_page=all`` then has the whole
+    FeatureCollection assembled with json_agg in a single query.
+
+    When `geometry` is given, the ``bbox`` and ``near``/``radius`` spatial
+    filters are applied to it.
+    """
+    if geometry is not None:
+        query = spatial_filter(query, geometry)
+
+    if request.args.get("engine") == "postgis" and geometry is not None:
+        return _postgis_feature_collection(query, key, model, geometry, properties)
+
+    if request.args.get("per_page") == "all":
+        if model is not None:
+            query = filter_query(query, model)
+        rows = (
+            query.order_by(key)
+            .execution_options(stream_results=True)
+            .yield_per(current_app.config["ENVIROBASE_YIELD_PER"])
+        )
+        return stream_feature_collection(rows, to_feature)
+
+    pagination = paginate(query, key, model)
+    return stream_feature_collection(
+        pagination.items,
+        to_feature,
+        prev=pagination.prev_url(external=True),
+        next=pagination.next_url(external=True),
+    )
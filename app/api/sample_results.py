@@ -0,0 +1,39 @@
+"""
+API for exporting SampleResult rows as Parquet or Arrow IPC
+"""
+
+from flask import Response, abort, request, stream_with_context
+from . import api
+from .. import export
+from ..models import SampleResult
+from ..pagination import parse_arg, parse_args, parse_date
+from .errors import not_implemented
+
+
+@api.route("/sample-results/export", methods=["GET"])
+def export_sample_results():
+    format = request.args.get("format", "parquet")
+    if format not in export.FORMATS:
+        abort(400)
+    # check before streaming starts, or a missing pyarrow would only break
+    # the body of a 200 response
+    try:
+        export._pyarrow()
+    except ImportError as e:
+        return not_implemented(str(e))
+    query = SampleResult.export_query(
+        facility=parse_arg("facility_id", int),
+        wells=parse_args("sample_id", int),
+        params=request.args.getlist("param_cd"),
+        start=parse_arg("start", parse_date),
+        end=parse_arg("end", parse_date),
+    )
+    mimetype, extension = export.FORMATS[format]
+    batches = export.record_batches(query.statement)
+    return Response(
+        stream_with_context(export.stream(batches, format)),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=sample_results{extension}"
+        },
+    )
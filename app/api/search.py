@@ -0,0 +1,27 @@
+"""
+API for typeahead search
+"""
+
+from flask import abort, current_app, jsonify, request
+from . import api
+from ..search import TARGETS, search
+
+MIN_TERM_LENGTH = 2
+
+
+@api.route("/search", methods=["GET"])
+def get_search():
+    term = request.args.get("q", "").strip()
+    kinds = request.args.getlist("type") or list(TARGETS)
+    if any(kind not in TARGETS for kind in kinds):
+        abort(400)
+    limit = min(
+        request.args.get("limit", 10, type=int),
+        current_app.config["ENVIROBASE_SEARCH_MAX_LIMIT"],
+    )
+
+    results = {}
+    for kind in kinds:
+        rows = search(kind, term, limit) if len(term) >= MIN_TERM_LENGTH else []
+        results[kind] = [row._asdict() for row in rows]
+    return jsonify({"q": term, "results": results})
@@ -5,55 +5,64 @@ API for StorageTank
 from datetime import datetime
 from flask import jsonify, request, current_app, url_for
 from . import api
+from .batch import BatchResource
 from .. import db
-from ..models import StorageTank
+from ..cache import response_cache
+from ..models import Facility, StorageTank
+from ..loading import eager_load
+from .geojson import feature_collection
+
+
+def _feature(storage_tank):
+    return {
+        "type": "Feature",
+        "properties": {
+            "facility": storage_tank.facility.name,
+            "tank_id": storage_tank.tank_id,
+            "tank_registration_id": storage_tank.tank_registration_id,
+            "capacity": storage_tank.capacity,
+            "stored_substance": storage_tank.stored_substance,
+            "tank_type": storage_tank.tank_type,
+        },
+        "geometry": {
+            "type": "Point",
+            "coordinates": [storage_tank.longitude, storage_tank.latitude],
+        },
+    }
+
+
+_properties = [
+    ("facility", Facility.name),
+    ("tank_id", StorageTank.tank_id),
+    ("tank_registration_id", StorageTank.tank_registration_id),
+    ("capacity", StorageTank.capacity),
+    ("stored_substance", StorageTank.stored_substance),
+    ("tank_type", StorageTank.tank_type),
+]
 
 
 @api.route("/storage-tanks/", methods=["GET"])
+@response_cache.cached("storage_tank", "facility")
 def get_storage_tanks():
-    storage_tanks = StorageTank.query.all()
-    data = [
-        {
-            "type": "Feature",
-            "properties": {
-                "facility": storage_tank.facility.name,
-                "tank_id": storage_tank.tank_id,
-                "tank_registration_id": storage_tank.tank_registration_id,
-                "capacity": storage_tank.capacity,
-                "stored_substance": storage_tank.stored_substance,
-                "tank_type": stored_substance.tank_type,
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": [storage_tank.longitude, storage_tank.latitude],
-            },
-        }
-        for storage_tank in storage_tanks
-    ]
-    return jsonify({"type": "FeatureCollection", "features": data})
+    return feature_collection(
+        eager_load(
+            StorageTank.query.outerjoin(StorageTank.facility),
+            StorageTank,
+            joined=("facility",),
+        ),
+        StorageTank.tank_id,
+        _feature,
+        StorageTank,
+        geometry=StorageTank.geometry,
+        properties=_properties,
+    )
 
 
 @api.route("/storage-tanks/<int:tank_id>", methods=["GET"])
+@response_cache.cached("storage_tank", "facility")
 def get_storage_tank(tank_id):
     storage_tank = StorageTank.query.get_or_404(tank_id)
-    data = [
-        {
-            "type": "Feature",
-            "properties": {
-                "facility": storage_tank.facility.name,
-                "tank_id": storage_tank.tank_id,
-                "tank_registration_id": storage_tank.tank_registration_id,
-                "capacity": storage_tank.capacity,
-                "stored_substance": storage_tank.stored_substance,
-                "tank_type": stored_substance.tank_type,
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": [storage_tank.longitude, storage_tank.latitude],
-            },
-        }
-    ]
-    return jsonify({"type": "FeatureCollection", "features": data})
+    return jsonify({"type": "FeatureCollection", "features": [_feature(storage_tank)]})
 
 
 @api.route("/storage-tanks/", methods=["POST"])
@@ -61,6 +70,7 @@ def new_storage_tank():
     storage_tank = StorageTank.from_json(request.json)
     db.session.add(storage_tank)
     db.session.commit()
+    response_cache.invalidate(StorageTank.__tablename__)
     return (
         jsonify(storage_tank.to_json()),
         201,
@@ -86,4 +96,38 @@ def edit_storage_tank(tank_id):
     storage_tank.updated_on = datetime.utcnow()
     db.session.add(storage_tank)
     db.session.commit()
+    response_cache.invalidate(StorageTank.__tablename__)
     return jsonify(storage_tank.to_json())
+
+
+_batch = BatchResource(
+    StorageTank,
+    [
+        "facility_id",
+        "tank_registration_id",
+        "date_installed",
+        "date_removed",
+        "capacity",
+        "stored_substance",
+        "status",
+        "tank_type",
+        "longitude",
+        "latitude",
+    ],
+    key=["tank_registration_id", "facility_id"],
+)
+
+
+@api.route("/storage-tanks/batch", methods=["POST"])
+def new_storage_tanks():
+    return _batch.create()
+
+
+@api.route("/storage-tanks/batch", methods=["PATCH"])
+def edit_storage_tanks():
+    return _batch.update()
+
+
+@api.route("/storage-tanks/batch", methods=["DELETE"])
+def delete_storage_tanks():
+    return _batch.delete()
@@ -0,0 +1,156 @@
+"""
+Mapbox Vector Tiles for the map layers
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import abort, current_app, make_response, request
+from sqlalchemy import func
+from . import api
+from .. import db
+from ..cache import response_cache
+from ..models import Facility, StorageTank, WasteUnit, Well
+
+EXTENT = 4096
+BUFFER = 64
+
+# half the width of the web mercator world, in metres
+_ORIGIN = 20037508.342789244
+
+LAYERS = {
+    "facilities": (
+        Facility,
+        [
+            ("facility_id", Facility.facility_id),
+            ("name", Facility.name),
+        ],
+    ),
+    "storage-tanks": (
+        StorageTank,
+        [
+            ("tank_id", StorageTank.tank_id),
+            ("facility_id", StorageTank.facility_id),
+            ("tank_registration_id", StorageTank.tank_registration_id),
+            ("stored_substance", StorageTank.stored_substance),
+            ("tank_type", StorageTank.tank_type),
+        ],
+    ),
+    "waste-units": (
+        WasteUnit,
+        [
+            ("unit_id", WasteUnit.unit_id),
+            ("facility_id", WasteUnit.facility_id),
+            ("name", WasteUnit.name),
+            ("unit_type", WasteUnit.unit_type),
+        ],
+    ),
+    "wells": (
+        Well,
+        [
+            ("sample_id", Well.sample_id),
+            ("facility_id", Well.facility_id),
+            ("well_id", Well.well_id),
+            ("well_type", Well.well_type),
+        ],
+    ),
+}
+
+
+class TileCache(object):
+    """
+    LRU cache of rendered tiles.
+
+    A layer's generation is the version of its table in the response
+    cache, and is part of every cache key, so a write that invalidates the
+    table moves the layer to a new generation; its stale tiles are never
+    read again and fall off the end of the LRU.
+    """
+
+    def __init__(self):
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self, layer):
+        """The (counter, modified time) of a layer."""
+        model, _ = LAYERS[layer]
+        return response_cache.version(model.geometry.table.name)
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def set(self, key, tile):
+        size = current_app.config["ENVIROBASE_TILE_CACHE_SIZE"]
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > size:
+                self._tiles.popitem(last=False)
+
+    def invalidate(self, table):
+        """Invalidate the tiles of every layer drawn from `table`."""
+        response_cache.invalidate(table)
+
+
+tile_cache = TileCache()
+
+
+def tile_envelope(z, x, y):
+    """Web mercator bounds (xmin, ymin, xmax, ymax) of tile z/x/y."""
+    size = 2 * _ORIGIN / 2**z
+    xmin = -_ORIGIN + x * size
+    ymax = _ORIGIN - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def render_tile(layer, z, x, y):
+    """Render one layer of tile z/x/y with ST_AsMVT."""
+    model, properties = LAYERS[layer]
+    xmin, ymin, xmax, ymax = tile_envelope(z, x, y)
+    envelope = func.ST_MakeEnvelope(xmin, ymin, xmax, ymax, 3857)
+
+    geometry = func.ST_Transform(model.geometry, 3857)
+    # simplify to a fraction of a pixel at this zoom
+    tolerance = (xmax - xmin) / EXTENT * current_app.config["ENVIROBASE_TILE_SIMPLIFY"]
+    if tolerance:
+        geometry = func.ST_Simplify(geometry, tolerance)
+
+    features = (
+        model.query.with_entities(
+            func.ST_AsMVTGeom(geometry, envelope, EXTENT, BUFFER, True).label("geom"),
+            *[column.label(name) for name, column in properties],
+        )
+        .filter(model.geometry.intersects(func.ST_Transform(envelope, 4326)))
+        .subquery("tile")
+    )
+    tile = db.session.query(
+        func.ST_AsMVT(db.literal_column("tile"), layer, EXTENT, "geom")
+    ).select_from(features)
+    return bytes(tile.scalar() or b"")
+
+
+@api.route("/tiles/<layer>/<int:z>/<int:x>/<int:y>.pbf", methods=["GET"])
+def get_tile(layer, z, x, y):
+    if layer not in LAYERS or z > 24 or x >= 2**z or y >= 2**z:
+        abort(404)
+
+    counter, modified = tile_cache.generation(layer)
+    key = (layer, counter, z, x, y)
+    cached = tile_cache.get(key)
+    if cached is None:
+        data = render_tile(layer, z, x, y)
+        cached = (data, hashlib.sha1(data).hexdigest())
+        tile_cache.set(key, cached)
+    data, etag = cached
+
+    response = make_response(data)
+    response.mimetype = "application/vnd.mapbox-vector-tile"
+    response.set_etag(etag)
+    response.last_modified = modified
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,26 @@
+"""
+API for SampleResult time series
+"""
+
+from flask import abort, jsonify, request
+from . import api
+from ..models import SampleResult
+from ..pagination import parse_arg, parse_args, parse_date
+
+
+@api.route("/timeseries", methods=["GET"])
+def get_timeseries():
+    try:
+        df = SampleResult.timeseries(
+            facility=parse_arg("facility_id", int),
+            wells=parse_args("sample_id", int),
+            params=request.args.getlist("param_cd"),
+            start=parse_arg("start", parse_date),
+            end=parse_arg("end", parse_date),
+            freq=request.args.get("freq"),
+        )
+    except ValueError:
+        abort(400)
+    df["sample_date"] = df["sample_date"].dt.strftime("%Y-%m-%d")
+    df = df.astype(object).where(df.notna(), None)
+    return jsonify({column: df[column].tolist() for column in df.columns})
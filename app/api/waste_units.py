@@ -2,29 +2,73 @@
 API for WasteUnit
 """
 
+import json
 from flask import jsonify, request, current_app, url_for
 from . import api
+from .batch import BatchResource
 from .. import db
-from ..models import WasteUnit
+from ..cache import response_cache
+from ..models import Facility, WasteUnit
+from ..loading import eager_load
+from .geojson import feature_collection
+
+
+def _feature(waste_unit):
+    geometry = waste_unit.geometry_json
+    return {
+        "type": "Feature",
+        "properties": {
+            "facility": waste_unit.facility.name,
+            "name": waste_unit.name,
+            "constructed_date": waste_unit.constructed_date,
+            "unit_type": waste_unit.unit_type,
+        },
+        "geometry": json.loads(geometry) if geometry is not None else None,
+    }
+
+
+_properties = [
+    ("facility", Facility.name),
+    ("name", WasteUnit.name),
+    ("constructed_date", WasteUnit.constructed_date),
+    ("unit_type", WasteUnit.unit_type),
+]
 
 
 @api.route("/waste-units/", methods=["GET"])
+@response_cache.cached("waste_unit", "facility")
 def get_waste_units():
-    waste_units = WasteUnit.query.all()
-    data = [
-        {
-            "type": "Feature",
-            "properties": {
-                "facility": waste_unit.facility.name,
-                "name": waste_unit.name,
-                "constructed_date": waste_unit.constructed_date,
-                "unit_type": waste_unit.unit_type,
-            },
-            "geometry": {
-                "type": "MultiPolygon",
-                "coordinates": [waste_unit.longitude, waste_unit.latitude],
-            },
-        }
-        for waste_unit in waste_units
-    ]
-    return jsonify({"type": "FeatureCollection", "features": data})
+    return feature_collection(
+        eager_load(
+            WasteUnit.query.outerjoin(WasteUnit.facility),
+            WasteUnit,
+            joined=("facility",),
+        ).options(db.undefer(WasteUnit.geometry_json)),
+        WasteUnit.unit_id,
+        _feature,
+        WasteUnit,
+        geometry=WasteUnit.geometry,
+        properties=_properties,
+    )
+
+
+_batch = BatchResource(
+    WasteUnit,
+    ["facility_id", "name", "constructed_date", "unit_type"],
+    key=["name", "facility_id"],
+)
+
+
+@api.route("/waste-units/batch", methods=["POST"])
+def new_waste_units():
+    return _batch.create()
+
+
+@api.route("/waste-units/batch", methods=["PATCH"])
+def edit_waste_units():
+    return _batch.update()
+
+
+@api.route("/waste-units/batch", methods=["DELETE"])
+def delete_waste_units():
+    return _batch.delete()
@@ -0,0 +1,103 @@
+"""
+API for Well
+"""
+
+from flask import jsonify
+from . import api
+from .batch import BatchResource
+from ..cache import response_cache
+from ..models import Facility, Well
+from ..loading import eager_load
+from .geojson import feature_collection
+
+
+def _feature(well):
+    return {
+        "type": "Feature",
+        "properties": {
+            "facility": well.facility.name,
+            "sample_id": well.sample_id,
+            "well_id": well.well_id,
+            "well_type": well.well_type,
+            "top_screen": well.top_screen,
+            "bottom_screen": well.bottom_screen,
+        },
+        "geometry": {
+            "type": "Point",
+            "coordinates": [well.longitude, well.latitude],
+        },
+    }
+
+
+_properties = [
+    ("facility", Facility.name),
+    ("sample_id", Well.sample_id),
+    ("well_id", Well.well_id),
+    ("well_type", Well.well_type),
+    ("top_screen", Well.top_screen),
+    ("bottom_screen", Well.bottom_screen),
+]
+
+
+@api.route("/wells/", methods=["GET"])
+@response_cache.cached("sample_id", "facility")
+def get_wells():
+    return feature_collection(
+        eager_load(Well.query.outerjoin(Well.facility), Well, joined=("facility",)),
+        Well.sample_id,
+        _feature,
+        Well,
+        geometry=Well.geometry,
+        properties=_properties,
+    )
+
+
+@api.route("/wells/<int:sample_id>", methods=["GET"])
+@response_cache.cached("sample_id", "facility")
+def get_well(sample_id):
+    well = Well.query.get_or_404(sample_id)
+    return jsonify({"type": "FeatureCollection", "features": [_feature(well)]})
+
+
+# wells have no natural key to match new items on, so they are only
+# updated and deleted in batches
+_batch = BatchResource(
+    Well,
+    [
+        "facility_id",
+        "sample_name",
+        "description",
+        "longitude",
+        "latitude",
+        "well_id",
+        "boring_id",
+        "well_type",
+        "installation_date",
+        "abandoned_date",
+        "top_riser",
+        "top_bent_seal",
+        "top_gravel_pack",
+        "top_screen",
+        "bottom_screen",
+        "bottom_well",
+        "bottom_gravel_pack",
+        "bottom_boring",
+        "grout_seal_desc",
+        "bent_seal_desc",
+        "screen_type",
+        "gravel_pack_desc",
+        "riser_pipe_desc",
+        "spacer_depths",
+        "notes",
+    ],
+)
+
+
+@api.route("/wells/batch", methods=["PATCH"])
+def edit_wells():
+    return _batch.update()
+
+
+@api.route("/wells/batch", methods=["DELETE"])
+def delete_wells():
+    return _batch.delete()
@@ -0,0 +1,315 @@
+"""
+Response caching with per-table versions and conditional GET
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, make_response, request
+
+__all__ = [
+    "CachedResponse",
+    "MemoryBackend",
+    "SQLiteBackend",
+    "ResponseCache",
+    "response_cache",
+]
+
+CachedResponse = namedtuple("CachedResponse", ["body", "mimetype", "etag"])
+
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def _first_counter():
+    # counters start from the clock rather than 0, so a restarted process
+    # cannot hand out the ETags it gave out for older data before
+    return int(time.time() * 1e6)
+
+
+class MemoryBackend(object):
+    """
+    LRU of cached responses and table versions, private to this process.
+
+    With several worker processes, a write handled by one worker only
+    invalidates that worker's responses; use SQLiteBackend to share them.
+    """
+
+    def __init__(self, size=1000):
+        self.size = size
+        self._responses = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+            return cached
+
+    def set(self, key, cached):
+        with self._lock:
+            self._responses[key] = cached
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.size:
+                self._responses.popitem(last=False)
+
+    def version(self, table):
+        with self._lock:
+            return self._versions.setdefault(table, (_first_counter(), _now()))
+
+    def bump(self, table):
+        modified = _now()
+        with self._lock:
+            counter, _ = self._versions.get(table, (_first_counter(), modified))
+            self._versions[table] = (counter + 1, modified)
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+
+class SQLiteBackend(object):
+    """
+    LRU of cached responses and table versions in a local SQLite file.
+
+    Every process on the host that opens the same file shares the cache
+    and, more importantly, the table versions, so a write in one worker or
+    a CLI command invalidates the responses of all of them.
+    """
+
+    def __init__(self, path, size=1000):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS response ("
+                "key TEXT PRIMARY KEY, body BLOB, mimetype TEXT, etag TEXT, "
+                "used REAL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS version ("
+                "name TEXT PRIMARY KEY, counter INTEGER, modified TEXT)"
+            )
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _transaction(self, *statements):
+        """Run (sql, parameters) `statements` in one transaction and return
+        the rows of the first."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                results = [
+                    self._connection.execute(sql, parameters).fetchall()
+                    for sql, parameters in statements
+                ]
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+        return results[0]
+
+    def get(self, key):
+        # a plain SELECT and UPDATE, as UPDATE ... RETURNING needs SQLite 3.35
+        rows = self._transaction(
+            ("SELECT body, mimetype, etag FROM response WHERE key = ?", (key,)),
+            ("UPDATE response SET used = ? WHERE key = ?", (time.time(), key)),
+        )
+        return CachedResponse(*rows[0]) if rows else None
+
+    def set(self, key, cached):
+        self._execute(
+            "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?)",
+            (key, cached.body, cached.mimetype, cached.etag, time.time()),
+        )
+        self._execute(
+            "DELETE FROM response WHERE key NOT IN "
+            "(SELECT key FROM response ORDER BY used DESC LIMIT ?)",
+            (self.size,),
+        )
+
+    def version(self, table):
+        rows = self._execute(
+            "SELECT counter, modified FROM version WHERE name = ?", (table,)
+        )
+        if not rows:
+            self._execute(
+                "INSERT OR IGNORE INTO version VALUES (?, ?, ?)",
+                (table, _first_counter(), _now().strftime(_TIME_FORMAT)),
+            )
+            return self.version(table)
+        counter, modified = rows[0]
+        return counter, datetime.strptime(modified, _TIME_FORMAT)
+
+    def bump(self, table):
+        # INSERT OR IGNORE then UPDATE, as an upsert needs SQLite 3.24
+        modified = _now().strftime(_TIME_FORMAT)
+        self._transaction(
+            (
+                "INSERT OR IGNORE INTO version VALUES (?, ?, ?)",
+                (table, _first_counter(), modified),
+            ),
+            (
+                "UPDATE version SET counter = counter + 1, modified = ? "
+                "WHERE name = ?",
+                (modified, table),
+            ),
+        )
+
+    def clear(self):
+        self._execute("DELETE FROM response")
+
+
+def _encoded(chunks, charset):
+    for chunk in chunks:
+        yield chunk.encode(charset) if isinstance(chunk, str) else chunk
+
+
+def backend_from_url(url, size=1000):
+    """
+    The backend for ENVIROBASE_RESPONSE_CACHE: ``memory``, or
+    ``sqlite:///path/to/cache.db`` for a shared local file.
+    """
+    if url == "memory":
+        return MemoryBackend(size)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///") :], size)
+    raise ValueError(f"unknown response cache backend {url!r}")
+
+
+class ResponseCache(object):
+    """
+    Cache of GET responses keyed by URL and the versions of their tables.
+
+    Each cached view declares the tables its response is built from, and
+    the handlers that write to those tables call `invalidate`, which bumps
+    the tables' version counters. A response's ETag is derived from its URL
+    and those counters alone, so a matching If-None-Match is answered with
+    304 before the view, the cache or the database is touched. Responses of
+    an older version are never read again and fall off the end of the LRU.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.enabled = True
+        self.max_bytes = None
+
+    def init_app(self, app):
+        url = app.config["ENVIROBASE_RESPONSE_CACHE"]
+        self.enabled = bool(url)
+        if url:
+            self.backend = backend_from_url(
+                url, app.config["ENVIROBASE_RESPONSE_CACHE_SIZE"]
+            )
+        self.max_bytes = app.config["ENVIROBASE_RESPONSE_CACHE_MAX_BYTES"]
+
+    def version(self, table):
+        """The (counter, modified time) of `table`."""
+        return self.backend.version(table)
+
+    def invalidate(self, *tables):
+        """Move every response built from `tables` to a new version."""
+        for table in tables:
+            self.backend.bump(table)
+
+    def _key(self, tables):
+        args = sorted(request.args.items(multi=True))
+        view_args = sorted((request.view_args or {}).items())
+        versions = [self.version(table) for table in tables]
+        counters = ",".join(
+            f"{table}={counter}" for table, (counter, _) in zip(tables, versions)
+        )
+        key = (
+            f"{request.host_url}|{request.endpoint}|{urlencode(args)}|"
+            f"{urlencode(view_args)}|{counters}"
+        )
+        return key, max(modified for _, modified in versions)
+
+    def _store(self, key, chunks, mimetype, etag, limit):
+        """Pass a streamed body through, caching it if it is small enough."""
+        body, size = [], 0
+        for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                if limit is not None and size > limit:
+                    body = None
+                else:
+                    body.append(chunk)
+            yield chunk
+        if body is not None:
+            self.backend.set(key, CachedResponse(b"".join(body), mimetype, etag))
+
+    def cached(self, *tables):
+        """
+        Decorate a GET view whose response is built from `tables`.
+
+        Only 200 responses are cached. Streamed responses keep streaming
+        and are cached once written, unless they are larger than
+        ENVIROBASE_RESPONSE_CACHE_MAX_BYTES.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                key, modified = self._key(tables)
+                etag = hashlib.sha1(key.encode()).hexdigest()
+                if etag in request.if_none_match:
+                    response = current_app.response_class(status=304)
+                else:
+                    cached = self.backend.get(key)
+                    if cached is not None:
+                        response = current_app.response_class(
+                            cached.body, mimetype=cached.mimetype
+                        )
+                    else:
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code != 200:
+                            return response
+                        if response.is_streamed:
+                            response.response = self._store(
+                                key,
+                                _encoded(response.response, response.charset),
+                                response.mimetype,
+                                etag,
+                                self.max_bytes,
+                            )
+                        elif self.max_bytes is None or (
+                            response.calculate_content_length() <= self.max_bytes
+                        ):
+                            self.backend.set(
+                                key,
+                                CachedResponse(
+                                    response.get_data(), response.mimetype, etag
+                                ),
+                            )
+                response.set_etag(etag)
+                response.last_modified = modified
+                response.cache_control.no_cache = True
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+response_cache = ResponseCache()
@@ -13,3 +13,10 @@ class AlreadyExistsError(Error):
 
     def __init__(self, *args, **kwargs):
         Error.__init__(self, *args, **kwargs)
+
+
+class ValidationError(Error):
+    """Raises an error when submitted data is invalid"""
+
+    def __init__(self, *args, **kwargs):
+        Error.__init__(self, *args, **kwargs)
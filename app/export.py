@@ -0,0 +1,202 @@
+"""
+Columnar export of sample results to Parquet and Arrow IPC
+"""
+
+from flask import current_app
+
+from . import db
+
+__all__ = ["FORMATS", "COLUMNS", "schema", "record_batches", "write", "stream"]
+
+# media type and file extension of each format
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrow"),
+}
+
+# exported columns and their Arrow types; "dictionary" columns are
+# low-cardinality codes stored once per file and referenced by index
+COLUMNS = [
+    ("result_id", "int32"),
+    ("lab_id", "string"),
+    ("facility_id", "int32"),
+    ("sample_id", "int32"),
+    ("sample_name", "dictionary"),
+    ("param_cd", "dictionary"),
+    ("medium_cd", "dictionary"),
+    ("sample_date", "date32"),
+    ("analysis_flag", "dictionary"),
+    ("analysis_result", "float32"),
+    ("analysis_unit", "dictionary"),
+    ("detection_limit", "float32"),
+    ("reporting_limit", "float32"),
+    ("analysis_qualifier", "dictionary"),
+    ("non_detect", "bool_"),
+]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "exporting results needs pyarrow; install it with "
+            "`pip install envirobase[export]`"
+        )
+    return pyarrow
+
+
+def _type(pa, kind):
+    if kind == "dictionary":
+        return pa.dictionary(pa.int32(), pa.string())
+    if kind == "timestamp":
+        return pa.timestamp("us")
+    return getattr(pa, kind)()
+
+
+def schema(columns=COLUMNS):
+    """The Arrow schema of exported results, or of other `columns`."""
+    pa = _pyarrow()
+    return pa.schema([(name, _type(pa, kind)) for name, kind in columns])
+
+
+class _Dictionary(object):
+    """
+    A dictionary that grows as batches arrive, so each batch only adds its
+    new values and writers can emit them as deltas.
+    """
+
+    def __init__(self, pa):
+        self.pa = pa
+        self.values = pa.array([], pa.string())
+
+    def encode(self, values):
+        import pyarrow.compute as pc
+
+        pa = self.pa
+        values = pa.array(values, pa.string())
+        new = values.filter(pc.invert(pc.is_in(values, value_set=self.values)))
+        new = pc.unique(new.drop_null())
+        if len(new):
+            self.values = pa.concat_arrays([self.values, new])
+        indices = pc.index_in(values, value_set=self.values).cast(pa.int32())
+        return pa.DictionaryArray.from_arrays(indices, self.values)
+
+
+def record_batches(statement, batch_size=None, columns=COLUMNS):
+    """
+    Run `statement` on a server-side cursor and yield its rows as Arrow
+    record batches of at most `batch_size` rows.
+
+    The statement must select `columns`, in order. Only one batch of rows
+    is held in memory at a time.
+    """
+    pa = _pyarrow()
+    batch_size = batch_size or current_app.config["ENVIROBASE_EXPORT_BATCH_SIZE"]
+    arrow_schema = schema(columns)
+    dictionaries = {
+        name: _Dictionary(pa) for name, kind in columns if kind == "dictionary"
+    }
+
+    connection = db.engine.connect()
+    try:
+        result = connection.execution_options(stream_results=True).execute(statement)
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            arrays = []
+            for (name, kind), values in zip(columns, zip(*rows)):
+                if kind == "dictionary":
+                    arrays.append(dictionaries[name].encode(values))
+                else:
+                    arrays.append(pa.array(values, _type(pa, kind)))
+            yield pa.record_batch(arrays, schema=arrow_schema)
+    finally:
+        connection.close()
+
+
+def _writer(sink, format):
+    pa = _pyarrow()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(sink, schema(), compression="zstd")
+    if format == "arrow":
+        # dictionaries grow from batch to batch, see _Dictionary
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return pa.ipc.new_stream(sink, schema(), options=options)
+    raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+
+def write(batches, sink, format="parquet"):
+    """
+    Write record `batches` to `sink` as Parquet or as an Arrow IPC stream.
+
+    Parameters
+    ----------
+    batches : iterable of pyarrow.RecordBatch
+    sink : str or file-like
+        A path, or an object with a ``write`` method.
+    format : str
+        "parquet" or "arrow".
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    writer = _writer(sink, format)
+    rows = 0
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+class _Chunks(object):
+    """A write-only file that hands back what was written since last asked."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream(batches, format="parquet"):
+    """
+    Yield the bytes of `batches` written as `format` as each batch is
+    written, for a streamed response.
+    """
+    sink = _Chunks()
+    writer = _writer(sink, format)
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
@@ -0,0 +1,256 @@
+"""
+Import of gINT boring logs and well construction into Boring, Well and
+Lithology
+"""
+
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+from flask import current_app
+
+from . import db, ingest
+from .cache import response_cache
+from .models import Boring, Facility, Lithology, SampleId, Well
+
+__all__ = ["GintProject", "GintReport", "to_wells", "to_lithology", "import_gint"]
+
+GintProject = namedtuple("GintProject", ["project", "wells", "lithology"])
+
+GintReport = namedtuple(
+    "GintReport",
+    ["project", "facility_id", "borings", "wells_updated", "wells_added", "intervals"],
+)
+
+# MON_WELL_CONSTR columns and the Well columns they are stored in
+WELL_COLUMNS = {
+    "PointID": "sample_name",
+    "Mon_Well_Number": "well_id",
+    "Type_Grout": "grout_seal_desc",
+    "Type_Bent": "bent_seal_desc",
+    "Type_Screen": "screen_type",
+    "Type_Gravel": "gravel_pack_desc",
+    "Type_Riser": "riser_pipe_desc",
+    "Spacer_Depths": "spacer_depths",
+    "Comments": "notes",
+    "Top_Bent_Depth": "top_bent_seal",
+    "Top_Gravel_Depth": "top_gravel_pack",
+    "Bot_Well_Depth": "bottom_well",
+    "Bot_Gravel_Depth": "bottom_gravel_pack",
+}
+
+LITHOLOGY_COLUMNS = {
+    "PointID": "boring_id",
+    "Depth": "top_depth",
+    "Bottom": "bottom_depth",
+    "Graphic": "graphic",
+    "Description": "description",
+}
+
+
+def _boring_id(project, point_ids):
+    # PointIDs such as MW-1 repeat from project to project
+    return project + "/" + point_ids.astype("string").str.strip()
+
+
+def to_wells(data, project):
+    """
+    Map MON_WELL_CONSTR rows onto Well columns.
+
+    gINT records the screen's length rather than its depths, so the screen
+    is taken to end at the bottom of the well: bottom_screen is
+    Bot_Well_Depth and top_screen that less Length_Screen. Each well's
+    boring is its PointID within `project`.
+
+    Parameters
+    ----------
+    data : DataFrame
+        MON_WELL_CONSTR rows, with the columns of
+        `external.gint.WELL_COLUMNS`.
+    project : str
+
+    Returns
+    -------
+    DataFrame
+    """
+    wells = data[list(WELL_COLUMNS)].rename(columns=WELL_COLUMNS)
+    wells["sample_name"] = wells["sample_name"].astype("string").str.strip()
+    wells["boring_id"] = _boring_id(project, data["PointID"])
+    wells["bottom_screen"] = data["Bot_Well_Depth"]
+    wells["top_screen"] = data["Bot_Well_Depth"] - data["Length_Screen"]
+    return wells.dropna(subset=["sample_name"])
+
+
+def to_lithology(data, project):
+    """
+    Map LITHOLOGY rows onto Lithology columns.
+
+    Parameters
+    ----------
+    data : DataFrame
+        LITHOLOGY rows, with the columns of
+        `external.gint.LITHOLOGY_COLUMNS`.
+    project : str
+
+    Returns
+    -------
+    DataFrame
+    """
+    lithology = data[list(LITHOLOGY_COLUMNS)].rename(columns=LITHOLOGY_COLUMNS)
+    lithology["boring_id"] = _boring_id(project, data["PointID"])
+    return lithology.dropna(subset=["boring_id", "top_depth"])
+
+
+def read_project(reader, chunksize=None):
+    """
+    Read and map a gINT project's wells and lithology, chunk by chunk.
+
+    Runs in the threads of `import_gint`, so it reads nothing from the
+    database.
+    """
+    from external.gint import LITHOLOGY_COLUMNS, WELL_COLUMNS
+
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+    with reader:
+        project = reader.project
+        wells = [
+            to_wells(chunk, project)
+            for chunk in reader.read_table("MON_WELL_CONSTR", WELL_COLUMNS, chunksize)
+        ]
+        lithology = [
+            to_lithology(chunk, project)
+            for chunk in reader.read_table("LITHOLOGY", LITHOLOGY_COLUMNS, chunksize)
+        ]
+
+    # an empty table may come back as no chunks at all
+    empty = pd.DataFrame(columns=WELL_COLUMNS)
+    wells = pd.concat(wells or [to_wells(empty, project)], ignore_index=True)
+    empty = pd.DataFrame(columns=LITHOLOGY_COLUMNS)
+    lithology = pd.concat(
+        lithology or [to_lithology(empty, project)], ignore_index=True
+    )
+    lithology = lithology.drop_duplicates(["boring_id", "top_depth"], keep="last")
+    bottoms = lithology.groupby("boring_id")["bottom_depth"].max()
+    wells = wells.drop_duplicates("sample_name", keep="last")
+    wells["bottom_boring"] = wells["boring_id"].map(bottoms)
+    return GintProject(project, wells, lithology)
+
+
+def _facility_id(project):
+    facility = Facility.query.filter_by(name=project).first()
+    return facility.facility_id if facility is not None else None
+
+
+def _stored_wells(facility_id, names):
+    """The sample_id of each of the facility's locations named in `names`."""
+    return dict(
+        db.session.query(SampleId.sample_name, SampleId.sample_id).filter(
+            SampleId.facility_id == facility_id, SampleId.sample_name.in_(names)
+        )
+    )
+
+
+def _load_project(data, facility_id):
+    """Write a project's borings, lithology and, with a facility, wells."""
+    wells, lithology = data.wells, data.lithology
+    borings = pd.DataFrame(
+        {"boring_id": pd.concat([wells["boring_id"], lithology["boring_id"]]).unique()}
+    )
+    ingest.bulk_load(Boring.__table__, borings, conflict=("boring_id",))
+    # a boring's log is replaced as a whole, so intervals removed or
+    # re-split in gINT do not linger
+    intervals = ingest.bulk_load(
+        Lithology.__table__,
+        lithology,
+        conflict=("boring_id", "top_depth"),
+        replace=("boring_id",),
+    ).inserted
+
+    updated = added = 0
+    if facility_id is not None and not wells.empty:
+        stored = _stored_wells(facility_id, wells["sample_name"].tolist())
+        matched = wells["sample_name"].isin(stored)
+        identity = Well.__mapper__.polymorphic_identity
+        items = [
+            {
+                "sample_id": stored[row["sample_name"]],
+                "sample_type": identity,
+                **{name: value for name, value in row.items() if pd.notna(value)},
+            }
+            for row in wells[matched].to_dict("records")
+        ]
+        if items:
+            status = ingest.update(Well.__table__, items)
+            updated = int((status == "updated").sum())
+        new = wells[~matched].assign(facility_id=facility_id, sample_type=identity)
+        if not new.empty:
+            added = ingest.bulk_load(
+                Well.__table__, new, conflict=("sample_id", "facility_id")
+            ).inserted
+        if updated or added:
+            response_cache.invalidate(SampleId.__tablename__)
+
+    return GintReport(
+        data.project, facility_id, len(borings), updated, added, intervals
+    )
+
+
+def import_gint(paths, facility_id=None, workers=4, chunksize=None, open_reader=None):
+    """
+    Import gINT projects into Boring, Lithology and Well.
+
+    Projects are read and mapped in a pool of `workers` threads, a few
+    ahead of the loader, and written one at a time as they are read.
+    Borings are named ``<project>/<PointID>``. A well updates the
+    facility's sample location of the same name, or is added to it.
+    Re-importing a project is safe.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        gINT .gpj files, or copies read by `external.gint.READERS`.
+    facility_id : int, optional
+        The facility of every project. By default each project's wells go
+        to the facility named like the project file, and are skipped when
+        there is none.
+    workers : int
+        Projects read at once.
+    chunksize : int, optional
+        Rows per read. Defaults to ENVIROBASE_BULK_CHUNKSIZE.
+    open_reader : callable, optional
+        Returns the `external.gint.GintReader` of a path;
+        `external.gint.open_reader` by default.
+
+    Yields
+    ------
+    GintReport
+        One per project, in the order they are written.
+    """
+    if open_reader is None:
+        from external.gint import open_reader
+
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+
+    def read(path):
+        return read_project(open_reader(path), chunksize)
+
+    remaining = iter(paths)
+    running = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(running) < 2 * workers:
+                path = next(remaining, None)
+                if path is None:
+                    exhausted = True
+                    break
+                running.add(executor.submit(read, path))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                data = future.result()
+                facility = facility_id
+                if facility is None:
+                    facility = _facility_id(data.project)
+                yield _load_project(data, facility)
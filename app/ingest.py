@@ -0,0 +1,517 @@
+"""
+Bulk ingestion through PostgreSQL COPY
+"""
+
+import io
+from collections import namedtuple
+
+import pandas as pd
+from flask import current_app
+
+from . import db
+from .lookup import reference_cache
+
+__all__ = [
+    "LoadReport",
+    "UpsertReport",
+    "bulk_load",
+    "upsert",
+    "merge",
+    "update",
+    "delete",
+    "check_units",
+    "reject_unit_mismatches",
+]
+
+LoadReport = namedtuple(
+    "LoadReport", ["inserted", "skipped", "rejected", "touched", "replaced"]
+)
+
+UpsertReport = namedtuple("UpsertReport", ["added", "changed", "unchanged"])
+
+_AUDIT_COLUMNS = ("created_on", "updated_on")
+
+
+def _load_columns(table):
+    """Columns a bulk load supplies: everything except serial keys, audit
+    stamps and generated columns."""
+    return [
+        column
+        for column in table.columns
+        if column.name not in _AUDIT_COLUMNS
+        and column.computed is None
+        and not column.info.get("generated")
+        and not (column.primary_key and isinstance(column.type, db.Integer))
+    ]
+
+
+def _iter_chunks(data, chunksize):
+    """Yield DataFrames of at most `chunksize` rows from a DataFrame or an
+    iterable of DataFrames and/or row mappings."""
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunksize):
+            yield data.iloc[start : start + chunksize]
+        return
+
+    batch = []
+    for item in data:
+        if isinstance(item, pd.DataFrame):
+            yield from _iter_chunks(item, chunksize)
+            continue
+        batch.append(item)
+        if len(batch) == chunksize:
+            yield pd.DataFrame.from_records(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch)
+
+
+def _write_csv(chunk, columns, start=0):
+    """Render a chunk as CSV in column order, ready for COPY FROM STDIN.
+
+    The first field is the row's position in the whole load, starting at
+    `start`, so rejected rows can be reported against the caller's input.
+    """
+    frame = chunk.reindex(columns=[column.name for column in columns])
+    for column in columns:
+        if isinstance(column.type, db.Integer):
+            # keep integer keys as "12" rather than "12.0" when NaN forces floats
+            frame[column.name] = pd.to_numeric(frame[column.name]).astype("Int64")
+    frame.insert(0, "row_number", range(start, start + len(frame)))
+    buf = io.StringIO()
+    frame.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    return buf
+
+
+def _stage(cursor, table, data, chunksize, columns=None):
+    """Copy `data` into a temporary staging table shaped like `table`.
+
+    Only `columns` are staged, every loadable column by default. Returns
+    the staging table name, the loaded columns and the row count.
+    """
+    columns = columns or _load_columns(table)
+    names = ", ".join(column.name for column in columns)
+    staging = f"{table.name}_staging"
+    cursor.execute(
+        f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+        f"SELECT {names} FROM {table.name} WITH NO DATA"
+    )
+    cursor.execute(f"ALTER TABLE {staging} ADD COLUMN row_number BIGINT")
+    staged = 0
+    for chunk in _iter_chunks(data, chunksize):
+        cursor.copy_expert(
+            f"COPY {staging} (row_number, {names}) FROM STDIN WITH (FORMAT csv)",
+            _write_csv(chunk, columns, start=staged),
+        )
+        staged += len(chunk)
+    return staging, columns, staged
+
+
+_REJECTION_COLUMNS = [
+    "row_number",
+    "lab_id",
+    "sample_id",
+    "sample_date",
+    "param_cd",
+    "analysis_unit",
+    "parameter_unit",
+    "reason",
+]
+
+
+def reject_unit_mismatches(cursor, staging):
+    """
+    Remove staged results whose unit differs from the USGS parameter unit.
+
+    This is the set-based form of the check_unit() trigger: one join against
+    sample_parameter for the whole batch instead of lookups for every row.
+
+    Returns
+    -------
+    DataFrame :  pandas DataFrame
+        One row per rejected result, ordered by input position.
+    """
+    cursor.execute(f"""
+        DELETE FROM {staging} AS s
+        USING sample_parameter AS p
+        WHERE p.param_cd = s.param_cd AND s.analysis_unit != p.parameter_unit
+        RETURNING s.row_number, s.lab_id, s.sample_id, s.sample_date,
+            s.param_cd, s.analysis_unit, p.parameter_unit,
+            'analysis_unit does not match parameter_unit'
+        """)
+    rejected = pd.DataFrame(cursor.fetchall(), columns=_REJECTION_COLUMNS)
+    return rejected.sort_values("row_number", ignore_index=True)
+
+
+def check_units(data, chunksize=None):
+    """
+    Check results against the cached USGS parameter units, in memory.
+
+    This applies the rule of `reject_unit_mismatches` without staging
+    anything in the database.
+
+    Returns
+    -------
+    DataFrame :  pandas DataFrame
+        One row per rejected result, ordered by input position.
+    """
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+    units = reference_cache.parameter_units()
+    rejected = []
+    start = 0
+    for chunk in _iter_chunks(data, chunksize):
+        chunk = chunk.reset_index(drop=True)
+        mismatched = chunk[reference_cache.unit_mismatches(chunk)]
+        rejected.append(
+            mismatched.reindex(columns=_REJECTION_COLUMNS).assign(
+                row_number=mismatched.index + start,
+                parameter_unit=mismatched["param_cd"].map(units),
+                reason="analysis_unit does not match parameter_unit",
+            )
+        )
+        start += len(chunk)
+    if not rejected:
+        return pd.DataFrame(columns=_REJECTION_COLUMNS)
+    return pd.concat(rejected, ignore_index=True)
+
+
+def bulk_load(
+    table, data, conflict, chunksize=None, validator=None, touched=None, replace=None
+):
+    """
+    Stream rows into `table` through a temporary staging table.
+
+    Rows are copied into the staging table with COPY FROM STDIN and then
+    merged in a single INSERT ... SELECT that skips rows violating the
+    unique constraint on the `conflict` columns.
+
+    Parameters
+    ----------
+    table : sqlalchemy.Table
+        The target table.
+    data : DataFrame or iterable
+        A DataFrame, or an iterable of DataFrames and/or row mappings.
+    conflict : sequence of str
+        Columns of the unique constraint used for ON CONFLICT DO NOTHING.
+    chunksize : int, optional
+        Rows per COPY. Defaults to ENVIROBASE_BULK_CHUNKSIZE.
+    validator : callable, optional
+        Called as validator(cursor, staging) before the merge. It removes
+        invalid rows from the staging table and returns them as a DataFrame.
+    touched : sequence of str, optional
+        Columns whose distinct values among the inserted rows are reported,
+        e.g. to refresh aggregates over just the groups that changed.
+    replace : sequence of str, optional
+        Columns identifying groups of rows that are replaced as a whole.
+        Existing rows sharing these values with any staged row are deleted
+        before the merge, in the same transaction.
+
+    Returns
+    -------
+    LoadReport : namedtuple
+        Number of rows inserted and skipped as duplicates, the DataFrame of
+        rejected rows (None when no validation was run), the list of
+        distinct `touched` tuples inserted or deleted (None when not
+        requested) and the number of rows deleted by `replace`.
+    """
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+    stamp, now = (", created_on", ", now()") if "created_on" in table.c else ("", "")
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        staging, columns, staged = _stage(cursor, table, data, chunksize)
+        rejected = validator(cursor, staging) if validator is not None else None
+        replaced, removed = 0, []
+        if replace:
+            match = " AND ".join(f"t.{name} = s.{name}" for name in replace)
+            returning = ""
+            if touched:
+                returning = f" RETURNING {', '.join('t.' + k for k in touched)}"
+            cursor.execute(
+                f"DELETE FROM {table.name} t "
+                f"USING (SELECT DISTINCT {', '.join(replace)} FROM {staging}) s "
+                f"WHERE {match}{returning}"
+            )
+            replaced = cursor.rowcount
+            removed = cursor.fetchall() if touched else []
+        names = ", ".join(column.name for column in columns)
+        merge = (
+            f"INSERT INTO {table.name} ({names}{stamp}) "
+            f"SELECT {names}{now} FROM {staging} "
+            f"ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+        )
+        if touched:
+            keys = ", ".join(touched)
+            cursor.execute(
+                f"WITH inserted AS ({merge} RETURNING {keys}) "
+                f"SELECT {keys}, count(*) FROM inserted GROUP BY {keys}"
+            )
+            groups = cursor.fetchall()
+            inserted = sum(group[-1] for group in groups)
+            touched = list(
+                {tuple(group[:-1]) for group in groups} | set(map(tuple, removed))
+            )
+        else:
+            cursor.execute(merge)
+            inserted = cursor.rowcount
+            touched = None
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    skipped = staged - inserted - (len(rejected) if rejected is not None else 0)
+    return LoadReport(
+        inserted=inserted,
+        skipped=skipped,
+        rejected=rejected,
+        touched=touched,
+        replaced=replaced,
+    )
+
+
+def _upsert_statement(table, staging, columns, key, returning):
+    """INSERT ... ON CONFLICT DO UPDATE of the staged rows; rows identical
+    to the stored ones are not touched."""
+    names = ", ".join(column.name for column in columns)
+    values = [column.name for column in columns if column.name not in key]
+    stamp, now = (", created_on", ", now()") if "created_on" in table.c else ("", "")
+    assignments = [f"{name} = EXCLUDED.{name}" for name in values]
+    if "updated_on" in table.c:
+        assignments.append("updated_on = now()")
+    stored = ", ".join(f"{table.name}.{name}" for name in values)
+    excluded = ", ".join(f"EXCLUDED.{name}" for name in values)
+    return (
+        f"INSERT INTO {table.name} ({names}{stamp}) "
+        f"SELECT {names}{now} FROM {staging} "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {', '.join(assignments)} "
+        f"WHERE ({stored}) IS DISTINCT FROM ({excluded}) "
+        # xmax is 0 only on rows the statement inserted
+        f"RETURNING {returning}xmax = 0 AS added"
+    )
+
+
+def _upsert_sql(table, staging, columns, key):
+    """Upsert the staged rows, counting rows added and changed."""
+    return (
+        f"WITH upserted AS ({_upsert_statement(table, staging, columns, key, '')}) "
+        f"SELECT count(*) FILTER (WHERE added), count(*) FILTER (WHERE NOT added) "
+        f"FROM upserted"
+    )
+
+
+def _primary_key(table):
+    (column,) = table.primary_key.columns
+    return column.name
+
+
+def _merge_sql(table, staging, columns, key):
+    """Upsert the staged rows, returning the primary key and outcome of
+    each one by its row_number."""
+    pk = _primary_key(table)
+    returning = ", ".join(f"{table.name}.{name}" for name in [pk, *key])
+    on_upserted = " AND ".join(f"u.{name} = s.{name}" for name in key)
+    on_stored = " AND ".join(f"t.{name} = s.{name}" for name in key)
+    return (
+        f"WITH upserted AS "
+        f"({_upsert_statement(table, staging, columns, key, returning + ', ')}) "
+        f"SELECT s.row_number, coalesce(u.{pk}, t.{pk}), "
+        f"CASE WHEN u.added THEN 'created' WHEN NOT u.added THEN 'updated' "
+        f"ELSE 'unchanged' END "
+        f"FROM {staging} s LEFT JOIN upserted u ON {on_upserted} "
+        # the statement sees the table as it was before the insert, so
+        # this finds the rows left unchanged
+        f"LEFT JOIN {table.name} t ON {on_stored} "
+        f"ORDER BY s.row_number"
+    )
+
+
+def upsert(table, data, key=None, chunksize=None):
+    """
+    Insert new rows and update changed rows of `table` from `data`.
+
+    Rows are staged with COPY like `bulk_load` and merged with a single
+    INSERT ... ON CONFLICT DO UPDATE. Rows equal to what is already stored
+    are left alone, so re-running an upsert of the same data writes nothing.
+
+    Parameters
+    ----------
+    table : sqlalchemy.Table
+        The target table.
+    data : DataFrame or iterable
+        A DataFrame, or an iterable of DataFrames and/or row mappings.
+    key : sequence of str, optional
+        Columns of the unique constraint to match on; the primary key by
+        default.
+    chunksize : int, optional
+        Rows per COPY. Defaults to ENVIROBASE_BULK_CHUNKSIZE.
+
+    Returns
+    -------
+    UpsertReport : namedtuple
+        Number of rows added, changed and left unchanged.
+    """
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+    key = key or [column.name for column in table.primary_key]
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        staging, columns, staged = _stage(cursor, table, data, chunksize)
+        cursor.execute(_upsert_sql(table, staging, columns, key))
+        added, changed = cursor.fetchone()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return UpsertReport(
+        added=added, changed=changed, unchanged=staged - added - changed
+    )
+
+
+def merge(table, data, key, columns=None, chunksize=None):
+    """
+    Upsert `data` into `table` like `upsert`, reporting every row's outcome.
+
+    Parameters
+    ----------
+    table : sqlalchemy.Table
+        The target table, with a single column primary key.
+    data : DataFrame or iterable
+        A DataFrame, or an iterable of DataFrames and/or row mappings. No
+        two rows may share a `key`, and no `key` column may be null.
+    key : sequence of str
+        Columns of the unique constraint to match on.
+    columns : sequence of Column, optional
+        The columns `data` supplies; every loadable column by default.
+    chunksize : int, optional
+        Rows per COPY. Defaults to ENVIROBASE_BULK_CHUNKSIZE.
+
+    Returns
+    -------
+    DataFrame
+        One row per row of `data`, in order, with the primary key ``id``
+        of the stored row and its ``status``: created, updated or
+        unchanged.
+    """
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        staging, columns, _ = _stage(cursor, table, data, chunksize, columns)
+        cursor.execute(_merge_sql(table, staging, columns, key))
+        rows = cursor.fetchall()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return pd.DataFrame(rows, columns=["row_number", "id", "status"]).set_index(
+        "row_number"
+    )
+
+
+def _update_sql(table, staging, columns):
+    """UPDATE the rows matching the staged primary keys, returning the
+    row_number of those that changed."""
+    pk = _primary_key(table)
+    values = [column.name for column in columns if column.name != pk]
+    assignments = [f"{name} = s.{name}" for name in values]
+    if "updated_on" in table.c:
+        assignments.append("updated_on = now()")
+    stored = ", ".join(f"t.{name}" for name in values)
+    staged = ", ".join(f"s.{name}" for name in values)
+    return (
+        f"UPDATE {table.name} t SET {', '.join(assignments)} FROM {staging} s "
+        f"WHERE t.{pk} = s.{pk} AND ({stored}) IS DISTINCT FROM ({staged}) "
+        f"RETURNING s.row_number"
+    )
+
+
+def update(table, items, chunksize=None):
+    """
+    Update rows of `table` by primary key in one transaction.
+
+    Each item carries the primary key and only the columns to change, so
+    items are grouped by the columns they set and every group is staged
+    with COPY and applied with a single UPDATE ... FROM. Rows are only
+    written when a value differs from the stored one.
+
+    Parameters
+    ----------
+    table : sqlalchemy.Table
+        The target table, with a single column primary key.
+    items : list of dict
+        Row mappings; the primary keys should exist and be unique.
+    chunksize : int, optional
+        Rows per COPY. Defaults to ENVIROBASE_BULK_CHUNKSIZE.
+
+    Returns
+    -------
+    Series
+        The ``status`` of every item, in order: updated or unchanged.
+    """
+    chunksize = chunksize or current_app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+    pk = _primary_key(table)
+    groups = {}
+    for position, item in enumerate(items):
+        groups.setdefault(tuple(sorted(item)), []).append(position)
+
+    status = pd.Series("unchanged", index=range(len(items)), name="status")
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for names, positions in groups.items():
+            if names == (pk,):
+                continue
+            columns = [table.c[name] for name in names]
+            staging, _, _ = _stage(
+                cursor, table, [items[p] for p in positions], chunksize, columns
+            )
+            cursor.execute(_update_sql(table, staging, columns))
+            updated = [positions[row_number] for (row_number,) in cursor.fetchall()]
+            status[updated] = "updated"
+            cursor.execute(f"DROP TABLE {staging}")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return status
+
+
+def delete(table, keys):
+    """
+    Delete the rows of `table` with the primary keys `keys`.
+
+    Returns the list of keys that were deleted.
+    """
+    pk = _primary_key(table)
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"DELETE FROM {table.name} WHERE {pk} = ANY(%s) RETURNING {pk}",
+            (list(keys),),
+        )
+        deleted = [key for (key,) in cursor.fetchall()]
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return deleted
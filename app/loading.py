@@ -0,0 +1,56 @@
+"""
+Eager loading options for list views and API collections
+"""
+
+from sqlalchemy.orm import contains_eager, joinedload
+
+from .models import SampleId, SampleResult, StorageTank, WasteUnit
+
+__all__ = ["EAGER", "eager_load"]
+
+# the relationships a listing reads from every row, and how to load them:
+# joinedload adds a LEFT OUTER JOIN to the listing query itself. Parameters
+# and mediums are not loaded with results, as the templates read them from
+# the reference cache, see app.lookup
+EAGER = {
+    StorageTank: {"facility": joinedload},
+    WasteUnit: {"facility": joinedload},
+    SampleId: {"facility": joinedload},
+    SampleResult: {"sample": joinedload, "facility": joinedload},
+}
+
+
+def _relationships(model):
+    for cls in model.__mro__:
+        if cls in EAGER:
+            return EAGER[cls]
+    return {}
+
+
+def eager_load(query, model, joined=()):
+    """
+    Attach the eager loads a listing of `model` needs to `query`.
+
+    Without them, every relationship read while rendering a row costs a
+    query of its own. With them a page costs the same number of queries
+    however many rows it has. Subclasses use the options of their base
+    class, e.g. Well those of SampleId.
+
+    Parameters
+    ----------
+    query : flask_sqlalchemy.BaseQuery
+    model : db.Model
+        The model the query lists.
+    joined : sequence of str
+        Relationships the query already joins, e.g. to filter on. They are
+        populated from that join with contains_eager rather than joined a
+        second time.
+    """
+    options = []
+    for name, strategy in _relationships(model).items():
+        attribute = getattr(model, name)
+        if name in joined:
+            options.append(contains_eager(attribute))
+        else:
+            options.append(strategy(attribute))
+    return query.options(*options)
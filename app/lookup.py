@@ -0,0 +1,168 @@
+"""
+In-process cache of the USGS reference tables
+"""
+
+import threading
+import time
+
+import pandas as pd
+from flask import current_app
+
+from . import db
+
+__all__ = ["ReferenceCache", "reference_cache"]
+
+
+class _Table(object):
+    """The cached rows of one reference table, keyed by primary key."""
+
+    def __init__(self, rows, key, version):
+        self.rows = {getattr(row, key): row for row in rows}
+        self.missing = set()
+        self.loaded = time.monotonic()
+        self.version = version
+
+
+class ReferenceCache(object):
+    """
+    Read-through cache of SampleParameter and MediumCode rows.
+
+    Each table is read whole with one query on first use and then served
+    from memory. Rows are plain read-only tuples, so they can be shared
+    between threads and outlive the session that loaded them. A table is
+    reloaded once it is older than ENVIROBASE_REFERENCE_CACHE_TTL seconds
+    or after `invalidate`. A code that is not cached is looked up in the
+    database on its own, so codes added since the last load are still
+    found, and codes known to be missing are not looked up again until the
+    next load.
+    """
+
+    _KEYS = {"sample_parameter": "param_cd", "medium_code": "medium_cd"}
+
+    def __init__(self):
+        self._tables = {}
+        self._units = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def stats(self):
+        """Hit, miss and load counters and the number of cached rows."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "version": self._version,
+            "rows": {name: len(table.rows) for name, table in self._tables.items()},
+        }
+
+    def invalidate(self):
+        """Drop every cached table; they are reloaded on next use."""
+        with self._lock:
+            self._version += 1
+            self._tables = {}
+            self._units = None
+
+    def _query(self, name):
+        table = db.metadata.tables[name]
+        columns = [
+            column
+            for column in table.columns
+            if column.computed is None and not column.info.get("generated")
+        ]
+        return db.session.query(*columns), table.c[self._KEYS[name]]
+
+    def _fresh(self, cached):
+        ttl = current_app.config["ENVIROBASE_REFERENCE_CACHE_TTL"]
+        return (
+            cached is not None
+            and cached.version == self._version
+            and time.monotonic() - cached.loaded < ttl
+        )
+
+    def _table(self, name):
+        cached = self._tables.get(name)
+        if self._fresh(cached):
+            return cached
+
+        with self._lock:
+            cached = self._tables.get(name)
+            if not self._fresh(cached):
+                query, _ = self._query(name)
+                cached = _Table(query.all(), self._KEYS[name], self._version)
+                self._tables[name] = cached
+                self._units = None
+                self.loads += 1
+        return cached
+
+    def _get(self, name, code):
+        cached = self._table(name)
+        row = cached.rows.get(code)
+        if row is not None:
+            self.hits += 1
+            return row
+
+        self.misses += 1
+        if code is None or code in cached.missing:
+            return None
+        query, key = self._query(name)
+        row = query.filter(key == code).first()
+        with self._lock:
+            if row is None:
+                cached.missing.add(code)
+            else:
+                cached.rows[code] = row
+                self._units = None
+        return row
+
+    def parameter(self, param_cd):
+        """The sample_parameter row of `param_cd`, or None."""
+        return self._get("sample_parameter", param_cd)
+
+    def medium(self, medium_cd):
+        """The medium_code row of `medium_cd`, or None."""
+        return self._get("medium_code", medium_cd)
+
+    def parameters(self):
+        """Every cached sample_parameter row."""
+        return list(self._table("sample_parameter").rows.values())
+
+    def parameter_units(self):
+        """A Series of parameter_unit indexed by param_cd."""
+        cached = self._table("sample_parameter")
+        units = self._units
+        if units is None:
+            units = pd.Series(
+                {code: row.parameter_unit for code, row in cached.rows.items()},
+                dtype=object,
+            )
+            self._units = units
+        self.hits += 1
+        return units
+
+    def parameters_with_unit(self, unit):
+        """The param_cd values whose USGS unit is `unit`."""
+        units = self.parameter_units()
+        return units.index[units == unit].tolist()
+
+    def unit_mismatches(self, data):
+        """
+        A boolean mask of the rows of `data` whose ``analysis_unit`` differs
+        from the USGS unit of their ``param_cd``, by the same rule as the
+        check_unit() trigger: unknown codes and missing units pass.
+        """
+        units = data["param_cd"].map(self.parameter_units())
+        return (
+            units.notna()
+            & data["analysis_unit"].notna()
+            & (data["analysis_unit"] != units)
+        )
+
+
+reference_cache = ReferenceCache()
@@ -1,5 +1,14 @@
 from flask import Blueprint
+from ..lookup import reference_cache
 
 main = Blueprint("main", __name__)
 
 from . import views, forms
+
+
+@main.app_context_processor
+def inject_reference_lookups():
+    return dict(
+        lookup_parameter=reference_cache.parameter,
+        lookup_medium=reference_cache.medium,
+    )
@@ -1,6 +1,10 @@
 from flask import render_template, url_for, redirect, current_app, flash, request
 from . import main
 from .. import db
+from ..cache import response_cache
+from ..loading import eager_load
+from ..pagination import paginate
+from ..search import match
 from .forms import FacilityForm, StorageTankForm, WasteUnitForm, WellForm
 from ..models import (
     Boring,
@@ -26,8 +30,10 @@ def index():
 
 @main.route("/facilities", methods=["GET"])
 def facilities():
-    facilities = Facility.query.order_by(Facility.name).all()
-    return render_template("facilities.html", facilities=facilities)
+    pagination = paginate(Facility.query, Facility.name, Facility)
+    return render_template(
+        "facilities.html", facilities=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/facilities/<int:facility_id>", methods=["GET"])
@@ -38,8 +44,12 @@ def facility_by_id(facility_id):
 
 @main.route("/facilities/<name>", methods=["GET"])
 def facility_by_name(name):
-    facilities = Facility.query.filter(Facility.name.ilike("%" + name + "%")).all()
-    return render_template("facilities.html", facilities=facilities)
+    pagination = paginate(
+        Facility.query.filter(match("facilities", name)), Facility.name, Facility
+    )
+    return render_template(
+        "facilities.html", facilities=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/add-facility", methods=["GET", "POST"])
@@ -59,6 +69,7 @@ def add_facility():
             )
             db.session.add(facility)
             db.session.commit()
+            response_cache.invalidate(Facility.__tablename__)
             return redirect(url_for(".facilities"))
         else:
             flash("The facility already exists.")
@@ -79,6 +90,7 @@ def edit_facility_id(facility_id):
         facility.latitude = form.latitude.data
         db.session.add(facility)
         db.session.commit()
+        response_cache.invalidate(Facility.__tablename__)
         flash("The facility has been updated.")
         return redirect(url_for(".facilities"))
     form.name.data = facility.name
@@ -105,6 +117,7 @@ def edit_facility_name(name):
         facility.latitude = form.latitude.data
         db.session.add(facility)
         db.session.commit()
+        response_cache.invalidate(Facility.__tablename__)
         flash("The facility has been updated.")
         return redirect(url_for(".facilities"))
     form.name.data = facility.name
@@ -119,8 +132,12 @@ def edit_facility_name(name):
 
 @main.route("/storage-tanks")
 def storage_tanks():
-    storage_tanks = StorageTank.query.all()
-    return render_template("storage_tanks.html", storage_tanks=storage_tanks)
+    pagination = paginate(
+        eager_load(StorageTank.query, StorageTank), StorageTank.tank_id, StorageTank
+    )
+    return render_template(
+        "storage_tanks.html", storage_tanks=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/facilities/<int:facility_id>/add-storage-tank", methods=["GET", "POST"])
@@ -143,6 +160,7 @@ def add_storage_tank(facility_id):
             )
             db.session.add(storage_tank)
             db.session.commit()
+            response_cache.invalidate(StorageTank.__tablename__)
             return redirect(url_for(".storage_tanks"))
         else:
             flash("The storage tank already exists.")
@@ -151,24 +169,40 @@ def add_storage_tank(facility_id):
 
 @main.route("/underground-tanks")
 def underground_tanks():
-    underground_tanks = UndergroundStorageTank.query.all()
+    pagination = paginate(
+        eager_load(UndergroundStorageTank.query, UndergroundStorageTank),
+        UndergroundStorageTank.tank_id,
+        UndergroundStorageTank,
+    )
     return render_template(
-        "underground_tanks.html", underground_tanks=underground_tanks
+        "underground_tanks.html",
+        underground_tanks=pagination.items,
+        pagination=pagination,
     )
 
 
 @main.route("/aboveground-tanks")
 def aboveground_tanks():
-    aboveground_tanks = AbovegroundStorageTank.query.all()
+    pagination = paginate(
+        eager_load(AbovegroundStorageTank.query, AbovegroundStorageTank),
+        AbovegroundStorageTank.tank_id,
+        AbovegroundStorageTank,
+    )
     return render_template(
-        "aboveground_tanks.html", aboveground_tanks=aboveground_tanks
+        "aboveground_tanks.html",
+        aboveground_tanks=pagination.items,
+        pagination=pagination,
     )
 
 
 @main.route("/waste-units")
 def waste_units():
-    waste_units = WasteUnit.query.all()
-    return render_template("waste_units.html", waste_units=waste_units)
+    pagination = paginate(
+        eager_load(WasteUnit.query, WasteUnit), WasteUnit.unit_id, WasteUnit
+    )
+    return render_template(
+        "waste_units.html", waste_units=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/facilities/<int:facility_id>/add-waste-unit", methods=["GET", "POST"])
@@ -187,6 +221,7 @@ def add_waste_unit(facility_id):
             )
             db.session.add(waste_unit)
             db.session.commit()
+            response_cache.invalidate(WasteUnit.__tablename__)
             return redirect(url_for(".waste_units"))
         else:
             flash("The waste unit already exists.")
@@ -195,32 +230,48 @@ def add_waste_unit(facility_id):
 
 @main.route("/landfills")
 def landfills():
-    landfills = Landfill.query.all()
-    return render_template("landfills.html", landfills=landfills)
+    pagination = paginate(
+        eager_load(Landfill.query, Landfill), Landfill.unit_id, Landfill
+    )
+    return render_template(
+        "landfills.html", landfills=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/impoundments")
 def impoundments():
-    impoundments = Impoundment.query.all()
-    return render_template("impoundments.html", impoundments=impoundments)
+    pagination = paginate(
+        eager_load(Impoundment.query, Impoundment), Impoundment.unit_id, Impoundment
+    )
+    return render_template(
+        "impoundments.html", impoundments=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/sample-ids")
 def sample_ids():
-    sample_ids = SampleId.query.all()
-    return render_template("sample_ids.html", sample_ids=sample_ids)
+    pagination = paginate(
+        eager_load(SampleId.query, SampleId), SampleId.sample_id, SampleId
+    )
+    return render_template(
+        "sample_ids.html", sample_ids=pagination.items, pagination=pagination
+    )
 
     
 @main.route("/wells")
 def wells():
-    wells = Well.query.all()
-    return render_template("wells.html", wells=wells)
+    pagination = paginate(eager_load(Well.query, Well), Well.sample_id, Well)
+    return render_template("wells.html", wells=pagination.items, pagination=pagination)
     
  
 @main.route("/facilities/<int:facility_id>/wells", methods=["GET"])
 def facility_wells(facility_id):
-    wells = Well.query.filter_by(facility_id=facility_id).all()
-    return render_template("wells.html", wells=wells)
+    pagination = paginate(
+        eager_load(Well.query.filter_by(facility_id=facility_id), Well),
+        Well.sample_id,
+        Well,
+    )
+    return render_template("wells.html", wells=pagination.items, pagination=pagination)
  
  
 @main.route("/facilities/<int:facility_id>/add-well", methods=["GET", "POST"])
@@ -246,6 +297,7 @@ def add_well(facility_id):
             )
             db.session.add(well)
             db.session.commit()
+            response_cache.invalidate(SampleId.__tablename__)
             return redirect(url_for(".wells"))
         else:
             flash("The well already exists.")
@@ -269,6 +321,7 @@ def edit_well(facility_id, sample_id):
         top_screen=form.top_screen.data
         db.session.add(well)
         db.session.commit()
+        response_cache.invalidate(SampleId.__tablename__)
         flash("The well has been updated.")
         return redirect(url_for(".wells"))
     facility_id=facility_id
@@ -287,15 +340,20 @@ def edit_well(facility_id, sample_id):
     
 @main.route("/sample-results")
 def sample_results():
-    sample_results = SampleResult.query.all()
-    return render_template("sample_results.html", sample_results=sample_results)
+    pagination = paginate(
+        eager_load(SampleResult.query, SampleResult),
+        SampleResult.result_id,
+        SampleResult,
+    )
+    return render_template(
+        "sample_results.html", sample_results=pagination.items, pagination=pagination
+    )
 
 
 @main.route("/parameters")
 def parameters():
-    page = request.args.get("page", 1, type=int)
-    pagination = SampleParameter.query.paginate(
-        page, per_page=current_app.config["ENVIROBASE_PER_PAGE"], error_out=False
+    pagination = paginate(
+        SampleParameter.query, SampleParameter.param_cd, SampleParameter
     )
     parameters = pagination.items
     return render_template(
@@ -305,11 +363,10 @@ def parameters():
 
 @main.route("/parameters/<search_description>", methods=["GET"])
 def parameters_search(search_description):
-    page = request.args.get("page", 1, type=int)
-    pagination = SampleParameter.query.filter(
-        SampleParameter.description.ilike("%" + search_description + "%")
-    ).paginate(
-        page, per_page=current_app.config["ENVIROBASE_PER_PAGE"], error_out=False
+    pagination = paginate(
+        SampleParameter.query.filter(match("parameters", search_description)),
+        SampleParameter.param_cd,
+        SampleParameter,
     )
     parameters = pagination.items
     return render_template(
@@ -319,21 +376,17 @@ def parameters_search(search_description):
 
 @main.route("/mediums")
 def mediums():
-    page = request.args.get("page", 1, type=int)
-    pagination = MediumCode.query.paginate(
-        page, per_page=current_app.config["ENVIROBASE_PER_PAGE"], error_out=False
-    )
+    pagination = paginate(MediumCode.query, MediumCode.medium_cd, MediumCode)
     mediums = pagination.items
     return render_template("mediums.html", mediums=mediums, pagination=pagination)
 
 
 @main.route("/mediums/<search_description>", methods=["GET"])
 def mediums_search(search_description):
-    page = request.args.get("page", 1, type=int)
-    pagination = MediumCode.query.filter(
-        MediumCode.medium_name.ilike("%" + search_description + "%")
-    ).paginate(
-        page, per_page=current_app.config["ENVIROBASE_PER_PAGE"], error_out=False
+    pagination = paginate(
+        MediumCode.query.filter(match("mediums", search_description)),
+        MediumCode.medium_cd,
+        MediumCode,
     )
     mediums = pagination.items
     return render_template("mediums.html", mediums=mediums, pagination=pagination)
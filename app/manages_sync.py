@@ -0,0 +1,304 @@
+"""
+Incremental sync of sample results from MANAGES 4.x
+"""
+
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from pandas.util import hash_pandas_object
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from . import db
+from .lookup import reference_cache
+from .models import Facility, ManagesSync, SampleId, SampleResult
+
+__all__ = ["SyncReport", "lab_checksums", "to_sample_results", "sync_manages"]
+
+SyncReport = namedtuple(
+    "SyncReport", ["site", "pulled", "changed", "unmapped", "inserted", "replaced"]
+)
+
+# the MANAGES columns that make up a lab report's checksum
+_CHECKSUM_COLUMNS = [
+    "location_id",
+    "sample_date",
+    "storet_code",
+    "param_name",
+    "lt_measure",
+    "analysis_result",
+    "detection_limit",
+    "RL",
+    "flags",
+    "default_unit",
+]
+
+
+def _digest(hashes):
+    # sort so the checksum does not depend on the order rows were read in
+    return hashlib.md5(np.sort(hashes.to_numpy()).tobytes()).hexdigest()
+
+
+def lab_checksums(data):
+    """
+    Summarise MANAGES results by lab report.
+
+    Parameters
+    ----------
+    data : DataFrame
+        Results as returned by `external.manages.read_manages4`.
+
+    Returns
+    -------
+    DataFrame
+        Indexed by lab_id, with the ``checksum`` of the report's rows, its
+        ``max_sample_date`` and ``result_count``.
+    """
+    hashes = hash_pandas_object(data[_CHECKSUM_COLUMNS], index=False)
+    groups = hashes.groupby(data["lab_id"].to_numpy())
+    return pd.DataFrame(
+        {
+            "checksum": groups.agg(_digest),
+            "max_sample_date": data.groupby("lab_id")["sample_date"].max(),
+            "result_count": groups.size(),
+        }
+    )
+
+
+def _parameter_codes():
+    """Lookups of param_cd by code and by lower-case SRS name."""
+    rows = reference_cache.parameters()
+    codes = {row.param_cd for row in rows}
+    names = {row.srsname.lower(): row.param_cd for row in rows if row.srsname}
+    return codes, names
+
+
+def to_sample_results(data, facility_id, sample_ids, codes, names):
+    """
+    Map MANAGES results onto sample_result columns.
+
+    ``storet_code`` is matched against param_cd after zero-padding to five
+    digits, falling back to matching ``param_name`` with the SRS name.
+    ``location_id`` is matched against the facility's SampleId names.
+
+    Parameters
+    ----------
+    data : DataFrame
+        Results as returned by `external.manages.read_manages4`.
+    facility_id : int
+    sample_ids : dict
+        sample_id by sample_name for the facility.
+    codes : set
+        Known param_cd values.
+    names : dict
+        param_cd by lower-case SRS name.
+
+    Returns
+    -------
+    (DataFrame, Series)
+        The mapped results and a boolean mask of the `data` rows that could
+        not be mapped and are left out.
+    """
+    storet = data["storet_code"].astype("string").str.strip().str.zfill(5)
+    param_cd = storet.where(storet.isin(codes))
+    by_name = data["param_name"].astype("string").str.lower().map(names)
+    param_cd = param_cd.fillna(by_name)
+
+    lt_measure = data["lt_measure"].astype("string").str.strip()
+    results = pd.DataFrame(
+        {
+            "lab_id": data["lab_id"],
+            "facility_id": facility_id,
+            "sample_id": data["location_id"].map(sample_ids),
+            "param_cd": param_cd,
+            "sample_date": data["sample_date"].dt.date,
+            "analysis_flag": lt_measure.where(lt_measure.isin(["<", ">"])),
+            "analysis_result": data["analysis_result"],
+            "analysis_unit": data["default_unit"].astype("string"),
+            "detection_limit": data["detection_limit"],
+            "reporting_limit": data["RL"],
+            "analysis_comment": data["flags"],
+        }
+    )
+
+    required = ["lab_id", "sample_id", "param_cd", "sample_date", "analysis_unit"]
+    unmapped = results[required].isna().any(axis=1)
+    return results[~unmapped], unmapped
+
+
+def _changed(site, checksums):
+    """The `checksums` of lab reports that differ from their last sync."""
+    stored = dict(
+        db.session.query(ManagesSync.lab_id, ManagesSync.checksum).filter(
+            ManagesSync.site_name == site,
+            ManagesSync.lab_id.in_(checksums.index.tolist()),
+        )
+    )
+    return checksums[
+        [
+            stored.get(lab_id) != checksum
+            for lab_id, checksum in checksums["checksum"].items()
+        ]
+    ]
+
+
+def _facility_id(site):
+    facility = Facility.query.filter_by(name=site).first()
+    return facility.facility_id if facility is not None else None
+
+
+def _high_water_mark(site):
+    """The latest sample date of the site's synced lab reports."""
+    return (
+        db.session.query(func.max(ManagesSync.max_sample_date))
+        .filter(ManagesSync.site_name == site)
+        .scalar()
+    )
+
+
+def _sample_ids(facility_id):
+    return dict(
+        db.session.query(SampleId.sample_name, SampleId.sample_id).filter(
+            SampleId.facility_id == facility_id
+        )
+    )
+
+
+def _record_sync(site, facility_id, complete):
+    """Store the checksums of the lab reports loaded in full."""
+    now = datetime.utcnow()
+    statement = insert(ManagesSync.__table__).values(
+        [
+            {
+                "site_name": site,
+                "lab_id": lab_id,
+                "facility_id": facility_id,
+                "checksum": row.checksum,
+                "max_sample_date": (
+                    None if pd.isna(row.max_sample_date) else row.max_sample_date.date()
+                ),
+                "result_count": int(row.result_count),
+                "synced_on": now,
+            }
+            for lab_id, row in complete.iterrows()
+        ]
+    )
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["site_name", "lab_id"],
+            set_={
+                name: statement.excluded[name]
+                for name in (
+                    "facility_id",
+                    "checksum",
+                    "max_sample_date",
+                    "result_count",
+                    "synced_on",
+                )
+            },
+        )
+    )
+    db.session.commit()
+
+
+def _sync_site(connect, site, full, lookback, **options):
+    from external.manages import read_manages4
+
+    facility_id = _facility_id(site)
+    start = None
+    if not full:
+        high_water_mark = _high_water_mark(site)
+        if high_water_mark is not None:
+            start = high_water_mark - lookback
+
+    data = read_manages4(connect, site=[site], start=start, **options)
+    if data.empty:
+        return SyncReport(site, 0, 0, 0, 0, 0)
+    if facility_id is None:
+        return SyncReport(site, len(data), 0, len(data), 0, 0)
+
+    # results without a lab_id cannot be tracked and are never loaded
+    unlabelled = int(data["lab_id"].isna().sum())
+    pulled = data.dropna(subset=["lab_id"])
+    changed = _changed(site, lab_checksums(pulled))
+    if start is not None and not changed.empty:
+        # a report sampled across `start` was only read in part; its
+        # stored results are replaced as a whole, so read it in full
+        options.pop("window", None)
+        pulled = read_manages4(
+            connect, site=[site], lab_id=changed.index.tolist(), **options
+        )
+        changed = _changed(site, lab_checksums(pulled))
+    if changed.empty:
+        return SyncReport(site, len(data), 0, unlabelled, 0, 0)
+
+    codes, names = _parameter_codes()
+    pulled = pulled[pulled["lab_id"].isin(changed.index)]
+    results, unmapped = to_sample_results(
+        pulled, facility_id, _sample_ids(facility_id), codes, names
+    )
+
+    inserted = replaced = 0
+    rejected = pulled.loc[unmapped, "lab_id"]
+    if not results.empty:
+        report = SampleResult.bulk_load(results, replace=("facility_id", "lab_id"))
+        inserted, replaced = report.inserted, report.replaced
+        if report.rejected is not None:
+            rejected = pd.concat([rejected, report.rejected["lab_id"]])
+
+    # a report with unmapped or rejected rows is retried on the next run
+    complete = changed.drop(rejected.unique())
+    if not complete.empty:
+        _record_sync(site, facility_id, complete)
+
+    return SyncReport(
+        site,
+        len(data),
+        len(changed),
+        unlabelled + len(rejected),
+        inserted,
+        replaced,
+    )
+
+
+def sync_manages(connect, sites, full=False, lookback=None, **options):
+    """
+    Pull new and changed results for each MANAGES site into sample_result.
+
+    Only results sampled after the site's high-water mark, less a
+    `lookback` to catch late corrections, are read. Within those, lab
+    reports whose checksum matches the last sync are skipped, and new or
+    changed reports are read again in full and replace the results stored
+    for their lab_id in one bulk load. Reports with results that could not
+    be mapped or were rejected are retried on the next run. Sites are
+    matched to facilities by name.
+
+    Parameters
+    ----------
+    connect : callable or external.manages.ManagesPool
+        Returns a new MANAGES connection, or the pool to check them out of.
+    sites : list of str
+        MANAGES site names.
+    full : bool
+        Ignore the high-water marks and compare every lab report.
+    lookback : timedelta, optional
+        Defaults to ENVIROBASE_MANAGES_LOOKBACK_DAYS.
+    **options
+        Passed to `external.manages.read_manages4`, e.g. ``window`` and
+        ``workers``.
+
+    Yields
+    ------
+    SyncReport
+        One per site, as it finishes.
+    """
+    if lookback is None:
+        lookback = timedelta(
+            days=current_app.config["ENVIROBASE_MANAGES_LOOKBACK_DAYS"]
+        )
+    for site in sites:
+        yield _sync_site(connect, site, full, lookback, **options)
@@ -0,0 +1,233 @@
+"""
+Request latency and database query instrumentation
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, current_app, g, request
+from flask_sqlalchemy import get_debug_queries
+
+__all__ = ["Histogram", "Metrics", "metrics", "log_slow_queries"]
+
+# request latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# queries per request buckets
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram(object):
+    """Counts of observations at or below each bucket bound, and their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(bound, count) pairs as Prometheus expects them, ending with +Inf."""
+        total = 0
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            yield bound, total
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(**labels):
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", r"\\").replace('"', r"\"")
+        value = value.replace("\n", r"\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def log_slow_queries(queries, threshold, endpoint=None):
+    """
+    Log a warning for each query that took `threshold` seconds or longer.
+
+    Parameters
+    ----------
+    queries : list
+        Records as returned by flask_sqlalchemy.get_debug_queries.
+    threshold : float
+        Seconds.
+    endpoint : str, optional
+        The view the queries were run for.
+
+    Returns
+    -------
+    int
+        The number of slow queries.
+    """
+    slow = 0
+    for query in queries:
+        if query.duration >= threshold:
+            slow += 1
+            current_app.logger.warning(
+                "Slow query: %s\nParameters: %s\nDuration: %fs\nContext: %s\n"
+                "Endpoint: %s\n",
+                query.statement,
+                query.parameters,
+                query.duration,
+                query.context,
+                endpoint,
+            )
+    return slow
+
+
+class Metrics(object):
+    """
+    Per-endpoint request latency and database query metrics.
+
+    Once registered with `init_app`, every request is timed and the queries
+    Flask-SQLAlchemy recorded for it are counted, timed and checked against
+    ENVIROBASE_SLOW_DB_QUERY_TIME. The totals are served in the Prometheus
+    text format at ENVIROBASE_METRICS_URL, and in debug mode each response
+    carries a Server-Timing header with its own database and total time.
+
+    Metrics are kept per process, so each worker of a multi-process server
+    reports its own. Only the time until a streamed response starts is
+    measured, not the time spent writing its body.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}
+            self._latency = {}
+            self._queries = {}
+            self._query_seconds = {}
+            self._slow_queries = {}
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        url = app.config.get("ENVIROBASE_METRICS_URL")
+        if url:
+            app.add_url_rule(url, "metrics", self.render)
+
+    def _start(self):
+        # an app context pushed outside the request, as in the tests, keeps
+        # the queries of earlier requests, so skip those
+        g.request_queries = len(get_debug_queries())
+        g.request_start = time.perf_counter()
+
+    def _finish(self, response):
+        start = g.pop("request_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "none"
+        queries = get_debug_queries()[g.pop("request_queries", 0) :]
+        query_seconds = sum(query.duration for query in queries)
+        slow = log_slow_queries(
+            queries, current_app.config["ENVIROBASE_SLOW_DB_QUERY_TIME"], endpoint
+        )
+        self.observe(
+            endpoint,
+            request.method,
+            response.status_code,
+            elapsed,
+            len(queries),
+            query_seconds,
+            slow,
+        )
+        if current_app.debug:
+            response.headers["Server-Timing"] = (
+                f'db;dur={query_seconds * 1000:.1f};desc="{len(queries)} queries", '
+                f"total;dur={elapsed * 1000:.1f}"
+            )
+        return response
+
+    def observe(
+        self, endpoint, method, status, seconds, queries=0, query_seconds=0.0, slow=0
+    ):
+        """Record one request."""
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if (endpoint, method) not in self._latency:
+                self._latency[endpoint, method] = Histogram(LATENCY_BUCKETS)
+            self._latency[endpoint, method].observe(seconds)
+            if endpoint not in self._queries:
+                self._queries[endpoint] = Histogram(QUERY_BUCKETS)
+            self._queries[endpoint].observe(queries)
+            self._query_seconds[endpoint] = (
+                self._query_seconds.get(endpoint, 0.0) + query_seconds
+            )
+            self._slow_queries[endpoint] = self._slow_queries.get(endpoint, 0) + slow
+
+    def _histogram(self, name, description, histograms, label_names):
+        lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(histograms.items()):
+            labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+            for bound, count in histogram.cumulative():
+                lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+            lines.append(f"{name}_sum{_labels(**labels)} {_number(histogram.sum)}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+        return lines
+
+    def _counter(self, name, description, counters, label_names):
+        lines = [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        for key, value in sorted(counters.items()):
+            labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+            lines.append(f"{name}{_labels(**labels)} {_number(value)}")
+        return lines
+
+    def exposition(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = self._counter(
+                "envirobase_requests_total",
+                "Requests by endpoint, method and status.",
+                self._requests,
+                ("endpoint", "method", "status"),
+            )
+            lines += self._histogram(
+                "envirobase_request_duration_seconds",
+                "Request latency by endpoint and method.",
+                self._latency,
+                ("endpoint", "method"),
+            )
+            lines += self._histogram(
+                "envirobase_db_queries",
+                "Database queries per request by endpoint.",
+                self._queries,
+                ("endpoint",),
+            )
+            lines += self._counter(
+                "envirobase_db_query_seconds_total",
+                "Time spent in database queries by endpoint.",
+                self._query_seconds,
+                ("endpoint",),
+            )
+            lines += self._counter(
+                "envirobase_slow_db_queries_total",
+                "Queries slower than ENVIROBASE_SLOW_DB_QUERY_TIME by endpoint.",
+                self._slow_queries,
+                ("endpoint",),
+            )
+        return "\n".join(lines) + "\n"
+
+    def render(self):
+        return Response(self.exposition(), mimetype=None, content_type=_CONTENT_TYPE)
+
+
+metrics = Metrics()
@@ -4,8 +4,64 @@ import pandas as pd
 from datetime import datetime
 from geoalchemy2 import functions
 from geoalchemy2.types import Geometry
+from sqlalchemy.dialects.postgresql import TSVECTOR, aggregate_order_by, array_agg
+from sqlalchemy.ext.hybrid import hybrid_property
 from flask import current_app, request, url_for
-from .errors import AlreadyExistsError
+from . import export, ingest, reference
+from .errors import ValidationError
+
+# the trigram indexes of the searchable tables need pg_trgm
+db.event.listen(
+    db.metadata, "before_create", db.DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+)
+
+
+def _trigram_index(table, column):
+    return db.Index(
+        f"ix_{table}_{column}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+    )
+
+
+def _search_vector(expression):
+    """A tsvector column for full text search, kept out of ordinary queries.
+
+    A trigger sets it from `expression` on insert and update; generated
+    columns would need PostgreSQL 12.
+    """
+    column = db.Column(TSVECTOR, info={"generated": True, "expression": expression})
+    return db.deferred(column)
+
+
+def _search_triggers(table):
+    """The DDL of the triggers setting the `_search_vector` columns of `table`."""
+    statements = []
+    for column in table.columns:
+        if "expression" not in column.info:
+            continue
+        name = f"{table.name}_{column.name}_update"
+        # NEW.* selected as a row lets the expression use bare column names
+        statements.append(
+            f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$ BEGIN "
+            f"NEW.{column.name} := (SELECT {column.info['expression']} "
+            f"FROM (SELECT NEW.*) AS new_row); RETURN NEW; END $$ LANGUAGE plpgsql"
+        )
+        statements.append(
+            f"CREATE TRIGGER {name} BEFORE INSERT OR UPDATE ON {table.name} "
+            f"FOR EACH ROW EXECUTE PROCEDURE {name}()"
+        )
+    return statements
+
+
+@db.event.listens_for(db.metadata, "after_create")
+def _create_search_triggers(target, connection, tables=(), **kw):
+    if connection.dialect.name != "postgresql":
+        return
+    for table in tables:
+        for statement in _search_triggers(table):
+            connection.execute(statement)
 
 
 class BaseExtension(db.MapperExtension):
@@ -25,8 +81,57 @@ class BaseEntity(object):
     updated_on = db.Column(db.DateTime)
 
 
-class Facility(db.Model, BaseEntity):
+class PointLocation(object):
+    """Mixin for entities with longitude/latitude columns and a POINT geometry."""
+
+    @classmethod
+    def update_geometries(cls, incremental=True):
+        """Set each row's geometry from its longitude and latitude in one UPDATE.
+
+        With `incremental`, only rows whose geometry no longer matches their
+        coordinates are rewritten; a row missing either coordinate is only
+        rewritten while it still has a geometry to clear. Returns the number
+        of rows updated.
+        """
+
+        table = cls.geometry.table
+        point = db.func.ST_SetSRID(
+            db.func.ST_MakePoint(table.c.longitude, table.c.latitude), 4326
+        )
+        update = table.update().values(geometry=point)
+        if incremental:
+            located = db.and_(
+                table.c.longitude.isnot(None), table.c.latitude.isnot(None)
+            )
+            update = update.where(
+                db.or_(
+                    db.and_(
+                        located,
+                        db.or_(
+                            db.func.ST_X(table.c.geometry).is_distinct_from(
+                                table.c.longitude
+                            ),
+                            db.func.ST_Y(table.c.geometry).is_distinct_from(
+                                table.c.latitude
+                            ),
+                        ),
+                    ),
+                    db.and_(db.not_(located), table.c.geometry.isnot(None)),
+                )
+            )
+
+        result = db.session.execute(update)
+        db.session.commit()
+        return result.rowcount
+
+
+class Facility(db.Model, BaseEntity, PointLocation):
     __tablename__ = "facility"
+    __table_args__ = (
+        _trigram_index("facility", "name"),
+        _trigram_index("facility", "city"),
+        db.Index("ix_facility_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     facility_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.Text, nullable=False, unique=True)
@@ -38,6 +143,9 @@ class Facility(db.Model, BaseEntity):
     longitude = db.Column(db.Float, nullable=True)
     latitude = db.Column(db.Float, nullable=True)
     geometry = db.Column(Geometry(geometry_type="POINT", srid=4326))
+    search_vector = _search_vector(
+        "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, ''))"
+    )
 
     storage_tank = db.relationship("StorageTank", back_populates="facility")
     waste_unit = db.relationship("WasteUnit", back_populates="facility")
@@ -64,18 +172,6 @@ class Facility(db.Model, BaseEntity):
         db.session.add(facility)
         db.session.commit()
 
-    @classmethod
-    def update_geometries(cls):
-        """Using each facility's longitude and latitude, add geometry data to db."""
-
-        facilities = Facility.query.all()
-
-        for facility in facilities:
-            point = "POINT({} {})".format(facility.longitude, facility.latitude)
-            facility.geometry = point
-
-        db.session.commit()
-
     def to_json(self):
         json_facility = {
             "url": url_for("api.get_facility", facility_id=self.facility_id),
@@ -122,6 +218,7 @@ class WasteUnit(db.Model, BaseEntity):
     name = db.Column(db.String(64), nullable=False)
     constructed_date = db.Column(db.Date)
     geometry = db.Column(Geometry(geometry_type="POLYGON", srid=4326))
+    geometry_json = db.column_property(functions.ST_AsGeoJSON(geometry), deferred=True)
     unit_type = db.Column(db.String(12), nullable=False)
 
     facility = db.relationship("Facility", back_populates="waste_unit")
@@ -129,6 +226,7 @@ class WasteUnit(db.Model, BaseEntity):
     __mapper_args__ = {
         "polymorphic_identity": "waste_unit",
         "polymorphic_on": unit_type,
+        "with_polymorphic": "*",
     }
 
     def __repr__(self):
@@ -181,8 +279,8 @@ class Impoundment(WasteUnit, BaseEntity):
         return json_impoundment
 
 
-class StorageTank(db.Model, BaseEntity):
-    """Base class for UndergroundStorageTank and AbovegroundStorageTank classes using Joined Table Inheritance. When StorageTank is queried only columns in this class are returned."""
+class StorageTank(db.Model, BaseEntity, PointLocation):
+    """Base class for UndergroundStorageTank and AbovegroundStorageTank classes using Joined Table Inheritance. When StorageTank is queried the columns of both subclasses are loaded too."""
 
     __tablename__ = "storage_tank"
     __table_args__ = (db.UniqueConstraint("tank_registration_id", "facility_id"),)
@@ -205,6 +303,7 @@ class StorageTank(db.Model, BaseEntity):
     __mapper_args__ = {
         "polymorphic_identity": "storage_tank",
         "polymorphic_on": tank_type,
+        "with_polymorphic": "*",
     }
 
     def __repr__(self):
@@ -302,33 +401,28 @@ class AbovegroundStorageTank(StorageTank, BaseEntity):
 
 class MediumCode(db.Model, BaseEntity):
     __tablename__ = "medium_code"
+    __table_args__ = (
+        _trigram_index("medium_code", "medium_name"),
+        db.Index(
+            "ix_medium_code_search_vector", "search_vector", postgresql_using="gin"
+        ),
+    )
 
     medium_cd = db.Column(db.String(3), primary_key=True)
     medium_name = db.Column(db.String(64))
     medium_description = db.Column(db.Text)
     legacy_cd = db.Column(db.CHAR(1))
+    search_vector = _search_vector(
+        "setweight(to_tsvector('english', coalesce(medium_name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(medium_description, '')), 'B')"
+    )
 
     def __init__(self, **kwargs):
         super(MediumCode, self).__init__(**kwargs)
 
     def _insert_medium_codes():
-        """Inserts USGS Medium Codes. If the codes have already been entered, an error is thrown."""
-        if MediumCode.query.first():
-            raise AlreadyExistsError("Medium Codes have already been entered.")
-        else:
-            url = "https://help.waterdata.usgs.gov/medium_cd"
-            df = pd.read_html(url, header=0, converters={0: str})[0]
-            df.rename(
-                index=str,
-                columns={
-                    "Medium Code": "medium_cd",
-                    "Medium Name": "medium_name",
-                    "Medium Description": "medium_description",
-                    "Medium Legacy Code": "legacy_cd",
-                },
-                inplace=True,
-            )
-            df.to_sql("medium_code", con=db.engine, if_exists="append", index=False)
+        """Upserts USGS Medium Codes from the local snapshot."""
+        return reference.load("medium_code")
 
 
 class SampleParameter(db.Model, BaseEntity):
@@ -337,6 +431,14 @@ class SampleParameter(db.Model, BaseEntity):
         db.CheckConstraint(
             "param_cd ~ similar_escape('[[:digit:]]{5}'::text, NULL::text)"
         ),
+        _trigram_index("sample_parameter", "description"),
+        _trigram_index("sample_parameter", "srsname"),
+        _trigram_index("sample_parameter", "casrn"),
+        db.Index(
+            "ix_sample_parameter_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
     )
 
     param_cd = db.Column(db.CHAR(5), primary_key=True)
@@ -353,42 +455,21 @@ class SampleParameter(db.Model, BaseEntity):
     casrn = db.Column(db.Text)
     srsname = db.Column(db.Text)
     parameter_unit = db.Column(db.Text)
+    search_vector = _search_vector(
+        "setweight(to_tsvector('simple', coalesce(casrn, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(srsname, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    )
 
     def __init__(self, **kwargs):
         super(SampleParameter, self).__init__(**kwargs)
 
     def _insert_param_codes():
-        """Inserts USGS Parameter Codes. If the codes have already been entered, an error is thrown."""
-        if SampleParameter.query.first():
-            raise AlreadyExistsError("Parameter Codes have already been entered.")
-        else:
-            url = "https://help.waterdata.usgs.gov/parameter_cd?group_cd=%"
-            df = pd.read_html(url, header=0, converters={0: str})[0]
-            df.rename(
-                index=str,
-                columns={
-                    "Parameter Code": "param_cd",
-                    "Group Name": "group_name",
-                    "Parameter Name/Description": "description",
-                    "Epa equivalence": "epa_equivalence",
-                    "Result Statistical Basis": "statistical_basis",
-                    "Result Time Basis": "time_basis",
-                    "Result Weight Basis": "weight_basis",
-                    "Result Particle Size Basis": "particle_size_basis",
-                    "Result Sample Fraction": "sample_fraction",
-                    "Result Temperature Basis": "temperature_basis",
-                    "CASRN": "casrn",
-                    "SRSName": "srsname",
-                    "Parameter Unit": "parameter_unit",
-                },
-                inplace=True,
-            )
-            df.to_sql(
-                "sample_parameter", con=db.engine, if_exists="append", index=False
-            )
+        """Upserts USGS Parameter Codes from the local snapshot."""
+        return reference.load("sample_parameter")
 
 
-class SampleId(db.Model, BaseEntity):
+class SampleId(db.Model, BaseEntity, PointLocation):
     __tablename__ = "sample_id"
     __table_args__ = (db.UniqueConstraint("sample_id", "facility_id"),)
 
@@ -406,6 +487,7 @@ class SampleId(db.Model, BaseEntity):
     __mapper_args__ = {
         "polymorphic_identity": "sample_id",
         "polymorphic_on": sample_type,
+        "with_polymorphic": "*",
     }
 
     def __repr__(self):
@@ -418,7 +500,7 @@ class SampleId(db.Model, BaseEntity):
             "sample_id": self.sample_id,
             "sample_type": self.sample_type,
         }
-        return json_sample_id
+        return json_sample_location
 
     @staticmethod
     def from_json(json_sample_location):
@@ -437,6 +519,29 @@ class Boring(db.Model, BaseEntity):
     start_date = db.Column(db.Date)
     end_date = db.Column(db.Date)
 
+    lithology = db.relationship(
+        "Lithology", back_populates="boring", order_by="Lithology.top_depth"
+    )
+
+
+class Lithology(db.Model, BaseEntity):
+    """An interval of a boring log, imported from gINT by app.gint_import."""
+
+    __tablename__ = "lithology"
+    __table_args__ = (db.UniqueConstraint("boring_id", "top_depth"),)
+
+    lithology_id = db.Column(db.Integer, primary_key=True)
+    boring_id = db.Column(db.Text, db.ForeignKey("boring.boring_id"), nullable=False)
+    top_depth = db.Column(db.Float, nullable=False)
+    bottom_depth = db.Column(db.Float)
+    graphic = db.Column(db.Text)
+    description = db.Column(db.Text)
+
+    boring = db.relationship("Boring", back_populates="lithology")
+
+    def __repr__(self):
+        return f"Lithology('{self.boring_id}', '{self.top_depth}')"
+
 
 class Well(SampleId, BaseEntity):
     __tablename__ = "well"
@@ -470,13 +575,16 @@ class Well(SampleId, BaseEntity):
 
     def to_json(self):
         json_monitoring_well = {
-            "url": url_for("api.get_monitoring_well", well_id=self.well_id),
+            "url": url_for("api.get_well", sample_id=self.sample_id),
             "top_screen": self.top_screen,
             "bottom_screen": self.bottom_screen,
         }
         return json_monitoring_well
 
 
+_FREQUENCIES = ("day", "week", "month", "quarter", "year")
+
+
 class SampleResult(db.Model, BaseEntity):
     __tablename__ = "sample_result"
     __table_args__ = (
@@ -486,6 +594,13 @@ class SampleResult(db.Model, BaseEntity):
         db.CheckConstraint(
             "param_cd ~ similar_escape('[[:digit:]]{5}'::text, NULL::text)"
         ),
+        db.Index(
+            "ix_sample_result_series",
+            "facility_id",
+            "sample_id",
+            "param_cd",
+            "sample_date",
+        ),
     )
 
     result_id = db.Column(db.Integer, primary_key=True)
@@ -517,9 +632,363 @@ class SampleResult(db.Model, BaseEntity):
     def __repr__(self):
         return f"SampleResult('{self.result_id}')"
 
+    @classmethod
+    def bulk_load(
+        cls, data, chunksize=None, validate=True, refresh_summary=True, replace=None
+    ):
+        """Bulk load sample results with COPY, skipping rows that already exist.
+
+        `data` is a DataFrame or an iterable of DataFrames and/or row mappings
+        keyed by column name. With `validate`, results whose unit does not
+        match the USGS parameter unit are checked in one set-based join and
+        left out rather than aborting the load. `replace` names columns, such
+        as ``("facility_id", "lab_id")``, whose existing results are deleted
+        and replaced by the loaded ones. With `refresh_summary`, the summary
+        rows of the wells and parameters that received new results are
+        recomputed. Returns a LoadReport of inserted and skipped counts, the
+        rejected rows and the (sample_id, param_cd) pairs loaded.
+        """
+        report = ingest.bulk_load(
+            cls.__table__,
+            data,
+            conflict=(
+                "lab_id",
+                "sample_id",
+                "sample_date",
+                "param_cd",
+                "analysis_result",
+            ),
+            chunksize=chunksize,
+            validator=ingest.reject_unit_mismatches if validate else None,
+            touched=("sample_id", "param_cd"),
+            replace=replace,
+        )
+        if refresh_summary:
+            cls.refresh_summary(report.touched)
+        return report
+
+    @classmethod
+    def validate_units(cls, data, chunksize=None):
+        """Check results against USGS parameter units without loading them.
+
+        The check runs in memory against the cached parameter units. Returns
+        a DataFrame with one row per rejected result.
+        """
+        return ingest.check_units(data, chunksize=chunksize)
+
+    @hybrid_property
+    def non_detect(self):
+        """Whether the result is censored: flagged '<' or below the detection limit."""
+        return self.analysis_flag == "<" or (
+            self.detection_limit is not None
+            and (
+                self.analysis_result is None
+                or self.analysis_result < self.detection_limit
+            )
+        )
+
+    @non_detect.expression
+    def non_detect(cls):
+        return db.or_(
+            cls.analysis_flag == "<",
+            db.and_(
+                cls.detection_limit.isnot(None),
+                db.or_(
+                    cls.analysis_result.is_(None),
+                    cls.analysis_result < cls.detection_limit,
+                ),
+            ),
+        )
+
+    @classmethod
+    def refresh_summary(cls, keys=None):
+        """Recompute SampleResultSummary rows from sample_result.
+
+        `keys` is a list of (sample_id, param_cd) pairs to refresh; every
+        group is recomputed when it is None.
+        """
+
+        if keys is not None and len(keys) == 0:
+            return
+        stale = SampleResultSummary.query
+        if keys is not None:
+            stale = stale.filter(
+                db.tuple_(
+                    SampleResultSummary.sample_id, SampleResultSummary.param_cd
+                ).in_(keys)
+            )
+
+        stale.delete(synchronize_session=False)
+        table = SampleResultSummary.__table__
+        db.session.execute(
+            table.insert().from_select(
+                [column.name for column in table.columns],
+                cls._summary_query(keys).statement,
+            )
+        )
+        db.session.commit()
+
+    @classmethod
+    def _summary_query(cls, keys=None):
+        """The SampleResultSummary rows of `keys`, or of every group."""
+        group = (cls.sample_id, cls.param_cd)
+        latest = array_agg(
+            aggregate_order_by(
+                cls.analysis_result, cls.sample_date.desc(), cls.result_id.desc()
+            )
+        )[1]
+        stats = db.session.query(
+            cls.sample_id,
+            cls.param_cd,
+            db.func.min(cls.facility_id),
+            db.func.min(cls.analysis_unit),
+            db.func.count(cls.result_id),
+            db.func.count(cls.result_id).filter(cls.non_detect),
+            db.func.min(cls.analysis_result),
+            db.func.max(cls.analysis_result),
+            db.func.avg(cls.analysis_result),
+            db.func.percentile_cont(0.5).within_group(cls.analysis_result),
+            latest,
+            db.func.max(cls.sample_date),
+            db.func.now(),
+        )
+        # results without a well or parameter have no summary row to go in
+        stats = stats.filter(cls.sample_id.isnot(None), cls.param_cd.isnot(None))
+        if keys is not None:
+            stats = stats.filter(db.tuple_(*group).in_(keys))
+        return stats.group_by(*group)
+
+    @classmethod
+    def summary(cls, facility=None, wells=None, params=None):
+        """Per well and parameter statistics as a pandas DataFrame.
+
+        `facility` is a facility_id, `wells` a list of sample_ids and `params`
+        a list of parameter codes. Read from the summary table, which
+        `bulk_load` keeps current for the results it loads; rows written any
+        other way are only counted after `refresh_summary`, e.g. by
+        ``flask refresh-summary``.
+        """
+
+        query = SampleResultSummary.query.join(
+            SampleId, SampleResultSummary.sample_id == SampleId.sample_id
+        ).with_entities(SampleId.sample_name, SampleResultSummary)
+        if facility is not None:
+            query = query.filter(SampleResultSummary.facility_id == facility)
+        if wells:
+            query = query.filter(SampleResultSummary.sample_id.in_(wells))
+        if params:
+            query = query.filter(SampleResultSummary.param_cd.in_(params))
+        query = query.order_by(
+            SampleResultSummary.sample_id, SampleResultSummary.param_cd
+        )
+        return pd.read_sql(query.statement, db.engine, parse_dates=["last_sample_date"])
+
+    @classmethod
+    def filtered(cls, facility=None, wells=None, params=None, start=None, end=None):
+        """Query of results narrowed by facility, wells, parameters and dates.
+
+        `facility` is a facility_id or name, `wells` a list of sample_ids or
+        sample names and `params` a list of parameter codes. `start` and
+        `end` bound sample_date inclusively.
+        """
+
+        query = cls.query.join(SampleId, cls.sample_id == SampleId.sample_id)
+        if isinstance(facility, str):
+            query = query.join(Facility, cls.facility_id == Facility.facility_id)
+            query = query.filter(Facility.name == facility)
+        elif facility is not None:
+            query = query.filter(cls.facility_id == facility)
+        if wells:
+            if all(isinstance(well, str) for well in wells):
+                query = query.filter(SampleId.sample_name.in_(wells))
+            else:
+                query = query.filter(cls.sample_id.in_(wells))
+        if params:
+            query = query.filter(cls.param_cd.in_(params))
+        if start is not None:
+            query = query.filter(cls.sample_date >= start)
+        if end is not None:
+            query = query.filter(cls.sample_date <= end)
+        return query
+
+    @classmethod
+    def timeseries(
+        cls,
+        facility=None,
+        wells=None,
+        params=None,
+        start=None,
+        end=None,
+        freq=None,
+        wide=False,
+    ):
+        """Concentration histories as a pandas DataFrame, read in one query.
+
+        Filters are as for `filtered`. With `freq` ('day', 'week', 'month',
+        'quarter' or 'year') results are averaged per period in the database
+        with date_trunc, and `n` counts the results in each period. The tidy
+        frame has one row per result; `wide` pivots it to one column per
+        (sample_name, param_cd) indexed by sample_date.
+        """
+
+        sample_date = cls.sample_date
+        keys = [cls.facility_id, cls.sample_id, SampleId.sample_name, cls.param_cd]
+        if freq is None:
+            columns = keys + [
+                sample_date,
+                cls.analysis_result,
+                cls.analysis_unit,
+                cls.analysis_flag,
+                cls.detection_limit,
+            ]
+        elif freq in _FREQUENCIES:
+            sample_date = db.cast(db.func.date_trunc(freq, cls.sample_date), db.Date)
+            columns = keys + [
+                sample_date.label("sample_date"),
+                db.func.avg(cls.analysis_result).label("analysis_result"),
+                db.func.min(cls.analysis_unit).label("analysis_unit"),
+                db.func.count(cls.analysis_result).label("n"),
+            ]
+        else:
+            raise ValueError(f"freq must be one of {', '.join(_FREQUENCIES)}")
+
+        query = cls.filtered(facility, wells, params, start, end).with_entities(
+            *columns
+        )
+        if freq is not None:
+            query = query.group_by(*keys, sample_date)
+        query = query.order_by(cls.sample_id, cls.param_cd, sample_date)
+
+        df = pd.read_sql(query.statement, db.engine, parse_dates=["sample_date"])
+        if wide:
+            return df.pivot_table(
+                index="sample_date",
+                columns=["sample_name", "param_cd"],
+                values="analysis_result",
+            )
+        return df
+
+    @classmethod
+    def export_query(cls, facility=None, wells=None, params=None, start=None, end=None):
+        """Query of the export.COLUMNS of results, filtered as for `filtered`
+        and ordered as ix_sample_result_series."""
+
+        columns = [
+            SampleId.sample_name if name == "sample_name" else getattr(cls, name)
+            for name, _ in export.COLUMNS
+        ]
+        query = cls.filtered(facility, wells, params, start, end)
+        return query.with_entities(*columns).order_by(
+            cls.facility_id, cls.sample_id, cls.param_cd, cls.sample_date
+        )
+
+    @classmethod
+    def export(
+        cls,
+        sink,
+        format="parquet",
+        facility=None,
+        wells=None,
+        params=None,
+        start=None,
+        end=None,
+        batch_size=None,
+    ):
+        """Write results to `sink`, a path or file, as Parquet or Arrow IPC.
+
+        Filters are as for `filtered` and run in the database. Rows are read
+        from a server-side cursor and written `batch_size` at a time, so
+        exports larger than memory are fine. Codes and units are dictionary
+        encoded and results stored as float32. Returns the number of rows.
+        """
+
+        query = cls.export_query(facility, wells, params, start, end)
+        batches = export.record_batches(query.statement, batch_size)
+        return export.write(batches, sink, format)
+
     def to_json(self):
         json_sample_result = {
             "url": url_for("api.get_sample_result", result_id=self.result_id),
             "lab_id": self.lab_id,
         }
         return json_sample_result
+
+
+class SampleResultSummary(db.Model):
+    """Statistics per well and parameter over sample_result, maintained by
+    SampleResult.refresh_summary. SampleResult.bulk_load, and so load-results
+    and sync-manages, refresh the rows it loads into; after any other write
+    to sample_result run ``flask refresh-summary``."""
+
+    __tablename__ = "sample_result_summary"
+
+    sample_id = db.Column(
+        db.Integer, db.ForeignKey("sample_id.sample_id"), primary_key=True
+    )
+    param_cd = db.Column(
+        db.CHAR(5), db.ForeignKey("sample_parameter.param_cd"), primary_key=True
+    )
+    facility_id = db.Column(db.Integer, db.ForeignKey("facility.facility_id"))
+    analysis_unit = db.Column(db.Text)
+    result_count = db.Column(db.Integer, nullable=False)
+    non_detect_count = db.Column(db.Integer, nullable=False)
+    min_result = db.Column(db.Float)
+    max_result = db.Column(db.Float)
+    mean_result = db.Column(db.Float)
+    median_result = db.Column(db.Float)
+    last_result = db.Column(db.Float)
+    last_sample_date = db.Column(db.Date)
+    refreshed_on = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"SampleResultSummary('{self.sample_id}', '{self.param_cd}')"
+
+
+class ManagesSync(db.Model):
+    """MANAGES lab reports loaded into sample_result, with a checksum of their
+    rows, used by app.manages_sync to pull only new and changed reports."""
+
+    __tablename__ = "manages_sync"
+
+    site_name = db.Column(db.Text, primary_key=True)
+    lab_id = db.Column(db.Text, primary_key=True)
+    facility_id = db.Column(db.Integer, db.ForeignKey("facility.facility_id"))
+    checksum = db.Column(db.CHAR(32), nullable=False)
+    max_sample_date = db.Column(db.Date)
+    result_count = db.Column(db.Integer, nullable=False)
+    synced_on = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"ManagesSync('{self.site_name}', '{self.lab_id}')"
+
+
+class TrendResult(db.Model):
+    """Censored-data statistics of one well and parameter, written by a run
+    of app.trends.analyze_trends."""
+
+    __tablename__ = "trend_result"
+    __table_args__ = (
+        db.UniqueConstraint("run_id", "sample_id", "param_cd"),
+        db.Index("ix_trend_result_run_facility", "run_id", "facility_id"),
+    )
+
+    trend_id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Text, nullable=False)
+    facility_id = db.Column(db.Integer, db.ForeignKey("facility.facility_id"))
+    sample_id = db.Column(db.Integer, db.ForeignKey("sample_id.sample_id"))
+    param_cd = db.Column(db.CHAR(5), db.ForeignKey("sample_parameter.param_cd"))
+    result_count = db.Column(db.Integer, nullable=False)
+    detect_count = db.Column(db.Integer, nullable=False)
+    first_sample_date = db.Column(db.Date)
+    last_sample_date = db.Column(db.Date)
+    km_mean = db.Column(db.Float)
+    km_sd = db.Column(db.Float)
+    mk_s = db.Column(db.Float)
+    mk_z = db.Column(db.Float)
+    mk_p = db.Column(db.Float)
+    sen_slope = db.Column(db.Float)
+    upl = db.Column(db.Float)
+    computed_on = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"TrendResult('{self.run_id}', '{self.sample_id}', '{self.param_cd}')"
@@ -0,0 +1,156 @@
+"""
+Keyset pagination and common filters for list views and API collections
+"""
+
+from datetime import datetime
+from flask import abort, current_app, request, url_for
+
+
+class KeysetPagination(object):
+    """
+    Page through a query by seeking on a unique, ordered key column.
+
+    Each page is fetched with ``WHERE key > cursor ORDER BY key LIMIT n``
+    (or the reverse for ``before``), so the cost of a page does not grow with
+    how deep into the table it is, unlike OFFSET pagination.
+
+    Parameters
+    ----------
+    query : flask_sqlalchemy.BaseQuery
+        The unordered query to page through.
+    key : InstrumentedAttribute
+        A unique column to order and seek on, usually the primary key.
+    per_page : int
+        Number of items on a page.
+    after, before : optional
+        Key value to seek past; at most one should be given.
+    """
+
+    def __init__(self, query, key, per_page, after=None, before=None):
+        self.key = key
+        self.per_page = per_page
+
+        if before is not None:
+            rows = (
+                query.filter(key < before)
+                .order_by(key.desc())
+                .limit(per_page + 1)
+                .all()
+            )
+            self.items = rows[:per_page][::-1]
+            self.has_prev = len(rows) > per_page
+            self.has_next = True
+        else:
+            if after is not None:
+                query = query.filter(key > after)
+            rows = query.order_by(key).limit(per_page + 1).all()
+            self.items = rows[:per_page]
+            self.has_prev = after is not None
+            self.has_next = len(rows) > per_page
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            return getattr(self.items[-1], self.key.key)
+
+    @property
+    def prev_cursor(self):
+        if self.has_prev and self.items:
+            return getattr(self.items[0], self.key.key)
+
+    def _url(self, external, **cursor):
+        args = request.args.to_dict(flat=False)
+        args.pop("after", None)
+        args.pop("before", None)
+        args.update(request.view_args or {})
+        args.update(cursor)
+        return url_for(request.endpoint, _external=external, **args)
+
+    def next_url(self, external=False):
+        """URL of the next page of the current request, or None."""
+        cursor = self.next_cursor
+        if cursor is not None:
+            return self._url(external, after=cursor)
+
+    def prev_url(self, external=False):
+        """URL of the previous page of the current request, or None."""
+        cursor = self.prev_cursor
+        if cursor is not None:
+            return self._url(external, before=cursor)
+
+
+def parse_arg(name, type):
+    """
+    The request argument `name` converted by `type`, or None when it is
+    missing or empty. A value `type` cannot convert is answered with 400.
+    """
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return type(value)
+    except ValueError:
+        abort(400)
+
+
+def parse_args(name, type):
+    """Every value of the request argument `name` converted by `type`,
+    answering 400 when one cannot be."""
+    try:
+        return [type(value) for value in request.args.getlist(name)]
+    except ValueError:
+        abort(400)
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD request argument."""
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def filter_query(query, model):
+    """
+    Apply the optional ``facility_id``, ``param_cd`` and ``start``/``end``
+    request arguments to `query`, for whichever of those columns `model` has.
+    """
+    facility_id = parse_arg("facility_id", int)
+    if facility_id is not None and hasattr(model, "facility_id"):
+        query = query.filter(model.facility_id == facility_id)
+
+    param_cds = request.args.getlist("param_cd")
+    if param_cds and hasattr(model, "param_cd"):
+        query = query.filter(model.param_cd.in_(param_cds))
+
+    if hasattr(model, "sample_date"):
+        start = parse_arg("start", parse_date)
+        end = parse_arg("end", parse_date)
+        if start is not None:
+            query = query.filter(model.sample_date >= start)
+        if end is not None:
+            query = query.filter(model.sample_date <= end)
+
+    return query
+
+
+def paginate(query, key, model=None):
+    """
+    Filter `query` by the request arguments and return a KeysetPagination
+    positioned by the ``after``/``before`` cursors and ``per_page``.
+
+    ``per_page`` defaults to ENVIROBASE_PER_PAGE and is capped at
+    ENVIROBASE_MAX_PER_PAGE.
+    """
+    if model is not None:
+        query = filter_query(query, model)
+
+    python_type = key.type.python_type
+    per_page = parse_arg("per_page", int)
+    if per_page is None or per_page < 1:
+        per_page = current_app.config["ENVIROBASE_PER_PAGE"]
+    per_page = min(per_page, current_app.config["ENVIROBASE_MAX_PER_PAGE"])
+    return KeysetPagination(
+        query,
+        key,
+        per_page,
+        after=parse_arg("after", python_type),
+        before=parse_arg("before", python_type),
+    )
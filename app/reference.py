@@ -0,0 +1,152 @@
+"""
+USGS reference data from versioned local snapshots
+"""
+
+import hashlib
+import json
+import os
+from datetime import date
+
+import pandas as pd
+
+from . import db, ingest
+from .lookup import reference_cache
+
+__all__ = ["SNAPSHOT_DIR", "fetch", "save_snapshot", "read_snapshot", "load"]
+
+SNAPSHOT_DIR = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), "reference_data"
+)
+
+_MANIFEST = "manifest.json"
+
+# where each reference table is scraped from, and how its columns are named
+SOURCES = {
+    "medium_code": (
+        "https://help.waterdata.usgs.gov/medium_cd",
+        {
+            "Medium Code": "medium_cd",
+            "Medium Name": "medium_name",
+            "Medium Description": "medium_description",
+            "Medium Legacy Code": "legacy_cd",
+        },
+    ),
+    "sample_parameter": (
+        "https://help.waterdata.usgs.gov/parameter_cd?group_cd=%",
+        {
+            "Parameter Code": "param_cd",
+            "Group Name": "group_name",
+            "Parameter Name/Description": "description",
+            "Epa equivalence": "epa_equivalence",
+            "Result Statistical Basis": "statistical_basis",
+            "Result Time Basis": "time_basis",
+            "Result Weight Basis": "weight_basis",
+            "Result Particle Size Basis": "particle_size_basis",
+            "Result Sample Fraction": "sample_fraction",
+            "Result Temperature Basis": "temperature_basis",
+            "CASRN": "casrn",
+            "SRSName": "srsname",
+            "Parameter Unit": "parameter_unit",
+        },
+    ),
+}
+
+
+def fetch(table):
+    """Scrape the current USGS reference table for `table`."""
+    url, columns = SOURCES[table]
+    df = pd.read_html(url, header=0, converters={0: str})[0]
+    return df.rename(columns=columns)[list(columns.values())]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest(directory):
+    path = os.path.join(directory, _MANIFEST)
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_snapshot(table, df, directory=SNAPSHOT_DIR, version=None):
+    """
+    Write `df` as the gzip CSV snapshot of `table` and record it in the
+    directory's manifest.
+
+    Parameters
+    ----------
+    table : str
+        The reference table name, a key of SOURCES.
+    df : DataFrame
+    directory : str
+    version : str, optional
+        Defaults to today's date.
+
+    Returns
+    -------
+    dict
+        The manifest entry: file name, version, row count and checksum.
+    """
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{table}.csv.gz"
+    path = os.path.join(directory, filename)
+    # mtime=0 keeps the file byte-identical when the data has not changed
+    df.to_csv(path, index=False, compression={"method": "gzip", "mtime": 0})
+
+    manifest = _manifest(directory)
+    entry = manifest["tables"][table] = {
+        "file": filename,
+        "version": version or date.today().isoformat(),
+        "source": SOURCES[table][0] if table in SOURCES else None,
+        "rows": len(df),
+        "sha256": _sha256(path),
+    }
+    with open(os.path.join(directory, _MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return entry
+
+
+def read_snapshot(table, directory=SNAPSHOT_DIR):
+    """
+    Read the snapshot of `table`, checking it against the manifest.
+
+    All columns are read as text, so codes keep their leading zeros.
+    """
+    entry = _manifest(directory)["tables"].get(table)
+    if entry is None:
+        raise FileNotFoundError(
+            f"no {table} snapshot in {directory}; "
+            "create one with `flask reference-snapshot`"
+        )
+    path = os.path.join(directory, entry["file"])
+    if _sha256(path) != entry["sha256"]:
+        raise ValueError(f"{path} does not match its manifest checksum")
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+
+
+def load(table, directory=SNAPSHOT_DIR, chunksize=None):
+    """
+    Upsert the snapshot of `table` into the database.
+
+    New codes are added and changed ones updated in one set-based merge;
+    loading the same snapshot again changes nothing. The reference cache is
+    invalidated when anything changed. Nothing is fetched from USGS; a
+    missing snapshot raises FileNotFoundError.
+
+    Returns
+    -------
+    UpsertReport : namedtuple
+        Number of rows added, changed and unchanged.
+    """
+    data = read_snapshot(table, directory)
+    report = ingest.upsert(db.metadata.tables[table], data, chunksize=chunksize)
+    if report.added or report.changed:
+        reference_cache.invalidate()
+    return report
@@ -0,0 +1,94 @@
+"""
+Ranked trigram and full text search over the reference tables and facilities
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import func, or_
+
+from . import db
+from .models import Facility, MediumCode, SampleParameter
+
+__all__ = ["TARGETS", "match", "rank", "search"]
+
+Target = namedtuple("Target", ["model", "key", "fields", "config", "columns"])
+
+TARGETS = {
+    "parameters": Target(
+        SampleParameter,
+        SampleParameter.param_cd,
+        (SampleParameter.srsname, SampleParameter.description, SampleParameter.casrn),
+        "english",
+        (
+            SampleParameter.param_cd,
+            SampleParameter.srsname,
+            SampleParameter.description,
+            SampleParameter.casrn,
+            SampleParameter.parameter_unit,
+        ),
+    ),
+    "mediums": Target(
+        MediumCode,
+        MediumCode.medium_cd,
+        (MediumCode.medium_name,),
+        "english",
+        (MediumCode.medium_cd, MediumCode.medium_name),
+    ),
+    "facilities": Target(
+        Facility,
+        Facility.facility_id,
+        (Facility.name, Facility.city),
+        "simple",
+        (Facility.facility_id, Facility.name, Facility.city, Facility.state),
+    ),
+}
+
+
+def _tsquery(target, term):
+    return func.plainto_tsquery(target.config, term)
+
+
+def match(kind, term):
+    """
+    A filter for the rows of `kind` matching `term`.
+
+    A row matches when one of its text fields contains `term`, which finds
+    partial words as they are typed, when a field is trigram-similar to
+    `term`, which tolerates typos, or when its search vector matches `term`
+    as full words. All three are served by the GIN indexes on the searched
+    columns, and need only the pg_trgm of PostgreSQL 9.5.
+    """
+    target = TARGETS[kind]
+    pattern = "%" + term + "%"
+    clauses = [field.ilike(pattern) for field in target.fields]
+    # the pg_trgm similarity operator, %, doubled for psycopg2's pyformat
+    # parameters
+    clauses.extend(field.op("%%")(term) for field in target.fields)
+    clauses.append(target.model.search_vector.op("@@")(_tsquery(target, term)))
+    return or_(*clauses)
+
+
+def rank(kind, term):
+    """The relevance of a row of `kind` to `term`; higher is better."""
+    target = TARGETS[kind]
+    similarity = func.greatest(
+        *[func.coalesce(func.similarity(field, term), 0) for field in target.fields]
+    )
+    return similarity + func.ts_rank(target.model.search_vector, _tsquery(target, term))
+
+
+def search(kind, term, limit=10):
+    """
+    The `limit` rows of `kind` most relevant to `term`.
+
+    Returns a list of rows of the target's columns plus a ``score``.
+    """
+    target = TARGETS[kind]
+    score = rank(kind, term).label("score")
+    return (
+        db.session.query(*target.columns, score)
+        .filter(match(kind, term))
+        .order_by(score.desc(), target.key)
+        .limit(limit)
+        .all()
+    )
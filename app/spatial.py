@@ -0,0 +1,67 @@
+"""
+Bounding-box and radius filters on PostGIS geometry columns
+"""
+
+import math
+from flask import abort, request
+from geoalchemy2.types import Geography
+from sqlalchemy import func
+from . import db
+
+SRID = 4326
+
+_GEOGRAPHY = Geography(srid=SRID)
+
+# metres in one degree of latitude, the shortest a degree gets
+_METERS_PER_DEGREE = 110574.0
+
+
+def _floats(name, count):
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        numbers = [float(number) for number in value.split(",")]
+    except ValueError:
+        abort(400)
+    if len(numbers) != count:
+        abort(400)
+    return numbers
+
+
+def _degrees(meters, latitude):
+    """Degrees that cover at least `meters` in any direction at `latitude`."""
+    return meters / (_METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+
+
+def spatial_filter(query, geometry):
+    """
+    Apply the optional ``bbox`` and ``near``/``radius`` request arguments.
+
+    ``bbox=minx,miny,maxx,maxy`` keeps rows whose geometry intersects the
+    envelope. ``near=lon,lat&radius=km`` keeps rows within `radius`
+    kilometres of the point, measured on the spheroid. Both first narrow the
+    rows with the bounding-box operator, so the GiST index on `geometry` is
+    used.
+    """
+    bbox = _floats("bbox", 4)
+    if bbox is not None:
+        envelope = func.ST_MakeEnvelope(*bbox, SRID)
+        query = query.filter(func.ST_Intersects(geometry, envelope))
+
+    near = _floats("near", 2)
+    if near is not None:
+        radius = request.args.get("radius", type=float)
+        if radius is None or radius <= 0:
+            abort(400)
+        longitude, latitude = near
+        meters = radius * 1000
+        point = func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), SRID)
+        query = query.filter(
+            geometry.intersects(func.ST_Expand(point, _degrees(meters, latitude))),
+            func.ST_DWithin(
+                db.cast(geometry, _GEOGRAPHY), db.cast(point, _GEOGRAPHY), meters
+            ),
+        )
+
+    return query
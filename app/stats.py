@@ -0,0 +1,520 @@
+"""
+Vectorized statistics for censored sample results
+"""
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+__all__ = [
+    "Groups",
+    "censored_values",
+    "kaplan_meier",
+    "mann_kendall",
+    "sen_slope",
+    "prediction_limit",
+    "summarize",
+]
+
+# cells of the pairwise (group, i, j) arrays built at once by _blocks; groups
+# of more than _MAX_WIDTH rows are too big for one and are left to _large_groups
+_MAX_CELLS = 2**22
+_MAX_WIDTH = 2**11
+
+# below this many results the cost of starting processes and sending them the
+# rows is more than summarize saves by spreading the groups across them
+_MIN_PARALLEL_ROWS = 1_000_000
+
+_DAYS_PER_YEAR = 365.25
+
+
+def _special():
+    try:
+        from scipy import special
+    except ImportError:
+        raise ImportError(
+            "trend tests and prediction limits need scipy; install it with "
+            "`pip install envirobase[stats]`"
+        )
+    return special
+
+
+class Groups(object):
+    """
+    Rows partitioned into groups by one or more keys.
+
+    Parameters
+    ----------
+    *keys : array_like
+        Arrays of the same length, such as sample_id and param_cd. Rows with
+        a missing key belong to no group.
+
+    Attributes
+    ----------
+    codes : numpy.ndarray
+        The group of each row, from 0 to ``size - 1``, or -1.
+    index : pandas.Index
+        The keys of each group, sorted.
+    size : int
+        The number of groups.
+    """
+
+    def __init__(self, *keys):
+        if len(keys) == 1:
+            codes, index = pd.factorize(pd.Index(keys[0]), sort=True)
+        else:
+            codes, index = pd.MultiIndex.from_arrays(keys).factorize(sort=True)
+        self.codes = np.asarray(codes, dtype=np.intp)
+        self.index = index
+        self.size = len(index)
+
+    @classmethod
+    def from_codes(cls, codes, size):
+        """Groups of rows already numbered from 0 to ``size - 1``."""
+        groups = cls.__new__(cls)
+        groups.codes = np.asarray(codes, dtype=np.intp)
+        groups.index = pd.RangeIndex(size)
+        groups.size = size
+        return groups
+
+    def __len__(self):
+        return self.size
+
+    def counts(self):
+        """The number of rows in each group."""
+        return np.bincount(self.codes[self.codes >= 0], minlength=self.size)
+
+
+def _floats(values, length):
+    if values is None:
+        return np.full(length, np.nan)
+    return np.asarray(values, dtype=float)
+
+
+def censored_values(result, flag=None, detection_limit=None, reporting_limit=None):
+    """
+    Values and censoring of results, as SampleResult.non_detect decides it.
+
+    A result is censored when it is flagged '<', or when it has a detection
+    limit and is missing or below it. Censored results take the value of
+    their detection limit, or else their reporting limit.
+
+    Parameters
+    ----------
+    result, flag, detection_limit, reporting_limit : array_like
+        The analysis_result, analysis_flag, detection_limit and
+        reporting_limit of each row. All but `result` are optional.
+
+    Returns
+    -------
+    values : numpy.ndarray of float
+    censored : numpy.ndarray of bool
+    """
+    result = np.asarray(result, dtype=float)
+    detection_limit = _floats(detection_limit, len(result))
+    reporting_limit = _floats(reporting_limit, len(result))
+    if flag is None:
+        censored = np.zeros(len(result), dtype=bool)
+    else:
+        censored = np.asarray(flag, dtype=object) == "<"
+    censored |= ~np.isnan(detection_limit) & (
+        np.isnan(result) | (result < detection_limit)
+    )
+    limit = np.where(np.isnan(detection_limit), reporting_limit, detection_limit)
+    limit = np.where(np.isnan(limit), result, limit)
+    return np.where(censored, limit, result), censored
+
+
+def _days(dates):
+    """Dates as float days since the epoch, NaN where there is no date."""
+    dates = pd.to_datetime(pd.Series(np.asarray(dates)))
+    days = dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(float)
+    days[dates.isna().to_numpy()] = np.nan
+    return days
+
+
+def _runs(*sorted_keys):
+    """Whether each row starts a run of equal keys; the keys must be sorted."""
+    starts = np.zeros(len(sorted_keys[0]), dtype=bool)
+    starts[:1] = True
+    for key in sorted_keys:
+        starts[1:] |= key[1:] != key[:-1]
+    return starts
+
+
+def kaplan_meier(values, censored, groups):
+    """
+    Kaplan-Meier mean and standard deviation of left-censored values.
+
+    The distribution of each group is estimated from its detected values,
+    with each censored value counted as below its limit. Probability left
+    below the lowest detected value is put on that value, as EPA ProUCL
+    does, so the mean is never below the lowest detect. The standard
+    deviation is scaled by n / (n - 1), so without censoring both are the
+    sample mean and standard deviation.
+
+    Parameters
+    ----------
+    values : array_like of float
+        Detected results and the limits of censored ones, see
+        `censored_values`.
+    censored : array_like of bool
+    groups : Groups
+
+    Returns
+    -------
+    mean, sd : numpy.ndarray
+        One value per group, NaN for groups without a detected value.
+    """
+    values = np.asarray(values, dtype=float)
+    censored = np.asarray(censored, dtype=bool)
+    keep = (groups.codes >= 0) & ~np.isnan(values)
+    codes, values, censored = groups.codes[keep], values[keep], censored[keep]
+    order = np.lexsort((values, codes))
+    codes, values, detected = codes[order], values[order], ~censored[order]
+
+    mean = np.full(groups.size, np.nan)
+    sd = np.full(groups.size, np.nan)
+    if not len(values):
+        return mean, sd
+
+    # runs of equal values in each group, ascending; a run is at risk with
+    # every row of its group at or below it, censored ones included
+    rows = np.arange(len(values))
+    group_start = np.maximum.accumulate(np.where(_runs(codes), rows, 0))
+    starts = _runs(codes, values)
+    run = np.cumsum(starts) - 1
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(values)) - 1
+    run_group, run_value = codes[first], values[first]
+    at_risk = last - group_start[first] + 1
+    events = np.bincount(run, weights=detected, minlength=len(first))
+
+    # the distribution function just above each run is the product of the
+    # factors of the runs above it; only a group's lowest run can have a
+    # factor of 0, and no run is below it
+    factor = 1 - events / at_risk
+    log_factor = np.log(np.where(factor > 0, factor, 1.0))
+    cumulative = np.cumsum(log_factor)
+    runs = np.arange(len(first))
+    group_first = np.maximum.accumulate(np.where(_runs(run_group), runs, 0))
+    within = cumulative - (cumulative - log_factor)[group_first]
+    total = np.bincount(run_group, weights=log_factor, minlength=groups.size)
+    above = np.exp(total[run_group] - within)
+
+    mass = above * events / at_risk
+    detected_runs = np.flatnonzero(events > 0)
+    lowest = detected_runs[_runs(run_group[detected_runs])]
+    mass[lowest] = above[lowest]
+
+    found = np.bincount(run_group, weights=events, minlength=groups.size) > 0
+    n = np.bincount(codes, minlength=groups.size)
+    mean = np.bincount(run_group, weights=mass * run_value, minlength=groups.size)
+    variance = np.bincount(
+        run_group,
+        weights=mass * (run_value - mean[run_group]) ** 2,
+        minlength=groups.size,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sd = np.sqrt(variance * n / (n - 1))
+    mean[~found] = np.nan
+    sd[~found | (n < 2)] = np.nan
+    return mean, sd
+
+
+def _blocks(codes, size, *columns):
+    """
+    Yield (groups, arrays) with the rows of batches of groups laid out as
+    2-D arrays, one group per row and NaN padded.
+
+    Groups are batched with others of similar size, so padding stays small
+    and each batch's pairwise arrays have at most _MAX_CELLS cells. Groups
+    of more than _MAX_WIDTH rows are skipped; see `_large_groups`. Rows
+    must be sorted by group, and within groups in the order wanted.
+    """
+    counts = np.bincount(codes, minlength=size)
+    width = 2 ** np.ceil(np.log2(np.maximum(counts, 1))).astype(int)
+    per_batch = _MAX_CELLS // (width * width)
+    by_width = np.argsort(width, kind="stable")
+
+    # number the batches, groups of one width at a time; large groups are
+    # left in batch -1
+    batch = np.full(size, -1, dtype=np.intp)
+    slot = np.empty(size, dtype=np.intp)
+    offset = 0
+    for value in np.unique(width[width <= _MAX_WIDTH]):
+        members = by_width[width[by_width] == value]
+        position = np.arange(len(members))
+        batch[members] = offset + position // per_batch[members[0]]
+        slot[members] = position % per_batch[members[0]]
+        offset = batch[members[-1]] + 1
+
+    rows = np.arange(len(codes))
+    column = rows - np.maximum.accumulate(np.where(_runs(codes), rows, 0))
+    order = np.argsort(batch[codes], kind="stable")
+    bounds = np.searchsorted(batch[codes][order], np.arange(offset + 1))
+    for number in range(offset):
+        selected = order[bounds[number] : bounds[number + 1]]
+        if not len(selected):
+            continue
+        members = np.flatnonzero(batch == number)
+        shape = (len(members), width[members[0]])
+        arrays = []
+        for values in columns:
+            array = np.full(shape, np.nan)
+            array[slot[codes[selected]], column[selected]] = values[selected]
+            arrays.append(array)
+        yield members[np.argsort(slot[members])], arrays
+
+
+def _large_groups(codes, size, *columns):
+    """
+    Yield (group, arrays) for each group `_blocks` skips, with its rows of
+    `columns` as 1-D arrays. Rows must be sorted by group.
+    """
+    counts = np.bincount(codes, minlength=size)
+    ends = np.cumsum(counts)
+    for group in np.flatnonzero(counts > _MAX_WIDTH):
+        rows = slice(ends[group] - counts[group], ends[group])
+        yield group, [values[rows] for values in columns]
+
+
+def _in_time_order(dates, values, censored, groups):
+    days = _days(dates)
+    values = np.asarray(values, dtype=float)
+    censored = np.asarray(censored, dtype=bool)
+    keep = (groups.codes >= 0) & ~np.isnan(values) & ~np.isnan(days)
+    codes, days = groups.codes[keep], days[keep]
+    values, censored = values[keep], censored[keep]
+    order = np.lexsort((days, codes))
+    return codes[order], days[order], values[order], censored[order]
+
+
+def _tie_terms(codes, values, size):
+    """The tie correction sum of t(t - 1)(2t + 5) of each group."""
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    starts = np.flatnonzero(_runs(codes, values))
+    t = np.diff(np.append(starts, len(values))).astype(float)
+    return np.bincount(codes[starts], weights=t * (t - 1) * (2 * t + 5), minlength=size)
+
+
+def mann_kendall(dates, values, censored, groups):
+    """
+    Mann-Kendall trend test of each group.
+
+    Censored values are treated as tied with each other and below every
+    detected value, as the Unified Guidance recommends. Rows should be one
+    per sampling event.
+
+    Parameters
+    ----------
+    dates : array_like
+    values : array_like of float
+    censored : array_like of bool
+    groups : Groups
+
+    Returns
+    -------
+    s, variance, z, p : numpy.ndarray
+        The statistic S, its variance corrected for ties, its normal score
+        with continuity correction and the two-sided p-value, one per
+        group. Groups of fewer than three rows have NaN.
+    """
+    special = _special()
+    codes, _, values, censored = _in_time_order(dates, values, censored, groups)
+    if censored.any():
+        floor = np.min(values) - 1
+        values = np.where(censored, floor, values)
+
+    s = np.zeros(groups.size)
+    for members, (x,) in _blocks(codes, groups.size, values):
+        width = x.shape[1]
+        signs = np.sign(x[:, None, :] - x[:, :, None])
+        upper = np.triu(np.ones((width, width), dtype=bool), k=1)
+        s[members] = np.nansum(np.where(upper, signs, 0), axis=(1, 2))
+    for group, (x,) in _large_groups(codes, groups.size, values):
+        s[group] = sum(np.sign(x[i + 1 :] - x[i]).sum() for i in range(len(x) - 1))
+
+    n = np.bincount(codes, minlength=groups.size).astype(float)
+    variance = (n * (n - 1) * (2 * n + 5) - _tie_terms(codes, values, groups.size)) / 18
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(s > 0, s - 1, np.where(s < 0, s + 1, 0)) / np.sqrt(variance)
+    z[variance == 0] = 0
+    p = 2 * special.ndtr(-np.abs(z))
+    for array in (s, variance, z, p):
+        array[n < 3] = np.nan
+    return s, variance, z, p
+
+
+def sen_slope(dates, values, censored, groups):
+    """
+    Sen's slope of each group, in units per year.
+
+    The slope is the median of the slopes between every pair of rows taken
+    on different dates. Censored values are taken at half their limit.
+
+    Parameters
+    ----------
+    dates : array_like
+    values : array_like of float
+    censored : array_like of bool
+    groups : Groups
+
+    Returns
+    -------
+    numpy.ndarray
+        One slope per group, NaN for groups sampled on fewer than two dates.
+    """
+    codes, days, values, censored = _in_time_order(dates, values, censored, groups)
+    values = np.where(censored, values / 2, values)
+
+    slope = np.full(groups.size, np.nan)
+    for members, (t, x) in _blocks(codes, groups.size, days, values):
+        width = x.shape[1]
+        upper = np.triu(np.ones((width, width), dtype=bool), k=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = (x[:, None, :] - x[:, :, None]) / (t[:, None, :] - t[:, :, None])
+        slopes[~np.isfinite(slopes) | ~upper] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            slope[members] = np.nanmedian(slopes.reshape(len(members), -1), axis=1)
+    for group, (t, x) in _large_groups(codes, groups.size, days, values):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = np.concatenate(
+                [(x[i + 1 :] - x[i]) / (t[i + 1 :] - t[i]) for i in range(len(x) - 1)]
+            )
+        slopes = slopes[np.isfinite(slopes)]
+        if len(slopes):
+            slope[group] = np.median(slopes)
+    return slope * _DAYS_PER_YEAR
+
+
+def prediction_limit(mean, sd, n, alpha=0.05, k=1):
+    """
+    Upper prediction limit for the next `k` samples of each group.
+
+    The normal limit mean + t * sd * sqrt(1 + 1/n), with the t quantile
+    Bonferroni adjusted for `k` future samples. Means and standard
+    deviations of censored data should come from `kaplan_meier`.
+
+    Parameters
+    ----------
+    mean, sd, n : array_like
+    alpha : float
+        The false positive rate for each group.
+    k : int
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    special = _special()
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = special.stdtrit(n - 1, 1 - alpha / k)
+        limit = np.asarray(mean) + t * np.asarray(sd) * np.sqrt(1 + 1 / n)
+    return np.where(n < 2, np.nan, limit)
+
+
+def _statistics(codes, size, dates, values, censored, alpha, k):
+    groups = Groups.from_codes(codes, size)
+    n = groups.counts()
+    mean, sd = kaplan_meier(values, censored, groups)
+    s, _, z, p = mann_kendall(dates, values, censored, groups)
+    return {
+        "n": n,
+        "detects": np.bincount(
+            codes[codes >= 0], weights=~censored[codes >= 0], minlength=size
+        ).astype(int),
+        "km_mean": mean,
+        "km_sd": sd,
+        "mk_s": s,
+        "mk_z": z,
+        "mk_p": p,
+        "sen_slope": sen_slope(dates, values, censored, groups),
+        "upl": prediction_limit(mean, sd, n, alpha, k),
+    }
+
+
+def summarize(data, by=("sample_id", "param_cd"), alpha=0.05, k=1, workers=None):
+    """
+    Censored statistics of every group of results, computed in one pass.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Results with sample_date, analysis_result and the columns of `by`,
+        and any of non_detect, analysis_flag, detection_limit and
+        reporting_limit, as from SampleResult.timeseries or a store
+        snapshot.
+    by : sequence of str
+        The columns that form the groups.
+    alpha : float
+        The false positive rate of the prediction limits.
+    k : int
+        The number of future samples the prediction limits cover.
+    workers : int, optional
+        Split the groups across this many processes, once there are
+        _MIN_PARALLEL_ROWS results or more; below that it is slower than a
+        single pass.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by `by`, with the count of results and detects, the
+        Kaplan-Meier mean and standard deviation, the Mann-Kendall S, z and
+        p-value, Sen's slope per year and the upper prediction limit.
+    """
+    by = list(by)
+    groups = Groups(*[data[name].to_numpy() for name in by])
+    values, censored = censored_values(
+        data["analysis_result"],
+        data.get("analysis_flag"),
+        data.get("detection_limit"),
+        data.get("reporting_limit"),
+    )
+    if "non_detect" in data:
+        censored = data["non_detect"].to_numpy(dtype=bool)
+    dates = data["sample_date"].to_numpy()
+
+    if not workers or workers < 2 or groups.size < 2 or len(data) < _MIN_PARALLEL_ROWS:
+        columns = _statistics(
+            groups.codes, groups.size, dates, values, censored, alpha, k
+        )
+    else:
+        # contiguous ranges of groups, several per worker to even out sizes
+        order = np.argsort(groups.codes, kind="stable")
+        order = order[groups.codes[order] >= 0]
+        edges = np.linspace(0, groups.size, min(workers * 4, groups.size) + 1)
+        edges = np.unique(edges.astype(int))
+        bounds = np.searchsorted(groups.codes[order], edges)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _statistics,
+                    groups.codes[rows] - low,
+                    high - low,
+                    dates[rows],
+                    values[rows],
+                    censored[rows],
+                    alpha,
+                    k,
+                )
+                for low, high, rows in (
+                    (edges[i], edges[i + 1], order[bounds[i] : bounds[i + 1]])
+                    for i in range(len(edges) - 1)
+                )
+            ]
+            parts = [future.result() for future in futures]
+        columns = {
+            name: np.concatenate([part[name] for part in parts]) for name in parts[0]
+        }
+
+    index = groups.index
+    if not isinstance(index, pd.MultiIndex):
+        index = pd.Index(index, name=by[0])
+    else:
+        index = index.set_names(by)
+    return pd.DataFrame(columns, index=index)
@@ -0,0 +1,238 @@
+"""
+Local memory-mapped snapshots of a facility's sample results for analytics
+"""
+
+import os
+from datetime import datetime
+from flask import current_app
+from . import db, export
+from .models import SampleId, SampleParameter, SampleResult, Well
+
+__all__ = ["COLUMNS", "Snapshot", "store_path", "load", "build", "refresh"]
+
+# bumped when COLUMNS or the file layout change, so older files are rebuilt
+STORE_FORMAT = "2"
+
+# the watermark in the schema metadata, readable with strptime on Python 3.6
+_WATERMARK_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+# result columns with the screen depths of their well and the metadata of
+# their parameter, in the kinds of export.COLUMNS
+COLUMNS = [
+    ("result_id", "int32"),
+    ("sample_id", "int32"),
+    ("sample_name", "dictionary"),
+    ("sample_type", "dictionary"),
+    ("top_screen", "float64"),
+    ("bottom_screen", "float64"),
+    ("param_cd", "dictionary"),
+    ("parameter_group", "dictionary"),
+    ("parameter_description", "dictionary"),
+    ("parameter_unit", "dictionary"),
+    ("medium_cd", "dictionary"),
+    ("sample_date", "date32"),
+    ("analysis_flag", "dictionary"),
+    ("analysis_result", "float64"),
+    ("analysis_unit", "dictionary"),
+    ("detection_limit", "float64"),
+    ("reporting_limit", "float64"),
+    ("non_detect", "bool_"),
+    ("changed_on", "timestamp"),
+]
+
+_SORT_KEYS = ("sample_id", "param_cd", "sample_date", "result_id")
+
+
+class Snapshot(object):
+    """
+    A facility's results read from a store file.
+
+    `table` is a pyarrow.Table whose buffers point into the memory-mapped
+    file, so opening a snapshot reads no rows until they are used.
+    `watermark` is the latest created_on or updated_on of the stored rows,
+    the database version the snapshot is current to.
+    """
+
+    def __init__(self, table, path):
+        metadata = table.schema.metadata or {}
+        watermark = metadata.get(b"watermark", b"").decode()
+        self.table = table
+        self.path = path
+        self.format = metadata.get(b"format", b"").decode()
+        self.facility_id = int(metadata.get(b"facility_id", b"0"))
+        self.watermark = (
+            datetime.strptime(watermark, _WATERMARK_FORMAT) if watermark else None
+        )
+        self.created = metadata.get(b"created", b"").decode()
+
+    def __repr__(self):
+        return f"Snapshot('{self.facility_id}', {self.table.num_rows} rows)"
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def to_pandas(self):
+        """The results as a DataFrame, with codes as categoricals."""
+        return self.table.to_pandas()
+
+
+def store_path(facility_id, directory=None):
+    directory = directory or current_app.config["ENVIROBASE_STORE_DIR"]
+    return os.path.join(directory, f"facility_{facility_id}.arrow")
+
+
+def _query(facility_id, since=None):
+    changed_on = db.func.coalesce(SampleResult.updated_on, SampleResult.created_on)
+    expressions = {
+        "sample_name": SampleId.sample_name,
+        "sample_type": SampleId.sample_type,
+        # from the table, as Well's own attributes would limit the query
+        # to monitoring wells
+        "top_screen": Well.__table__.c.top_screen,
+        "bottom_screen": Well.__table__.c.bottom_screen,
+        "parameter_group": SampleParameter.group_name,
+        "parameter_description": SampleParameter.description,
+        "parameter_unit": SampleParameter.parameter_unit,
+        "changed_on": changed_on,
+    }
+    columns = [
+        expressions[name] if name in expressions else getattr(SampleResult, name)
+        for name, _ in COLUMNS
+    ]
+    query = (
+        SampleResult.filtered(facility=facility_id)
+        .outerjoin(SampleParameter, SampleResult.param_cd == SampleParameter.param_cd)
+        .with_entities(*columns)
+    )
+    if since is not None:
+        # rows stamped at the watermark itself may have committed after the
+        # snapshot was taken; they are read again and replace their copies
+        query = query.filter(changed_on >= since)
+    return query
+
+
+def _read(facility_id, since=None, batch_size=None):
+    pa = export._pyarrow()
+    statement = _query(facility_id, since).statement
+    batches = export.record_batches(statement, batch_size, COLUMNS)
+    return pa.Table.from_batches(batches, schema=export.schema(COLUMNS))
+
+
+def _count(facility_id):
+    """Rows a full read of the facility returns, counted in the database."""
+    return SampleResult.filtered(facility=facility_id).count()
+
+
+def _sorted(table):
+    """`table` in series order; dictionary columns cannot be sorted directly."""
+    pa = export._pyarrow()
+    import pyarrow.compute as pc
+
+    keys = pa.table(
+        {
+            name: (
+                pc.cast(table[name], pa.string())
+                if pa.types.is_dictionary(table.schema.field(name).type)
+                else table[name]
+            )
+            for name in _SORT_KEYS
+        }
+    )
+    indices = pc.sort_indices(keys, [(name, "ascending") for name in _SORT_KEYS])
+    return table.take(indices)
+
+
+def _save(facility_id, table, directory=None):
+    """Write `table` as the facility's store file and open it."""
+    pa = export._pyarrow()
+    import pyarrow.compute as pc
+
+    path = store_path(facility_id, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    watermark = pc.max(table["changed_on"]).as_py()
+    table = (
+        _sorted(table)
+        .combine_chunks()
+        .replace_schema_metadata(
+            {
+                "format": STORE_FORMAT,
+                "facility_id": str(facility_id),
+                "watermark": (
+                    watermark.strftime(_WATERMARK_FORMAT) if watermark else ""
+                ),
+                "created": datetime.utcnow().isoformat(),
+            }
+        )
+    )
+
+    # uncompressed, so the file can be mapped without decoding; written
+    # aside and renamed so readers never see a partial file
+    partial = f"{path}.partial"
+    with pa.OSFile(partial, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(partial, path)
+    return load(facility_id, directory)
+
+
+def load(facility_id, directory=None):
+    """
+    Open the facility's snapshot, memory-mapped and without copying.
+
+    Raises FileNotFoundError when the facility has no snapshot yet.
+    """
+    pa = export._pyarrow()
+    path = store_path(facility_id, directory)
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return Snapshot(table, path)
+
+
+def build(facility_id, directory=None, batch_size=None):
+    """Snapshot all of the facility's results, replacing any earlier file."""
+    return _save(facility_id, _read(facility_id, batch_size=batch_size), directory)
+
+
+def refresh(facility_id, directory=None, full=False, batch_size=None):
+    """
+    Bring the facility's snapshot up to date and return it.
+
+    Only rows created or updated since the snapshot's watermark are read.
+    Deleted rows leave no timestamp behind, so when the stored row count
+    no longer matches the database the snapshot is rebuilt, as it is with
+    `full`, without a snapshot, or when the file is of an older format.
+    """
+    pa = export._pyarrow()
+    import pyarrow.compute as pc
+
+    try:
+        current = load(facility_id, directory)
+    except FileNotFoundError:
+        current = None
+    if (
+        full
+        or current is None
+        or current.format != STORE_FORMAT
+        or current.table.schema.remove_metadata() != export.schema(COLUMNS)
+    ):
+        return build(facility_id, directory, batch_size)
+
+    changed = _read(facility_id, current.watermark, batch_size)
+    table = current.table.replace_schema_metadata(None)
+    if current.watermark is not None:
+        seen = pc.and_(
+            pc.equal(
+                changed["changed_on"], pa.scalar(current.watermark, pa.timestamp("us"))
+            ),
+            pc.is_in(changed["result_id"], value_set=table["result_id"]),
+        )
+        changed = changed.filter(pc.invert(seen))
+    if changed.num_rows:
+        stale = pc.is_in(table["result_id"], value_set=changed["result_id"])
+        table = pa.concat_tables([table.filter(pc.invert(stale)), changed])
+
+    if _count(facility_id) != table.num_rows:
+        return build(facility_id, directory, batch_size)
+    if not changed.num_rows:
+        return current
+    return _save(facility_id, table, directory)
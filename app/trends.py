@@ -0,0 +1,144 @@
+"""
+Batch trend statistics of every well and parameter, by facility
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+from flask import current_app
+
+from . import db, ingest, stats
+from .models import Facility, SampleResult, TrendResult, Well
+
+__all__ = ["TrendReport", "pending", "series", "analyze", "analyze_trends"]
+
+TrendReport = namedtuple("TrendReport", ["facility_id", "results", "series"])
+
+# stats.summarize columns stored under other names in trend_result
+_COLUMNS = {"n": "result_count", "detects": "detect_count"}
+
+
+def pending(run_id, facility_ids=None):
+    """
+    Facilities of a run whose trends have not been written yet.
+
+    A facility's trends are written in one transaction, so the facilities
+    with any row in trend_result for `run_id` are complete.
+    """
+    query = db.session.query(Facility.facility_id).order_by(Facility.facility_id)
+    if facility_ids:
+        query = query.filter(Facility.facility_id.in_(facility_ids))
+    done = db.session.query(TrendResult.facility_id).filter(
+        TrendResult.run_id == run_id
+    )
+    return [
+        facility_id
+        for (facility_id,) in query.filter(~Facility.facility_id.in_(done.distinct()))
+    ]
+
+
+def _series_query(facility_id):
+    return (
+        SampleResult.query.join(Well, SampleResult.sample_id == Well.sample_id)
+        .filter(SampleResult.facility_id == facility_id)
+        .with_entities(
+            SampleResult.sample_id,
+            SampleResult.param_cd,
+            SampleResult.sample_date,
+            SampleResult.analysis_result,
+            SampleResult.analysis_flag,
+            SampleResult.detection_limit,
+            SampleResult.reporting_limit,
+        )
+    )
+
+
+def series(facility_id):
+    """The results of every monitoring well of a facility, in one query."""
+    statement = _series_query(facility_id).statement
+    return pd.read_sql(statement, db.engine, parse_dates=["sample_date"])
+
+
+def analyze(facility_id, data, alpha=0.05, k=1):
+    """
+    Trend statistics of one facility's series, as trend_result rows.
+
+    Runs in the worker processes of `analyze_trends`, so it reads nothing
+    from the database.
+    """
+    summary = stats.summarize(data, alpha=alpha, k=k).rename(columns=_COLUMNS)
+    dates = data.groupby(["sample_id", "param_cd"])["sample_date"]
+    summary["first_sample_date"] = dates.min().dt.date
+    summary["last_sample_date"] = dates.max().dt.date
+    summary["facility_id"] = facility_id
+    return facility_id, summary.reset_index()
+
+
+def _write(run_id, rows):
+    rows["run_id"] = run_id
+    rows["computed_on"] = datetime.utcnow()
+    # replacing the facility's rows makes re-running a facility safe
+    ingest.bulk_load(
+        TrendResult.__table__,
+        rows,
+        conflict=("run_id", "sample_id", "param_cd"),
+        replace=("run_id", "facility_id"),
+    )
+
+
+def analyze_trends(run_id, facility_ids, workers=None, alpha=0.05, k=1):
+    """
+    Compute and store the trends of every well and parameter of facilities.
+
+    Each facility's series are read in one query in this process, analysed
+    in a pool of `workers` processes and written to trend_result under
+    `run_id` as they finish. Only a few facilities are read ahead of the
+    workers, so memory stays bounded however many there are.
+
+    Parameters
+    ----------
+    run_id : str
+        Names the run. Pass the facilities still `pending` to resume an
+        interrupted run.
+    facility_ids : list of int
+    workers : int, optional
+        Defaults to ENVIROBASE_TREND_WORKERS, or else every core.
+    alpha, k
+        Passed to `stats.summarize` for the prediction limits.
+
+    Yields
+    ------
+    TrendReport
+        One per facility, in the order they finish, with the number of
+        trend_result rows written and of results read.
+    """
+    workers = (
+        workers or current_app.config["ENVIROBASE_TREND_WORKERS"] or os.cpu_count()
+    )
+    remaining = iter(facility_ids)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        exhausted = False
+        while True:
+            while not exhausted and len(running) < 2 * workers:
+                facility_id = next(remaining, None)
+                if facility_id is None:
+                    exhausted = True
+                    break
+                data = series(facility_id)
+                if data.empty:
+                    yield TrendReport(facility_id, 0, 0)
+                    continue
+                future = executor.submit(analyze, facility_id, data, alpha, k)
+                running[future] = len(data)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                count = running.pop(future)
+                facility_id, rows = future.result()
+                _write(run_id, rows)
+                yield TrendReport(facility_id, len(rows), count)
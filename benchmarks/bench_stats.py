@@ -0,0 +1,63 @@
+"""
+Throughput of app.stats.summarize over many (well, parameter) groups.
+
+    python benchmarks/bench_stats.py --groups 10000 --size 24 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import stats  # noqa: E402
+
+
+def synthetic_results(groups, size, censored=0.2, seed=0):
+    """Quarterly results of `groups` wells and parameters, some non-detects."""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(max(size // 2, 3), size * 3 // 2 + 1, groups)
+    group = np.repeat(np.arange(groups), counts)
+    position = np.arange(len(group)) - np.repeat(np.cumsum(counts) - counts, counts)
+    dates = np.datetime64("2000-01-01") + (position * 91).astype("timedelta64[D]")
+    trend = rng.normal(0, 0.05, groups)[group] * position
+    result = np.exp(rng.normal(1, 0.5, len(group)) + trend)
+    detection_limit = np.where(rng.random(len(group)) < censored, 3.0, np.nan)
+    return pd.DataFrame(
+        {
+            "sample_id": group // 20,
+            "param_cd": (group % 20).astype(str),
+            "sample_date": dates,
+            "analysis_result": result,
+            "detection_limit": detection_limit,
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--groups", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=24, help="Mean results per group.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_results(args.groups, args.size)
+    print(f"{args.groups} groups, {len(data)} results")
+    for workers in sorted({1, args.workers}):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            summary = stats.summarize(data, workers=workers)
+            best = min(best, time.perf_counter() - start)
+        print(
+            f"workers={workers}: {best:.3f} s, "
+            f"{len(summary) / best:,.0f} groups/s, {len(data) / best:,.0f} results/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
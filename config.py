@@ -7,6 +7,26 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "hard to guess string"
     SSL_REDIRECT = False
     ENVIROBASE_PER_PAGE = 20
+    ENVIROBASE_MAX_PER_PAGE = 1000
+    ENVIROBASE_YIELD_PER = 1000
+    ENVIROBASE_TILE_CACHE_SIZE = 10000
+    ENVIROBASE_TILE_SIMPLIFY = 0.5
+    ENVIROBASE_BULK_CHUNKSIZE = 50000
+    ENVIROBASE_REFERENCE_CACHE_TTL = 3600
+    ENVIROBASE_SEARCH_MAX_LIMIT = 50
+    ENVIROBASE_MANAGES_DSN = os.environ.get("MANAGES_DSN")
+    ENVIROBASE_MANAGES_LOOKBACK_DAYS = 90
+    ENVIROBASE_SLOW_DB_QUERY_TIME = 0.5
+    ENVIROBASE_METRICS_URL = "/metrics"
+    ENVIROBASE_RESPONSE_CACHE = os.environ.get("ENVIROBASE_RESPONSE_CACHE", "memory")
+    ENVIROBASE_RESPONSE_CACHE_SIZE = 1000
+    ENVIROBASE_RESPONSE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    ENVIROBASE_BATCH_MAX_ITEMS = 10000
+    ENVIROBASE_EXPORT_BATCH_SIZE = 100000
+    ENVIROBASE_TREND_WORKERS = None
+    ENVIROBASE_STORE_DIR = os.environ.get("ENVIROBASE_STORE_DIR") or os.path.join(
+        basedir, "store"
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = True
 
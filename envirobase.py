@@ -1,5 +1,10 @@
 import os
-from app import create_app, db
+import click
+from datetime import datetime
+import pandas as pd
+from app import create_app, db, export, reference, store, trends
+from app.cache import response_cache
+from app.pagination import parse_date
 from flask_migrate import Migrate, upgrade
 from app.models import (
     Boring,
@@ -13,7 +18,11 @@ from app.models import (
     WasteUnit,
     Landfill,
     Impoundment,
+    Lithology,
+    ManagesSync,
     SampleResult,
+    SampleResultSummary,
+    TrendResult,
     Well,
 )
 
@@ -35,6 +44,221 @@ def make_shell_context():
         AbovegroundStorageTank=AbovegroundStorageTank,
         UndergroundStorageTank=UndergroundStorageTank,
         Well=Well,
+        TrendResult=TrendResult,
         Boring=Boring,
+        Lithology=Lithology,
         MediumCode=MediumCode,
+        SampleResultSummary=SampleResultSummary,
+        ManagesSync=ManagesSync,
     )
+
+
+@app.cli.command("load-results")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunksize", type=int, default=None, help="Rows per COPY batch.")
+@click.option(
+    "--rejects",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write rows rejected by unit validation to this CSV file.",
+)
+def load_results(path, chunksize, rejects):
+    """Bulk load sample results from a CSV file."""
+    chunksize = chunksize or app.config["ENVIROBASE_BULK_CHUNKSIZE"]
+    reader = pd.read_csv(
+        path,
+        chunksize=chunksize,
+        dtype={"lab_id": str, "param_cd": str, "medium_cd": str},
+    )
+    report = SampleResult.bulk_load(reader, chunksize=chunksize)
+    click.echo(
+        f"Inserted {report.inserted} results, skipped {report.skipped}, "
+        f"rejected {len(report.rejected)}."
+    )
+    if rejects is not None:
+        report.rejected.to_csv(rejects, index=False)
+
+
+@app.cli.command("refresh-summary")
+def refresh_summary():
+    """Recompute the per well and parameter summary of every result."""
+    SampleResult.refresh_summary()
+    count = SampleResultSummary.query.count()
+    click.echo(f"Refreshed {count} well and parameter summaries.")
+
+
+@app.cli.command("export-results")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(sorted(export.FORMATS)),
+    default=None,
+    help="Output format; by default from the file extension.",
+)
+@click.option("--facility", default=None, help="Facility id or name.")
+@click.option("--well", "wells", multiple=True, help="Well sample name.")
+@click.option("--param", "params", multiple=True, help="USGS parameter code.")
+@click.option("--start", type=parse_date, default=None, help="First YYYY-MM-DD.")
+@click.option("--end", type=parse_date, default=None, help="Last YYYY-MM-DD.")
+@click.option("--batch-size", type=int, default=None, help="Rows per batch.")
+def export_results(path, format_, facility, wells, params, start, end, batch_size):
+    """Export sample results to a Parquet or Arrow IPC file."""
+    if format_ is None:
+        extension = os.path.splitext(path)[1]
+        for name, (_, suffix) in export.FORMATS.items():
+            if extension == suffix:
+                format_ = name
+        if format_ is None:
+            raise click.UsageError("Pass --format or use a .parquet or .arrow path.")
+    if facility is not None and facility.isdigit():
+        facility = int(facility)
+    rows = SampleResult.export(
+        path,
+        format_,
+        facility=facility,
+        wells=list(wells),
+        params=list(params),
+        start=start,
+        end=end,
+        batch_size=batch_size,
+    )
+    click.echo(f"Exported {rows} results to {path}.")
+
+
+@app.cli.command("refresh-store")
+@click.argument("facility_ids", nargs=-1, type=int, required=True)
+@click.option("--full", is_flag=True, help="Rebuild rather than add changed rows.")
+def refresh_store(facility_ids, full):
+    """Update the local analytics snapshots of facilities' results."""
+    for facility_id in facility_ids:
+        snapshot = store.refresh(facility_id, full=full)
+        click.echo(
+            f"facility {facility_id}: {len(snapshot)} results, "
+            f"current to {snapshot.watermark}."
+        )
+
+
+@app.cli.command("analyze-trends")
+@click.option("--run-id", default=None, help="Resume this run; a new one by default.")
+@click.option("--facility", "facility_ids", multiple=True, type=int)
+@click.option("--workers", type=int, default=None, help="Worker processes.")
+@click.option("--alpha", type=float, default=0.05, help="Prediction limit error rate.")
+@click.option(
+    "--future-samples", "k", type=int, default=1, help="Samples a limit covers."
+)
+def analyze_trends(run_id, facility_ids, workers, alpha, k):
+    """Compute trend statistics of every well and parameter into trend_result."""
+    run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    pending = trends.pending(run_id, facility_ids)
+    click.echo(f"Run {run_id}: {len(pending)} facilities to analyze.")
+    written = read = 0
+    with click.progressbar(length=len(pending), label="Facilities") as bar:
+        for report in trends.analyze_trends(run_id, pending, workers, alpha, k):
+            written += report.results
+            read += report.series
+            bar.update(1)
+    click.echo(f"Wrote {written} trends from {read} results.")
+
+
+@app.cli.command("import-gint")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--facility", "facility_id", type=int, default=None)
+@click.option("--workers", type=int, default=4, help="Projects read at once.")
+@click.option("--chunksize", type=int, default=None, help="Rows per read.")
+def import_gint(paths, facility_id, workers, chunksize):
+    """Import boring logs and well construction from gINT projects."""
+    from app.gint_import import import_gint
+
+    for report in import_gint(paths, facility_id, workers, chunksize):
+        if report.facility_id is None:
+            click.echo(f"{report.project}: no facility; wells skipped.")
+        click.echo(
+            f"{report.project}: {report.borings} borings, "
+            f"{report.intervals} lithology intervals, "
+            f"{report.wells_updated} wells updated, {report.wells_added} added."
+        )
+
+
+@app.cli.command("sync-geometries")
+@click.option(
+    "--full", is_flag=True, help="Rewrite every geometry, not only stale ones."
+)
+def sync_geometries(full):
+    """Set point geometries from longitude and latitude."""
+    for model in (Facility, StorageTank, SampleId):
+        count = model.update_geometries(incremental=not full)
+        if count:
+            response_cache.invalidate(model.__tablename__)
+        click.echo(f"{model.__tablename__}: updated {count} geometries.")
+
+
+@app.cli.command("sync-manages")
+@click.option("--dsn", default=None, help="ODBC connection string for MANAGES.")
+@click.option("--site", "sites", multiple=True, help="MANAGES site to sync.")
+@click.option("--full", is_flag=True, help="Ignore the high-water marks.")
+@click.option("--window", default=None, help="Date window per query, e.g. 365D.")
+@click.option("--workers", type=int, default=1, help="Parallel MANAGES queries.")
+def sync_manages(dsn, sites, full, window, workers):
+    """Pull new and changed results from MANAGES into sample_result."""
+    from functools import partial
+    import pyodbc
+    from external.manages import ManagesPool
+    from app.manages_sync import sync_manages
+
+    dsn = dsn or app.config["ENVIROBASE_MANAGES_DSN"]
+    if dsn is None:
+        raise click.UsageError("Set MANAGES_DSN or pass --dsn.")
+    pool = ManagesPool(partial(pyodbc.connect, dsn), size=workers)
+    try:
+        if not sites:
+            with pool.connection() as conxn:
+                cursor = conxn.cursor()
+                sites = [row[0] for row in cursor.execute("SELECT NAME FROM SITE")]
+
+        for report in sync_manages(
+            pool, sites, full=full, window=window, workers=workers
+        ):
+            click.echo(
+                f"{report.site}: pulled {report.pulled} results, "
+                f"{report.changed} new or changed lab reports, "
+                f"inserted {report.inserted}, replaced {report.replaced}, "
+                f"unmapped {report.unmapped}."
+            )
+    finally:
+        pool.close()
+
+
+@app.cli.command("reference-snapshot")
+@click.option(
+    "--table",
+    "tables",
+    multiple=True,
+    type=click.Choice(sorted(reference.SOURCES)),
+    help="Reference table to snapshot; all by default.",
+)
+def reference_snapshot(tables):
+    """Download USGS reference tables into the local snapshots."""
+    for table in tables or sorted(reference.SOURCES):
+        entry = reference.save_snapshot(table, reference.fetch(table))
+        click.echo(f"{table}: {entry['rows']} rows, version {entry['version']}.")
+
+
+@app.cli.command("load-reference")
+@click.option(
+    "--directory",
+    type=click.Path(file_okay=False),
+    default=reference.SNAPSHOT_DIR,
+    help="Directory holding the snapshots and their manifest.",
+)
+def load_reference(directory):
+    """Load the USGS reference snapshots, adding and updating codes."""
+    for table in ("medium_code", "sample_parameter"):
+        try:
+            report = reference.load(table, directory)
+        except FileNotFoundError as e:
+            raise click.ClickException(str(e))
+        click.echo(
+            f"{table}: added {report.added}, changed {report.changed}, "
+            f"unchanged {report.unchanged}."
+        )
@@ -1,55 +1,199 @@
-import pyodbc
+import os
+import sqlite3
+from abc import ABC, abstractmethod
 import pandas
 
-__all__ = ["read_gint"]
+__all__ = [
+    "read_gint",
+    "open_reader",
+    "GintReader",
+    "OdbcReader",
+    "SQLiteReader",
+    "CsvReader",
+    "READERS",
+    "LITHOLOGY_COLUMNS",
+    "WELL_COLUMNS",
+]
 
+LITHOLOGY_COLUMNS = ["PointID", "Depth", "Bottom", "Graphic", "Description"]
 
-def read_gint(gpj_path):
+WELL_COLUMNS = [
+    "PointID",
+    "Mon_Well_Number",
+    "Type_Grout",
+    "Type_Bent",
+    "Type_Screen",
+    "Dia_Screen",
+    "Length_Screen",
+    "Type_Gravel",
+    "Type_Riser",
+    "Dia_Riser",
+    "Spacer_Depths",
+    "Comments",
+    "Top_Bent_Depth",
+    "Top_Gravel_Depth",
+    "Check_Valve_Depth",
+    "Bot_Well_Depth",
+    "Bot_Gravel_Depth",
+]
+
+
+class GintReader(ABC):
     """
-	Function to read gINT database and return
-	boring log data and well construction details
-	in Pandas DataFrame for analysis.
+    Reads the tables of one gINT project.
 
-	Parameters
-	----------
-	gpj_path : str
-	    The path to the gINT .gpj file.
+    Subclasses implement `read_table` for a kind of storage, so projects
+    can be read from the Access .gpj itself or from copies of its tables.
 
-    Returns
-    -------
-    DataFrame :  pandas DataFrame
-        returns a pandas DataFrame.
+    Parameters
+    ----------
+    path : str
+        The project file, or directory for `CsvReader`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def project(self):
+        """The project name, from the file name."""
+        return os.path.splitext(os.path.basename(os.path.normpath(self.path)))[0]
+
+    @abstractmethod
+    def read_table(self, table, columns, chunksize=None):
+        """
+        Yield the `columns` of a gINT `table` as DataFrames of at most
+        `chunksize` rows, or as one DataFrame.
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
 
-	Examples
-	--------
-	>>> from enviropy.external import read_gint
-	>>> cd = read_gint('L:\Internal\gINTw\CD far ccr project.gpj')
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-	"""
+
+class _DbapiReader(GintReader):
+    """A reader of gINT tables through a DB-API connection."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._conxn = None
+
+    @abstractmethod
+    def connect(self):
+        """Open the DB-API connection to the project."""
+
+    def read_table(self, table, columns, chunksize=None):
+        if self._conxn is None:
+            self._conxn = self.connect()
+        # bracket quoting works in both Access and SQLite
+        names = ", ".join(f"[{column}]" for column in columns)
+        query = f"SELECT {names} FROM [{table}]"
+        if chunksize is None:
+            yield pandas.read_sql(query, self._conxn)
+        else:
+            yield from pandas.read_sql(query, self._conxn, chunksize=chunksize)
+
+    def close(self):
+        if self._conxn is not None:
+            self._conxn.close()
+            self._conxn = None
+
+
+class OdbcReader(_DbapiReader):
+    """Reads a gINT .gpj project with the Microsoft Access ODBC driver."""
 
     driver = "{Microsoft Access Driver (*.mdb, *.accdb)}"
-    database = gpj_path
 
-    conxn = pyodbc.connect("DRIVER={0};DBQ={1}".format(driver, database))
+    def connect(self):
+        import pyodbc
+
+        return pyodbc.connect("DRIVER={0};DBQ={1}".format(self.driver, self.path))
+
+
+class SQLiteReader(_DbapiReader):
+    """Reads gINT tables copied into a SQLite database."""
 
-    query = """
+    def connect(self):
+        return sqlite3.connect(self.path)
 
-    SELECT MON_WELL_CONSTR.Mon_Well_Number, MON_WELL_CONSTR.Type_Grout,
-	MON_WELL_CONSTR.Type_Bent, MON_WELL_CONSTR.Type_Screen,
-	MON_WELL_CONSTR.Dia_Screen, MON_WELL_CONSTR.Length_Screen,
-	MON_WELL_CONSTR.Type_Gravel, MON_WELL_CONSTR.Type_Riser,
-	MON_WELL_CONSTR.Dia_Riser, MON_WELL_CONSTR.Spacer_Depths,
-	MON_WELL_CONSTR.Comments, MON_WELL_CONSTR.Top_Bent_Depth,
-	MON_WELL_CONSTR.Top_Gravel_Depth, MON_WELL_CONSTR.Check_Valve_Depth,
-	MON_WELL_CONSTR.Bot_Well_Depth, MON_WELL_CONSTR.Bot_Gravel_Depth,
-	LITHOLOGY.Depth, LITHOLOGY.Bottom, LITHOLOGY.Graphic, LITHOLOGY.Description
-	FROM LITHOLOGY LEFT JOIN MON_WELL_CONSTR ON
-	MON_WELL_CONSTR.PointID = LITHOLOGY.PointID
 
+class CsvReader(GintReader):
+    """Reads gINT tables from a directory of CSV files named after them."""
+
+    def read_table(self, table, columns, chunksize=None):
+        path = os.path.join(self.path, f"{table}.csv")
+        data = pandas.read_csv(path, usecols=columns, chunksize=chunksize)
+        if chunksize is None:
+            yield data
+        else:
+            yield from data
+
+
+# reader of each project file extension; directories are read as CSV
+READERS = {
+    ".gpj": OdbcReader,
+    ".mdb": OdbcReader,
+    ".accdb": OdbcReader,
+    ".db": SQLiteReader,
+    ".sqlite": SQLiteReader,
+}
+
+
+def open_reader(path):
+    """
+    The reader for a gINT project, chosen by its extension in READERS.
+
+    Parameters
+    ----------
+    path : str
+        A .gpj project, a SQLite copy of one, or a directory of CSV files.
+
+    Returns
+    -------
+    GintReader
     """
+    if os.path.isdir(path):
+        return CsvReader(path)
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        return READERS[extension](path)
+    except KeyError:
+        raise ValueError(f"no gINT reader for {extension!r} files")
 
-    data = pandas.read_sql(query, conxn)
 
-    conxn.close()
+def read_gint(gpj_path, reader=None):
+    """
+    Function to read gINT database and return
+    boring log data and well construction details
+    in Pandas DataFrame for analysis.
+
+    Parameters
+    ----------
+    gpj_path : str
+        The path to the gINT .gpj file.
+    reader : GintReader, optional
+        Reads the project instead of the reader `open_reader` picks.
+
+    Returns
+    -------
+    DataFrame :  pandas DataFrame
+        LITHOLOGY left joined to MON_WELL_CONSTR on PointID.
+
+    Examples
+    --------
+    >>> from external import read_gint
+    >>> cd = read_gint('L:\\Internal\\gINTw\\CD far ccr project.gpj')
+
+    """
+
+    with reader or open_reader(gpj_path) as gint:
+        (lithology,) = gint.read_table("LITHOLOGY", LITHOLOGY_COLUMNS)
+        (wells,) = gint.read_table("MON_WELL_CONSTR", WELL_COLUMNS)
 
-    return data
+    data = lithology.merge(wells, on="PointID", how="left")
+    return data[WELL_COLUMNS[1:] + LITHOLOGY_COLUMNS[1:]]
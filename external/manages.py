@@ -1,7 +1,61 @@
-import pyodbc
+import asyncio
+import configparser
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 import pandas
 
-__all__ = ["read_manages3"]
+__all__ = ["read_manages3", "read_manages4", "ManagesPool", "AsyncManages"]
+
+logger = logging.getLogger(__name__)
+
+_RESULTS_QUERY = """
+
+SELECT site.site_id, site.name AS name,
+    sample_results.lab_id, sample_results.location_id,
+    sample_results.sample_date, sample_results.storet_code,
+    site_parameters.param_name,
+    sample_results.lt_measure, sample_results.analysis_result,
+    sample_results.detection_limit, sample_results.RL,
+    sample_results.flags, site_parameters.default_unit
+
+    FROM sample_results
+        LEFT JOIN site_parameters
+            ON sample_results.storet_code = site_parameters.storet_code AND sample_results.site_id = site_parameters.site_id
+        LEFT JOIN locations
+            ON locations.site_id = sample_results.site_id AND locations.location_id = sample_results.location_id
+        LEFT JOIN site
+            ON site.site_id = locations.site_id
+
+    WHERE (name in ({0})){1}
+"""
+
+_COLUMNS = [
+    "site_id",
+    "name",
+    "lab_id",
+    "location_id",
+    "sample_date",
+    "storet_code",
+    "param_name",
+    "lt_measure",
+    "analysis_result",
+    "detection_limit",
+    "RL",
+    "flags",
+    "default_unit",
+]
+_CATEGORICAL = ["name", "param_name", "default_unit", "lt_measure"]
+_FLOAT32 = ["analysis_result", "detection_limit", "RL"]
+
+# lab_ids per query when reading given lab reports, well under the
+# parameter limits of Access and SQL Server
+_LAB_BATCH = 500
 
 
 def _list_or_tuple(x):
@@ -17,6 +71,416 @@ def _flatten(sequence, to_expand=_list_or_tuple):
             yield item
 
 
+def _read_config(filename="database.ini", section="manages"):
+    """Read pyodbc.connect keyword arguments from a section of an ini file."""
+    parser = configparser.ConfigParser()
+    if not parser.read(filename):
+        raise FileNotFoundError(f"{filename} not found")
+    if not parser.has_section(section):
+        raise KeyError(f"section [{section}] not found in {filename}")
+    return dict(parser.items(section))
+
+
+class ManagesPool(object):
+    """
+    A thread-safe pool of MANAGES connections.
+
+    Connections are opened lazily, up to `size`, and handed out one per
+    checkout. A connection that has been idle for more than `ping_after`
+    seconds, or whose last use raised, is checked with a cheap query before
+    it is reused and replaced with a new connection if it has gone stale.
+
+    Parameters
+    ----------
+    connect : callable
+        Returns a new DB-API connection.
+    size : int
+        Maximum number of open connections.
+    timeout : float, optional
+        Seconds to wait for a free connection before raising queue.Empty;
+        wait indefinitely by default.
+    ping_after : float
+        Idle seconds after which a connection is health checked.
+
+    Examples
+    --------
+    >>> pool = ManagesPool(partial(pyodbc.connect, dsn), size=4)
+    >>> with pool.connection() as conxn:
+    ...     data = pandas.read_sql("SELECT NAME FROM SITE", conxn)
+
+    """
+
+    def __init__(self, connect, size=4, timeout=None, ping_after=30):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    @property
+    def opened(self):
+        """Number of connections currently open."""
+        return self._opened
+
+    def _open(self):
+        conxn = self._connect()
+        logger.info("opened MANAGES connection (%d of %d)", self._opened, self.size)
+        return conxn
+
+    def _discard(self, conxn):
+        with self._lock:
+            self._opened -= 1
+        try:
+            conxn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conxn):
+        try:
+            cursor = conxn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def acquire(self):
+        """Check out a connection, opening or waiting for one as needed."""
+        try:
+            conxn, released = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self.size
+                if grow:
+                    self._opened += 1
+            if grow:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            conxn, released = self._idle.get(timeout=self.timeout)
+
+        if time.monotonic() - released > self.ping_after and not self._healthy(conxn):
+            logger.warning("reconnecting stale MANAGES connection")
+            self._discard(conxn)
+            with self._lock:
+                self._opened += 1
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        return conxn
+
+    def release(self, conxn, suspect=False):
+        """Return a connection; a `suspect` one is checked on its next use."""
+        with self._lock:
+            # checked under the lock so close() cannot miss a connection
+            # queued while it drains
+            if not self._closed:
+                self._idle.put((conxn, float("-inf") if suspect else time.monotonic()))
+                return
+        self._discard(conxn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the current thread.
+
+        Nested checkouts in the same thread share the outer connection.
+        """
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            yield held[0]
+            return
+
+        conxn = self.acquire()
+        self._local.held = (conxn,)
+        suspect = False
+        try:
+            yield conxn
+        except Exception:
+            suspect = True
+            raise
+        finally:
+            self._local.held = None
+            self.release(conxn, suspect=suspect)
+
+    def close(self):
+        """Close the idle connections; checked-out ones close on release."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conxn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conxn)
+
+
+class _Connections(object):
+    """
+    Connections for the workers of one extraction.
+
+    From a ManagesPool, a connection is checked out per query, so more
+    workers than pooled connections simply wait their turn. From a plain
+    connect callable, each worker thread opens one connection on first use
+    and keeps it until the extraction is closed.
+    """
+
+    def __init__(self, connect):
+        self._pool = connect if isinstance(connect, ManagesPool) else None
+        self._connect = connect
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self):
+        if self._pool is not None:
+            with self._pool.connection() as conxn:
+                yield conxn
+            return
+
+        conxn = getattr(self._local, "conxn", None)
+        if conxn is None:
+            conxn = self._local.conxn = self._connect()
+            with self._lock:
+                self._opened.append(conxn)
+        yield conxn
+
+    def close(self):
+        with self._lock:
+            for conxn in self._opened:
+                conxn.close()
+            self._opened = []
+
+
+def _compact(data):
+    """Cast a chunk of results to the compact dtype layout."""
+    data["sample_date"] = pandas.to_datetime(data["sample_date"])
+    for column in _CATEGORICAL:
+        data[column] = data[column].astype("category")
+    for column in _FLOAT32:
+        data[column] = pandas.to_numeric(data[column]).astype("float32")
+    return data
+
+
+def _concat(chunks):
+    """Concatenate compact chunks without losing the categorical dtypes."""
+    chunks = list(chunks)
+    if not chunks:
+        return _compact(pandas.DataFrame(columns=_COLUMNS))
+    for column in _CATEGORICAL:
+        categories = pandas.Index([])
+        for chunk in chunks:
+            categories = categories.union(chunk[column].cat.categories)
+        for chunk in chunks:
+            chunk[column] = chunk[column].cat.set_categories(categories)
+    return pandas.concat(chunks, ignore_index=True)
+
+
+def _windows(connections, start, end, window):
+    """
+    Split [start, end) into half-open date windows of frequency `window`.
+
+    Open ends are None. Undated results fall in the first window when no
+    start is given.
+    """
+    if window is None:
+        return [(start, end)]
+
+    first, last = start, end
+    if first is None or last is None:
+        with connections.checkout() as conxn:
+            cursor = conxn.cursor()
+            cursor.execute(
+                "SELECT MIN(sample_date), MAX(sample_date) FROM sample_results"
+            )
+            low, high = cursor.fetchone()
+        first = low if first is None else first
+        last = high if last is None else last
+    if first is None or last is None:
+        return [(start, end)]
+
+    first, last = pandas.Timestamp(first), pandas.Timestamp(last)
+    edges = [
+        edge.to_pydatetime()
+        for edge in pandas.date_range(first, last, freq=window)
+        if first < edge < last or (end is None and edge == last)
+    ]
+    bounds = [start] + edges + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _query(sites, lower, upper, undated, lab_ids=None):
+    clauses = []
+    params = list(sites)
+    if lab_ids is not None:
+        clauses.append(
+            "sample_results.lab_id IN ({0})".format(",".join("?" * len(lab_ids)))
+        )
+        params.extend(lab_ids)
+    if lower is not None:
+        clauses.append("sample_results.sample_date >= ?")
+        params.append(lower)
+    if upper is not None:
+        if undated:
+            clauses.append(
+                "(sample_results.sample_date < ? OR sample_results.sample_date IS NULL)"
+            )
+        else:
+            clauses.append("sample_results.sample_date < ?")
+        params.append(upper)
+    where = "".join(" AND " + clause for clause in clauses)
+    return _RESULTS_QUERY.format(",".join("?" * len(sites)), where), tuple(params)
+
+
+def _chunked(data, chunksize):
+    if chunksize is None:
+        yield data
+        return
+    for offset in range(0, len(data), chunksize):
+        yield data.iloc[offset : offset + chunksize].reset_index(drop=True)
+
+
+def _read_manages4(
+    connections, sites, start, end, window, site_batch, workers, chunksize, lab_ids
+):
+    try:
+        windows = _windows(connections, start, end, window)
+        lab_batches = [None]
+        if lab_ids is not None:
+            lab_batches = [
+                lab_ids[offset : offset + _LAB_BATCH]
+                for offset in range(0, len(lab_ids), _LAB_BATCH)
+            ]
+        tasks = [
+            (
+                sites[offset : offset + site_batch],
+                lower,
+                upper,
+                start is None and i == 0,
+                lab_batch,
+            )
+            for offset in range(0, len(sites), site_batch)
+            for i, (lower, upper) in enumerate(windows)
+            for lab_batch in lab_batches
+        ]
+
+        def run(task):
+            query, params = _query(*task)
+            with connections.checkout() as conxn:
+                data = pandas.read_sql(query, conxn, params=params)
+            return _compact(data)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            tasks = iter(tasks)
+            # keep at most `workers` tasks ahead of the consumer, so memory
+            # use is bounded by the chunks in flight, not the whole result
+            for task in tasks:
+                pending.append(executor.submit(run, task))
+                if len(pending) == workers:
+                    break
+            while pending:
+                data = pending.popleft().result()
+                for task in tasks:
+                    pending.append(executor.submit(run, task))
+                    break
+                yield from _chunked(data, chunksize)
+    finally:
+        connections.close()
+
+
+def read_manages4(
+    connect,
+    site=None,
+    start=None,
+    end=None,
+    window=None,
+    site_batch=None,
+    workers=1,
+    chunksize=None,
+    lab_id=None,
+):
+    """
+    Read sample results from a MANAGES 4.x database, optionally split into
+    chunks that are extracted in parallel.
+
+    The extraction is split by site, `site_batch` sites at a time, and by
+    date `window`. Each chunk is one query, run on a pool of `workers`
+    threads that each hold their own connection.
+
+    Parameters
+    ----------
+    connect : callable or ManagesPool
+        Returns a new DB-API connection, such as ``pyodbc.connect`` bound
+        to the connection parameters, called once per worker thread. Or a
+        ManagesPool to check connections out of, one per query.
+    site : list of str, optional
+        Site names to read; all sites by default.
+    start, end : datetime, optional
+        Read results with ``start <= sample_date < end``.
+    window : str, optional
+        pandas frequency of the date windows, such as ``"365D"`` or ``"QS"``.
+    site_batch : int, optional
+        Number of sites per chunk; all sites in one chunk by default.
+    workers : int
+        Number of connections extracting chunks at the same time.
+    chunksize : int, optional
+        If given, return an iterator of DataFrames of at most `chunksize`
+        rows instead of a single DataFrame.
+    lab_id : list of str, optional
+        Read only the results of these lab reports.
+
+    Returns
+    -------
+    DataFrame or iterator of DataFrame
+        Results with categorical ``name``, ``param_name``,
+        ``default_unit`` and ``lt_measure`` and float32 results.
+
+    Examples
+    --------
+    >>> from functools import partial
+    >>> connect = partial(pyodbc.connect, **params)
+    >>> for chunk in read_manages4(connect, window="365D", workers=4, chunksize=100000):
+    ...     process(chunk)
+
+    """
+
+    connections = _Connections(connect)
+    if site is None:
+        with connections.checkout() as conxn:
+            site = pandas.read_sql("SELECT NAME FROM SITE", conxn).iloc[:, 0]
+    sites = list(_flatten(site))
+    if site_batch is None:
+        site_batch = max(len(sites), 1)
+
+    chunks = _read_manages4(
+        connections,
+        sites,
+        start,
+        end,
+        window,
+        site_batch,
+        workers,
+        chunksize,
+        None if lab_id is None else list(lab_id),
+    )
+    if chunksize is not None:
+        return chunks
+    return _concat(chunks)
+
+
 def read_manages3(mdb_path):
     """
     Function to read a MANAGES 3.x database and return
@@ -39,6 +503,8 @@ def read_manages3(mdb_path):
 
     """
 
+    import pyodbc
+
     driver = "{Microsoft Access Driver (*.mdb, *.accdb)}"
     database = mdb_path
 
@@ -69,11 +535,14 @@ class Manages(object):
 
     Parameters
     ----------
-    server : str
-        The name of the server.
+    filename : str
+        The ini file holding the pyodbc.connect arguments.
+
+    section : str
+        The section of `filename` to read.
 
-    database : str
-	The name of the database
+    pool_size : int
+        The number of connections in the shared ManagesPool.
 
     Returns
     -------
@@ -84,73 +553,138 @@ class Manages(object):
     --------
     >>> from enviropy.external import manages
     >>> db = manages.Manages()
+    >>> with db.pool.connection() as conxn:
+    ...     ...
 
     """
 
     _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = object.__new__(cls)
-
-            try:
-                print("connecting to manages database...")
-                params = config.config(filename="database.ini", section="manages")
-                _conxn = Manages._instance._conxn = pyodbc.connect(**params)
-
-            except (Exception, pyodbc.DatabaseError) as error:
-                print(error)
-                Manages._instance = None
-
-            else:
-                print("connection established")
+    _lock = threading.Lock()
+
+    def __new__(cls, filename="database.ini", section="manages", pool_size=4):
+        import pyodbc
+
+        with cls._lock:
+            if cls._instance is None:
+                params = _read_config(filename, section)
+                instance = object.__new__(cls)
+                instance._pool = ManagesPool(
+                    partial(pyodbc.connect, **params), size=pool_size
+                )
+                logger.info(
+                    "MANAGES pool of %d connections from [%s] in %s",
+                    pool_size,
+                    section,
+                    filename,
+                )
+                cls._instance = instance
 
         return cls._instance
 
-    def __init__(self):
-        self._conxn = self._instance._conxn
-
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._conxn.close()
+        # the pool is shared by every user of the singleton; see close()
+        pass
 
-    def site_names(self):
-        return pandas.read_sql("SELECT NAME FROM SITE", self._conxn)
+    @property
+    def pool(self):
+        return self._pool
+
+    @classmethod
+    def close(cls):
+        """Close the pooled connections and forget the singleton."""
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance._pool.close()
+                cls._instance = None
 
-    def get_results(self, site=None):
+    def site_names(self):
+        with self._pool.connection() as conxn:
+            return pandas.read_sql("SELECT NAME FROM SITE", conxn)
+
+    def get_results(
+        self,
+        site=None,
+        start=None,
+        end=None,
+        window=None,
+        site_batch=None,
+        workers=1,
+        chunksize=None,
+    ):
         """
         query Manages database by Site
 
+        The extraction can be split by site and date window and run on
+        several connections at once; see `read_manages4` for the arguments.
+
         """
 
-        query = """
+        if site is None:
+            site = self.site_names().iloc[:, 0]
 
-        SELECT site.site_id, site.name,
-	sample_results.lab_id, sample_results.location_id,
-	sample_results.sample_date, site_parameters.param_name,
-	sample_results.lt_measure, sample_results.analysis_result,
-	sample_results.detection_limit, sample_results.RL,
-	sample_results.flags, site_parameters.default_unit
-
-	FROM sample_results
-	    LEFT JOIN site_parameters
-	        ON sample_results.storet_code = site_parameters.storet_code AND sample_results.site_id = site_parameters.site_id
-            LEFT JOIN locations
-		ON locations.site_id = sample_results.site_id AND locations.location_id = sample_results.location_id
-	    LEFT JOIN site
-                ON site.site_id = locations.site_id
-
-        WHERE (name in ({0}))
-        """
-        if site is not None:
-            query = query.format(",".join("?" * len(site)))
-            query_params = tuple(_flatten(site))
+        return read_manages4(
+            self._pool,
+            site=site,
+            start=start,
+            end=end,
+            window=window,
+            site_batch=site_batch,
+            workers=workers,
+            chunksize=chunksize,
+        )
 
-        else:
-            all_sites = self.site_names()["NAME"]
-            query = query.format(",".join("?" * len(all_sites)))
-            query_params = tuple(_flatten(all_sites))
 
-        return pandas.read_sql(query, self._conxn, params=query_params)
+class AsyncManages(object):
+    """
+    Run Manages queries in an executor, for use from asyncio code.
+
+    Parameters
+    ----------
+    manages : Manages, optional
+        Defaults to the Manages singleton.
+    executor : concurrent.futures.Executor, optional
+        Defaults to the event loop's default executor.
+
+    Examples
+    --------
+    >>> db = AsyncManages()
+    >>> sites = await db.site_names()
+    >>> async for chunk in db.iter_results(window="365D", chunksize=100000):
+    ...     process(chunk)
+
+    """
+
+    def __init__(self, manages=None, executor=None):
+        self._manages = manages if manages is not None else Manages()
+        self._executor = executor
+
+    async def _run(self, func, *args, **kwargs):
+        # the running loop; get_running_loop needs Python 3.7
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
+        )
+
+    async def site_names(self):
+        return await self._run(self._manages.site_names)
+
+    async def get_results(self, site=None, **kwargs):
+        """Read results into one DataFrame; see Manages.get_results."""
+        if kwargs.get("chunksize") is not None:
+            raise ValueError("use iter_results to read results in chunks")
+        return await self._run(self._manages.get_results, site, **kwargs)
+
+    async def iter_results(self, site=None, chunksize=100000, **kwargs):
+        """Read results as DataFrames of at most `chunksize` rows."""
+        chunks = await self._run(
+            self._manages.get_results, site, chunksize=chunksize, **kwargs
+        )
+        done = object()
+        while True:
+            chunk = await self._run(next, chunks, done)
+            if chunk is done:
+                break
+            yield chunk
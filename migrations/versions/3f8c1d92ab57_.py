@@ -0,0 +1,35 @@
+"""add manages_sync table
+
+Revision ID: 3f8c1d92ab57
+Revises: e5a19d7b40c2
+Create Date: 2026-10-18 13:12:44.207133
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3f8c1d92ab57"
+down_revision = "e5a19d7b40c2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "manages_sync",
+        sa.Column("site_name", sa.Text(), nullable=False),
+        sa.Column("lab_id", sa.Text(), nullable=False),
+        sa.Column("facility_id", sa.Integer(), nullable=True),
+        sa.Column("checksum", sa.CHAR(length=32), nullable=False),
+        sa.Column("max_sample_date", sa.Date(), nullable=True),
+        sa.Column("result_count", sa.Integer(), nullable=False),
+        sa.Column("synced_on", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["facility_id"], ["facility.facility_id"]),
+        sa.PrimaryKeyConstraint("site_name", "lab_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("manages_sync")
@@ -0,0 +1,32 @@
+"""add GiST indexes on geometry columns
+
+Revision ID: 7d2e4a91c3b5
+Revises: 4cfb2e905425
+Create Date: 2026-10-18 09:12:31.274105
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "7d2e4a91c3b5"
+down_revision = "4cfb2e905425"
+branch_labels = None
+depends_on = None
+
+# GeoAlchemy creates indexes with these names on create_all, so only
+# databases built some other way are missing them.
+spatial_tables = ["facility", "storage_tank", "waste_unit", "sample_id"]
+
+
+def upgrade():
+    for table in spatial_tables:
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_geometry "
+            f"ON {table} USING gist (geometry)"
+        )
+
+
+def downgrade():
+    for table in spatial_tables:
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_geometry")
@@ -0,0 +1,74 @@
+"""add trigram and full text search indexes
+
+Revision ID: a6d40e7f19b3
+Revises: 3f8c1d92ab57
+Create Date: 2026-10-18 15:02:17.538190
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a6d40e7f19b3"
+down_revision = "3f8c1d92ab57"
+branch_labels = None
+depends_on = None
+
+trigram_columns = [
+    ("sample_parameter", "description"),
+    ("sample_parameter", "srsname"),
+    ("sample_parameter", "casrn"),
+    ("medium_code", "medium_name"),
+    ("facility", "name"),
+    ("facility", "city"),
+]
+
+search_vectors = {
+    "sample_parameter": (
+        "setweight(to_tsvector('simple', coalesce(casrn, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(srsname, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ),
+    "medium_code": (
+        "setweight(to_tsvector('english', coalesce(medium_name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(medium_description, '')), 'B')"
+    ),
+    "facility": "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, ''))",
+}
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in trigram_columns:
+        op.execute(
+            f"CREATE INDEX ix_{table}_{column}_trgm "
+            f"ON {table} USING gin ({column} gin_trgm_ops)"
+        )
+    # set by triggers, as generated columns need PostgreSQL 12
+    for table, expression in search_vectors.items():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector")
+        op.execute(
+            f"CREATE FUNCTION {table}_search_vector_update() RETURNS trigger "
+            f"AS $$ BEGIN NEW.search_vector := (SELECT {expression} "
+            f"FROM (SELECT NEW.*) AS new_row); RETURN NEW; END $$ LANGUAGE plpgsql"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_search_vector_update "
+            f"BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE {table}_search_vector_update()"
+        )
+        op.execute(f"UPDATE {table} SET search_vector = {expression}")
+        op.execute(
+            f"CREATE INDEX ix_{table}_search_vector "
+            f"ON {table} USING gin (search_vector)"
+        )
+
+
+def downgrade():
+    for table in search_vectors:
+        op.execute(f"DROP INDEX ix_{table}_search_vector")
+        op.execute(f"DROP TRIGGER {table}_search_vector_update ON {table}")
+        op.execute(f"DROP FUNCTION {table}_search_vector_update()")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN search_vector")
+    for table, column in trigram_columns:
+        op.execute(f"DROP INDEX ix_{table}_{column}_trgm")
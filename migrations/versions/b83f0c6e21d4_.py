@@ -0,0 +1,28 @@
+"""add sample_result time series index
+
+Revision ID: b83f0c6e21d4
+Revises: 7d2e4a91c3b5
+Create Date: 2026-10-18 10:02:47.518330
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b83f0c6e21d4"
+down_revision = "7d2e4a91c3b5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_sample_result_series",
+        "sample_result",
+        ["facility_id", "sample_id", "param_cd", "sample_date"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_sample_result_series", table_name="sample_result")
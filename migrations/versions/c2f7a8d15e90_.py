@@ -0,0 +1,55 @@
+"""add trend_result table
+
+Revision ID: c2f7a8d15e90
+Revises: a6d40e7f19b3
+Create Date: 2026-10-18 16:40:11.902344
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c2f7a8d15e90"
+down_revision = "a6d40e7f19b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "trend_result",
+        sa.Column("trend_id", sa.Integer(), nullable=False),
+        sa.Column("run_id", sa.Text(), nullable=False),
+        sa.Column("facility_id", sa.Integer(), nullable=True),
+        sa.Column("sample_id", sa.Integer(), nullable=True),
+        sa.Column("param_cd", sa.CHAR(length=5), nullable=True),
+        sa.Column("result_count", sa.Integer(), nullable=False),
+        sa.Column("detect_count", sa.Integer(), nullable=False),
+        sa.Column("first_sample_date", sa.Date(), nullable=True),
+        sa.Column("last_sample_date", sa.Date(), nullable=True),
+        sa.Column("km_mean", sa.Float(), nullable=True),
+        sa.Column("km_sd", sa.Float(), nullable=True),
+        sa.Column("mk_s", sa.Float(), nullable=True),
+        sa.Column("mk_z", sa.Float(), nullable=True),
+        sa.Column("mk_p", sa.Float(), nullable=True),
+        sa.Column("sen_slope", sa.Float(), nullable=True),
+        sa.Column("upl", sa.Float(), nullable=True),
+        sa.Column("computed_on", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["facility_id"], ["facility.facility_id"]),
+        sa.ForeignKeyConstraint(["param_cd"], ["sample_parameter.param_cd"]),
+        sa.ForeignKeyConstraint(["sample_id"], ["sample_id.sample_id"]),
+        sa.PrimaryKeyConstraint("trend_id"),
+        sa.UniqueConstraint("run_id", "sample_id", "param_cd"),
+    )
+    op.create_index(
+        "ix_trend_result_run_facility",
+        "trend_result",
+        ["run_id", "facility_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_trend_result_run_facility", table_name="trend_result")
+    op.drop_table("trend_result")
@@ -0,0 +1,57 @@
+"""add sample_result_summary table
+
+Revision ID: e5a19d7b40c2
+Revises: b83f0c6e21d4
+Create Date: 2026-10-18 10:41:09.882614
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e5a19d7b40c2"
+down_revision = "b83f0c6e21d4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "sample_result_summary",
+        sa.Column("sample_id", sa.Integer(), nullable=False),
+        sa.Column("param_cd", sa.CHAR(length=5), nullable=False),
+        sa.Column("facility_id", sa.Integer(), nullable=True),
+        sa.Column("analysis_unit", sa.Text(), nullable=True),
+        sa.Column("result_count", sa.Integer(), nullable=False),
+        sa.Column("non_detect_count", sa.Integer(), nullable=False),
+        sa.Column("min_result", sa.Float(), nullable=True),
+        sa.Column("max_result", sa.Float(), nullable=True),
+        sa.Column("mean_result", sa.Float(), nullable=True),
+        sa.Column("median_result", sa.Float(), nullable=True),
+        sa.Column("last_result", sa.Float(), nullable=True),
+        sa.Column("last_sample_date", sa.Date(), nullable=True),
+        sa.Column("refreshed_on", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["facility_id"], ["facility.facility_id"]),
+        sa.ForeignKeyConstraint(["param_cd"], ["sample_parameter.param_cd"]),
+        sa.ForeignKeyConstraint(["sample_id"], ["sample_id.sample_id"]),
+        sa.PrimaryKeyConstraint("sample_id", "param_cd"),
+    )
+    op.execute(
+        "INSERT INTO sample_result_summary "
+        "SELECT sample_id, param_cd, min(facility_id), min(analysis_unit), "
+        "count(result_id), "
+        "count(result_id) FILTER (WHERE analysis_flag = '<' OR "
+        "(detection_limit IS NOT NULL AND "
+        "(analysis_result IS NULL OR analysis_result < detection_limit))), "
+        "min(analysis_result), max(analysis_result), avg(analysis_result), "
+        "percentile_cont(0.5) WITHIN GROUP (ORDER BY analysis_result), "
+        "(array_agg(analysis_result ORDER BY sample_date DESC, result_id DESC))[1], "
+        "max(sample_date), now() "
+        "FROM sample_result WHERE sample_id IS NOT NULL AND param_cd IS NOT NULL "
+        "GROUP BY sample_id, param_cd"
+    )
+
+
+def downgrade():
+    op.drop_table("sample_result_summary")
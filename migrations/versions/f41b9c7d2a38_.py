@@ -0,0 +1,37 @@
+"""add lithology table
+
+Revision ID: f41b9c7d2a38
+Revises: c2f7a8d15e90
+Create Date: 2026-10-18 17:25:36.114820
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f41b9c7d2a38"
+down_revision = "c2f7a8d15e90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "lithology",
+        sa.Column("created_on", sa.DateTime(), nullable=True),
+        sa.Column("updated_on", sa.DateTime(), nullable=True),
+        sa.Column("lithology_id", sa.Integer(), nullable=False),
+        sa.Column("boring_id", sa.Text(), nullable=False),
+        sa.Column("top_depth", sa.Float(), nullable=False),
+        sa.Column("bottom_depth", sa.Float(), nullable=True),
+        sa.Column("graphic", sa.Text(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["boring_id"], ["boring.boring_id"]),
+        sa.PrimaryKeyConstraint("lithology_id"),
+        sa.UniqueConstraint("boring_id", "top_depth"),
+    )
+
+
+def downgrade():
+    op.drop_table("lithology")
@@ -5,6 +5,7 @@ setup(
     version='0.1.0',
     packages=find_packages(),
     include_package_date=True,
+    package_data={'app': ['reference_data/*']},
     install_requires=[
         'flask',
         'pyodbc',
@@ -16,4 +17,8 @@ setup(
         'flask_migrate',
         'geoalchemy2',
     ],
+    extras_require={
+        'export': ['pyarrow'],
+        'stats': ['scipy'],
+    },
 )
\ No newline at end of file
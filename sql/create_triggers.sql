@@ -1,21 +1,18 @@
 -- Create trigger to make sure the inserted sample results unit matches
 -- the USGS parameter code unit. This is a quick check instead of 
--- trying to do unit conversions.
+-- trying to do unit conversions. The lookup is a single probe of the
+-- sample_parameter primary key; bulk loads validate the whole batch
+-- with one join before inserting (see SampleResult.bulk_load).
 CREATE OR REPLACE FUNCTION check_unit() 
   RETURNS trigger AS
 $check_unit$
-DECLARE found_unit BIGINT;
-DECLARE tmp_unit VARCHAR;
+DECLARE tmp_unit TEXT;
 BEGIN
-  SELECT COUNT(*) INTO found_unit FROM sample_parameter
+  SELECT parameter_unit INTO tmp_unit FROM sample_parameter
     WHERE sample_parameter.param_cd = NEW.param_cd;
-  IF found_unit > 0 THEN
-    SELECT parameter_unit INTO tmp_unit FROM sample_parameter
-      WHERE sample_parameter.param_cd = NEW.param_cd;	
-          -- check that analysis_unit equals parameter_unit
-	  IF NEW.analysis_unit != tmp_unit THEN
-	    RAISE EXCEPTION 'Units not equal. Convert prior to inserting.';
-	  END IF;
+  -- check that analysis_unit equals parameter_unit
+  IF FOUND AND NEW.analysis_unit != tmp_unit THEN
+    RAISE EXCEPTION 'Units not equal. Convert prior to inserting.';
   END IF;
 RETURN NEW;  
 END;
@@ -26,4 +23,34 @@ CREATE TRIGGER check_insert_unit
   BEFORE INSERT 
   ON sample_result
   FOR EACH ROW 
-  EXECUTE PROCEDURE check_unit();
\ No newline at end of file
+  EXECUTE PROCEDURE check_unit();
+
+-- Keep point geometries in step with longitude/latitude so they never
+-- need a separate backfill (see PointLocation.update_geometries).
+CREATE OR REPLACE FUNCTION sync_point_geometry()
+  RETURNS trigger AS
+$sync_point_geometry$
+BEGIN
+  NEW.geometry := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326);
+RETURN NEW;
+END;
+$sync_point_geometry$
+LANGUAGE plpgsql;
+
+CREATE TRIGGER sync_facility_geometry
+  BEFORE INSERT OR UPDATE OF longitude, latitude
+  ON facility
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_point_geometry();
+
+CREATE TRIGGER sync_storage_tank_geometry
+  BEFORE INSERT OR UPDATE OF longitude, latitude
+  ON storage_tank
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_point_geometry();
+
+CREATE TRIGGER sync_sample_id_geometry
+  BEFORE INSERT OR UPDATE OF longitude, latitude
+  ON sample_id
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_point_geometry();
\ No newline at end of file
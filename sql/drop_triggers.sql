@@ -1 +1,4 @@
-DROP TRIGGER IF EXISTS check_insert_units ON sample_result;
\ No newline at end of file
+DROP TRIGGER IF EXISTS check_insert_unit ON sample_result;
+DROP TRIGGER IF EXISTS sync_facility_geometry ON facility;
+DROP TRIGGER IF EXISTS sync_storage_tank_geometry ON storage_tank;
+DROP TRIGGER IF EXISTS sync_sample_id_geometry ON sample_id;
\ No newline at end of file
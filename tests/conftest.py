@@ -21,6 +21,27 @@ def test_client():
     ctx.pop()
 
 
+@pytest.fixture(scope="module")
+def app():
+    # An application on an in-memory SQLite database, for unit tests that
+    # need an application context but no PostgreSQL.
+    flask_app = create_app("default")
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture(scope="module")
+def postgis_app():
+    # An application on the PostGIS database of TEST_DATABASE_URL, for the
+    # tests that need PostgreSQL; skipped where there is none.
+    if not os.getenv("TEST_DATABASE_URL"):
+        pytest.skip("needs a PostGIS test database")
+    flask_app = create_app("testing")
+    with flask_app.app_context():
+        yield flask_app
+
+
 @pytest.fixture(scope="module")
 def init_database():
     # Create the database and the database table
@@ -0,0 +1,121 @@
+"""
+This file (test_batch.py) contains the unit tests for the api/batch.py file.
+"""
+
+import datetime
+from types import SimpleNamespace
+import pytest
+from app import db
+from app.api.batch import BatchResource, coerce
+from app.models import Facility, StorageTank
+
+
+def test_coerce_column_types():
+    """Test values are checked and converted against their column's type"""
+    table = StorageTank.__table__
+    assert coerce(table.c.capacity, 500) == 500
+    assert coerce(table.c.longitude, -80) == -80.0
+    assert coerce(table.c.date_installed, "2001-02-03") == datetime.date(2001, 2, 3)
+    assert coerce(table.c.stored_substance, None) is None
+    with pytest.raises(ValueError, match="capacity must be an integer"):
+        coerce(table.c.capacity, "500")
+    with pytest.raises(ValueError, match="at most 3 characters"):
+        coerce(table.c.tank_type, "tank")
+    with pytest.raises(ValueError, match="tank_type may not be null"):
+        coerce(table.c.tank_type, None)
+
+
+def test_batch_rejects_invalid_items(test_client):
+    """Test a batch with invalid items is rejected with per item errors"""
+    response = test_client.post(
+        "/api/v1/facilities/batch",
+        json=[
+            {"name": "site a", "state": "OH"},
+            {"state": "IN"},
+            {"name": "site c", "latitude": "north", "colour": "red"},
+            {"name": "site a"},
+        ],
+    )
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body["message"].startswith("3 of 4 items are invalid")
+    errors = {item["index"]: item["errors"] for item in body["items"]}
+    assert errors[1] == ["name is required"]
+    assert "unknown field 'colour'" in errors[2]
+    assert "latitude must be a number" in errors[2]
+    assert errors[3] == ["same name as item 0"]
+
+
+def test_batch_ndjson_parse_error(test_client):
+    """Test NDJSON batches report the line that is not valid JSON"""
+    response = test_client.patch(
+        "/api/v1/storage-tanks/batch",
+        data='{"tank_id": 1, "capacity": 10}\n{"tank_id": 2,\n',
+        content_type="application/x-ndjson",
+    )
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "line 2 is not valid JSON"
+
+
+def test_batch_requires_array(test_client):
+    """Test a batch body must be an array of items"""
+    response = test_client.delete("/api/v1/wells/batch", json={"sample_id": 1})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "bad request"
+
+
+def test_batch_conflict_hides_database_error(app, caplog):
+    """Test a violated constraint is named without the database's message"""
+
+    class IntegrityError(db.engine.dialect.dbapi.IntegrityError):
+        diag = SimpleNamespace(constraint_name="facility_name_key")
+
+    def merge(table):
+        raise IntegrityError(
+            'duplicate key value violates unique constraint "facility_name_key"\n'
+            "DETAIL:  Key (name)=(site a) already exists."
+        )
+
+    with app.test_request_context():
+        _, response = BatchResource(Facility, ["name"], key=["name"])._apply(merge)
+    assert response.status_code == 409
+    assert response.get_json() == {
+        "error": "conflict",
+        "message": "the batch violates facility_name_key; nothing was changed",
+    }
+    assert "Key (name)=(site a) already exists" in caplog.text
+
+
+def test_batch_applied(postgis_app, init_database):
+    """Test a valid batch is created, updated and deleted in the database"""
+    client = postgis_app.test_client()
+    response = client.post(
+        "/api/v1/facilities/batch",
+        json=[
+            {"name": "batch site", "state": "OH"},
+            {"name": "test site 1", "city": "Batch"},
+        ],
+    )
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item["status"] for item in body["items"]] == ["created", "updated"]
+    created, updated = [item["facility_id"] for item in body["items"]]
+    assert Facility.query.get(updated).city == "Batch"
+
+    response = client.patch(
+        "/api/v1/facilities/batch",
+        json=[
+            {"facility_id": created, "city": "Columbus"},
+            {"facility_id": updated, "city": "Batch"},
+        ],
+    )
+    assert response.status_code == 200
+    statuses = [item["status"] for item in response.get_json()["items"]]
+    assert statuses == ["updated", "unchanged"]
+
+    response = client.delete("/api/v1/facilities/batch", json=[created, 999999])
+    assert response.status_code == 200
+    statuses = [item["status"] for item in response.get_json()["items"]]
+    assert statuses == ["deleted", "not_found"]
+    db.session.expire_all()
+    assert Facility.query.get(created) is None
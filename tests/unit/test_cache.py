@@ -0,0 +1,122 @@
+"""
+This file (test_cache.py) contains the unit tests for the cache.py file.
+"""
+
+from datetime import datetime
+from flask import Flask, Response, jsonify
+from app.cache import (
+    CachedResponse,
+    MemoryBackend,
+    ResponseCache,
+    SQLiteBackend,
+    backend_from_url,
+)
+
+
+def _app(cache):
+    app = Flask(__name__)
+    calls = []
+
+    @app.route("/things")
+    @cache.cached("thing")
+    def things():
+        calls.append(1)
+        return jsonify({"calls": len(calls)})
+
+    @app.route("/stream")
+    @cache.cached("thing")
+    def stream():
+        calls.append(1)
+        return Response((chunk for chunk in ["[", "1,", "2", "]"]))
+
+    return app, calls
+
+
+def test_memory_backend_lru():
+    """Test the memory backend evicts the least recently used response"""
+    backend = MemoryBackend(size=2)
+    backend.set("a", CachedResponse(b"a", "text/plain", "1"))
+    backend.set("b", CachedResponse(b"b", "text/plain", "2"))
+    backend.get("a")
+    backend.set("c", CachedResponse(b"c", "text/plain", "3"))
+    assert backend.get("b") is None
+    assert backend.get("a").body == b"a"
+
+
+def test_sqlite_backend_shares_versions(tmp_path):
+    """Test SQLite backends on the same file share responses and versions"""
+    path = str(tmp_path / "cache.db")
+    first, second = SQLiteBackend(path, size=1), SQLiteBackend(path, size=1)
+    counter, _ = first.version("facility")
+    assert second.version("facility")[0] == counter
+    second.bump("facility")
+    assert first.version("facility")[0] == counter + 1
+
+    first.set("a", CachedResponse(b"a", "text/plain", "1"))
+    assert second.get("a") == CachedResponse(b"a", "text/plain", "1")
+    first.set("b", CachedResponse(b"b", "text/plain", "2"))
+    assert second.get("a") is None
+
+
+def test_sqlite_backend_without_upserts(tmp_path):
+    """Test versions and LRU reads work without RETURNING or upserts"""
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), size=2)
+    backend.bump("well")
+    counter, modified = backend.version("well")
+    backend.bump("well")
+    assert backend.version("well") == (counter + 1, modified)
+    assert isinstance(modified, datetime) and not modified.microsecond
+
+    backend.set("a", CachedResponse(b"a", "text/plain", "1"))
+    backend.set("b", CachedResponse(b"b", "text/plain", "2"))
+    assert backend.get("a").body == b"a"
+    backend.set("c", CachedResponse(b"c", "text/plain", "3"))
+    assert backend.get("b") is None
+    assert backend.get("a").body == b"a"
+    assert backend.get("missing") is None
+
+
+def test_backend_from_url(tmp_path):
+    """Test backends are chosen by ENVIROBASE_RESPONSE_CACHE"""
+    assert isinstance(backend_from_url("memory"), MemoryBackend)
+    url = f"sqlite:///{tmp_path / 'cache.db'}"
+    assert isinstance(backend_from_url(url), SQLiteBackend)
+
+
+def test_cached_view_conditional_get():
+    """Test responses are cached, revalidated with 304 and invalidated"""
+    cache = ResponseCache()
+    app, calls = _app(cache)
+    client = app.test_client()
+
+    first = client.get("/things")
+    etag = first.headers["ETag"]
+    assert client.get("/things").get_json() == {"calls": 1}
+    assert client.get("/things?x=1").get_json() == {"calls": 2}
+
+    response = client.get("/things", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(calls) == 2
+
+    cache.invalidate("thing")
+    response = client.get("/things", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json() == {"calls": 3}
+
+
+def test_cached_view_streamed_response():
+    """Test a streamed response is cached once it has been written"""
+    cache = ResponseCache()
+    app, calls = _app(cache)
+    client = app.test_client()
+
+    assert client.get("/stream").data == b"[1,2]"
+    assert client.get("/stream").data == b"[1,2]"
+    assert len(calls) == 1
+
+    cache.max_bytes = 3
+    cache.invalidate("thing")
+    client.get("/stream")
+    client.get("/stream")
+    assert len(calls) == 3
@@ -0,0 +1,141 @@
+"""
+This file (test_export.py) contains the unit tests for the export.py file.
+"""
+
+import datetime
+import io
+import pytest
+from sqlalchemy.dialects import postgresql
+from app import db, export
+from app.models import SampleResult
+
+pa = pytest.importorskip("pyarrow")
+
+TYPES = {
+    "int32": db.Integer,
+    "string": db.Text,
+    "dictionary": db.Text,
+    "date32": db.Date,
+    "float32": db.Float,
+    "bool_": db.Boolean,
+}
+
+ROWS = [
+    (1, "L1", 1, 10, "MW-1", "01002", "WG", datetime.date(2020, 1, 2))
+    + (None, 1.5, "ug/l", 0.5, 1.0, None, False),
+    (2, "L1", 1, 10, "MW-1", "01002", "WG", datetime.date(2020, 4, 2))
+    + ("<", None, "ug/l", 0.5, 1.0, "U", True),
+    (3, "L2", 1, 11, "MW-2", "00940", "WG", datetime.date(2020, 1, 3))
+    + (None, 12.25, "mg/l", None, None, None, False),
+]
+
+
+@pytest.fixture(scope="module")
+def results(app):
+    """A SQLite table of ROWS with the exported columns."""
+    table = db.Table(
+        "export_rows",
+        db.MetaData(),
+        *[db.Column(name, TYPES[kind]()) for name, kind in export.COLUMNS],
+    )
+    table.create(db.engine)
+    db.engine.execute(table.insert(), [dict(zip(table.c.keys(), row)) for row in ROWS])
+    yield table
+
+
+def _read(data, format):
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(pa.BufferReader(data))
+    return pa.ipc.open_stream(data).read_all()
+
+
+def test_record_batches_types(results):
+    """Test rows are read in batches with the export schema"""
+    batches = list(export.record_batches(results.select(), batch_size=2))
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    assert all(batch.schema == export.schema() for batch in batches)
+
+    table = pa.Table.from_batches(batches)
+    assert table.column("sample_date").to_pylist()[0] == datetime.date(2020, 1, 2)
+    assert table.column("analysis_result").to_pylist() == [1.5, None, 12.25]
+    assert table.column("non_detect").to_pylist() == [False, True, False]
+    assert pa.types.is_float32(table.schema.field("detection_limit").type)
+
+
+def test_record_batches_grow_dictionaries(results):
+    """Test later batches keep the codes of earlier ones and add new codes"""
+    first, second = export.record_batches(results.select(), batch_size=2)
+    assert first.column("param_cd").dictionary.to_pylist() == ["01002"]
+    assert second.column("param_cd").dictionary.to_pylist() == ["01002", "00940"]
+    assert second.column("param_cd").indices.to_pylist() == [1]
+
+
+@pytest.mark.parametrize("format", sorted(export.FORMATS))
+def test_write_round_trip(results, format):
+    """Test batches written as Parquet and Arrow IPC read back unchanged"""
+    sink = io.BytesIO()
+    batches = export.record_batches(results.select(), batch_size=1)
+    assert export.write(batches, sink, format) == 3
+
+    table = _read(sink.getvalue(), format)
+    assert table.column("sample_name").to_pylist() == ["MW-1", "MW-1", "MW-2"]
+    assert pa.types.is_dictionary(table.schema.field("analysis_unit").type)
+    assert table.column("analysis_flag").to_pylist() == [None, "<", None]
+
+
+@pytest.mark.parametrize("format", sorted(export.FORMATS))
+def test_stream_matches_write(results, format):
+    """Test a streamed export holds the same rows as a written one"""
+    batches = export.record_batches(results.select(), batch_size=2)
+    data = b"".join(export.stream(batches, format))
+    assert _read(data, format).num_rows == 3
+
+
+def test_write_unknown_format():
+    """Test only Parquet and Arrow IPC can be written"""
+    with pytest.raises(ValueError, match="format must be one of"):
+        export.write([], io.BytesIO(), "csv")
+
+
+def test_export_query_filters_in_sql(results):
+    """Test export filters run in the database in series index order"""
+    query = SampleResult.export_query(
+        facility=1, params=["01002"], start=datetime.date(2020, 1, 1)
+    )
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    assert "sample_result.facility_id = %(facility_id_1)s" in sql
+    assert "sample_result.param_cd IN" in sql
+    assert "sample_result.sample_date >= %(sample_date_1)s" in sql
+    assert sql.endswith(
+        "ORDER BY sample_result.facility_id, sample_result.sample_id, "
+        "sample_result.param_cd, sample_result.sample_date"
+    )
+
+
+def test_export_endpoint_unknown_format(test_client):
+    """Test the export endpoint rejects formats other than parquet and arrow"""
+    response = test_client.get("/api/v1/sample-results/export?format=csv")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "query", ["facility_id=abc", "start=2020-13-01", "sample_id=1&sample_id=x"]
+)
+def test_export_endpoint_invalid_filters(test_client, query):
+    """Test the export endpoint rejects filters it cannot parse"""
+    response = test_client.get(f"/api/v1/sample-results/export?{query}")
+    assert response.status_code == 400
+
+
+def test_export_endpoint_without_pyarrow(test_client, monkeypatch):
+    """Test a missing pyarrow is answered with 501 before anything streams"""
+
+    def missing():
+        raise ImportError("exporting results needs pyarrow")
+
+    monkeypatch.setattr(export, "_pyarrow", missing)
+    response = test_client.get("/api/v1/sample-results/export")
+    assert response.status_code == 501
+    assert response.get_json()["message"] == "exporting results needs pyarrow"
@@ -0,0 +1,50 @@
+"""
+This file (test_facilities.py) contains the unit tests for the api/facilities.py
+file.
+"""
+
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from app.models import Facility, SampleResult
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """Records the arguments of each summary read and returns one row."""
+    calls = []
+
+    def summary(**kwargs):
+        calls.append(kwargs)
+        return pd.DataFrame(
+            {
+                "sample_name": ["MW-1"],
+                "param_cd": ["01002"],
+                "mean_result": [1.5],
+                "median_result": [None],
+                "last_sample_date": pd.to_datetime(["2020-04-01"]),
+            }
+        )
+
+    monkeypatch.setattr(Facility, "query", SimpleNamespace(get_or_404=lambda id: id))
+    monkeypatch.setattr(SampleResult, "summary", summary)
+    return calls
+
+
+def test_facility_summary(app, summaries):
+    """Test the summary is filtered by wells and parameters and serialised"""
+    response = app.test_client().get(
+        "/api/v1/facilities/3/summary?sample_id=10&sample_id=11&param_cd=01002"
+    )
+    assert response.status_code == 200
+    assert summaries == [{"facility": 3, "wells": [10, 11], "params": ["01002"]}]
+    (row,) = response.get_json()["summary"]
+    assert row["last_sample_date"] == "2020-04-01"
+    assert row["median_result"] is None
+
+
+def test_facility_summary_invalid_well(app, summaries):
+    """Test a sample_id that is not a number is rejected with 400"""
+    response = app.test_client().get("/api/v1/facilities/3/summary?sample_id=abc")
+    assert response.status_code == 400
+    assert summaries == []
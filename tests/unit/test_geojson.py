@@ -0,0 +1,80 @@
+"""
+This file (test_geojson.py) contains the unit tests for the api/geojson.py file.
+"""
+
+import json
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+from app.api.geojson import (
+    _postgis_document,
+    postgis_feature,
+    stream_feature_collection,
+)
+from app.api.wells import _properties
+from app.models import Well
+
+
+def _point(i):
+    return {
+        "type": "Feature",
+        "properties": {"id": i},
+        "geometry": {"type": "Point", "coordinates": [-80.0, 40.0]},
+    }
+
+
+def test_stream_feature_collection(test_client, monkeypatch):
+    """Test a streamed FeatureCollection is valid GeoJSON across batches"""
+    monkeypatch.setitem(current_app.config, "ENVIROBASE_YIELD_PER", 2)
+    with current_app.test_request_context():
+        response = stream_feature_collection(
+            range(5), _point, next="http://localhost/next"
+        )
+        assert response.is_streamed
+        collection = json.loads(response.get_data())
+    assert collection["type"] == "FeatureCollection"
+    assert collection["next"] == "http://localhost/next"
+    assert [f["properties"]["id"] for f in collection["features"]] == list(range(5))
+
+
+def test_stream_empty_feature_collection(test_client):
+    """Test an empty query still streams a valid FeatureCollection"""
+    with current_app.test_request_context():
+        response = stream_feature_collection([], _point)
+        collection = json.loads(response.get_data())
+    assert collection == {"type": "FeatureCollection", "features": []}
+
+
+def _sql(clause):
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_postgis_feature(app):
+    """Test a Feature is built with ST_AsGeoJSON and json_build_object"""
+    sql = _sql(postgis_feature(Well.geometry, _properties))
+    assert "ST_AsGeoJSON(sample_id.geometry)" in sql
+    assert "ST_Simplify" not in sql
+    assert "json_build_object(CAST(%(param_5)s AS TEXT), facility.name" in sql
+    assert sql.count("json_build_object") == 2
+
+
+def test_postgis_feature_precision_and_simplify(app):
+    """Test precision and simplify are passed on to PostGIS"""
+    feature = postgis_feature(Well.geometry, _properties, precision=5, simplify=0.001)
+    sql = _sql(feature)
+    assert "ST_AsGeoJSON(ST_Simplify(sample_id.geometry, %(ST_Simplify_1)s)" in sql
+    assert "%(ST_AsGeoJSON_1)s) AS JSON)" in sql
+    assert feature.compile(dialect=postgresql.dialect()).params["ST_AsGeoJSON_1"] == 5
+
+
+def test_postgis_document(app):
+    """Test the whole collection is assembled with json_agg in key order"""
+    feature = postgis_feature(Well.geometry, _properties)
+    query = Well.query.with_entities(
+        Well.sample_id.label("sample_id"), feature.label("feature")
+    )
+    sql = _sql(_postgis_document(query, Well.sample_id).statement)
+    assert (
+        "coalesce(json_agg(anon_2.feature ORDER BY anon_2.sample_id), "
+        "CAST(%(param_4)s AS JSON))"
+    ) in sql
+    assert "FROM (SELECT sample_id.sample_id AS sample_id" in sql
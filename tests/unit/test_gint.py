@@ -0,0 +1,200 @@
+"""
+This file (test_gint.py) contains the unit tests for the gint.py and
+gint_import.py files.
+"""
+
+import sqlite3
+import pandas as pd
+import pytest
+from app import gint_import
+from app.ingest import LoadReport
+from app.models import Boring, Lithology, Well
+from external import gint
+
+LITHOLOGY = pd.DataFrame(
+    {
+        "PointID": ["MW-1", "MW-1", "MW-1", "B-2"],
+        "Depth": [0.0, 5.0, 5.0, 0.0],
+        "Bottom": [5.0, 20.0, 22.0, 10.0],
+        "Graphic": ["CL", "SP", "SW", "ML"],
+        "Description": ["Lean clay", "Sand", "Sand, well graded", "Silt"],
+    }
+)
+
+WELLS = pd.DataFrame(
+    {
+        "PointID": ["MW-1 "],
+        "Mon_Well_Number": ["1"],
+        "Type_Grout": ["Cement"],
+        "Type_Bent": ["Chips"],
+        "Type_Screen": ["PVC 0.010 slot"],
+        "Dia_Screen": [2.0],
+        "Length_Screen": [10.0],
+        "Type_Gravel": ["Sand"],
+        "Type_Riser": ["PVC"],
+        "Dia_Riser": [2.0],
+        "Spacer_Depths": [None],
+        "Comments": ["Flush mount"],
+        "Top_Bent_Depth": [2.0],
+        "Top_Gravel_Depth": [6.0],
+        "Check_Valve_Depth": [None],
+        "Bot_Well_Depth": [18.0],
+        "Bot_Gravel_Depth": [19.0],
+    }
+)
+
+
+@pytest.fixture
+def csv_project(tmp_path):
+    path = tmp_path / "Plant A"
+    path.mkdir()
+    LITHOLOGY.to_csv(path / "LITHOLOGY.csv", index=False)
+    WELLS.to_csv(path / "MON_WELL_CONSTR.csv", index=False)
+    return str(path)
+
+
+@pytest.fixture
+def sqlite_project(tmp_path):
+    path = str(tmp_path / "Plant A.db")
+    with sqlite3.connect(path) as conxn:
+        LITHOLOGY.to_sql("LITHOLOGY", conxn, index=False)
+        WELLS.to_sql("MON_WELL_CONSTR", conxn, index=False)
+    return path
+
+
+def test_open_reader_by_extension(tmp_path, csv_project):
+    """Test readers are chosen by extension, and directories read as CSV"""
+    assert isinstance(gint.open_reader("site.gpj"), gint.OdbcReader)
+    assert isinstance(gint.open_reader("site.db"), gint.SQLiteReader)
+    assert isinstance(gint.open_reader(csv_project), gint.CsvReader)
+    assert gint.open_reader(csv_project).project == "Plant A"
+    with pytest.raises(ValueError):
+        gint.open_reader(str(tmp_path / "site.xlsx"))
+
+
+def test_readers_are_abstract():
+    """Test the reader bases cannot be used without their storage methods"""
+    with pytest.raises(TypeError):
+        gint.GintReader("site.gpj")
+    with pytest.raises(TypeError):
+        gint._DbapiReader("site.gpj")
+
+
+@pytest.mark.parametrize("project", ["csv_project", "sqlite_project"])
+def test_read_table_in_chunks(request, project):
+    """Test a table reads the same whole and in chunks"""
+    with gint.open_reader(request.getfixturevalue(project)) as reader:
+        (whole,) = reader.read_table("LITHOLOGY", gint.LITHOLOGY_COLUMNS)
+        chunks = list(reader.read_table("LITHOLOGY", gint.LITHOLOGY_COLUMNS, 3))
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
+    assert whole["Description"].tolist() == LITHOLOGY["Description"].tolist()
+
+
+def test_read_gint(sqlite_project):
+    """Test lithology is joined to well construction on PointID"""
+    data = gint.read_gint(sqlite_project)
+    assert list(data.columns) == gint.WELL_COLUMNS[1:] + gint.LITHOLOGY_COLUMNS[1:]
+    assert len(data) == len(LITHOLOGY)
+    # "MW-1 " is padded in MON_WELL_CONSTR, as gINT exports often are
+    assert data["Mon_Well_Number"].isna().all()
+
+
+def test_read_project_maps_columns(app, csv_project):
+    """Test a project's rows are mapped onto Well and Lithology columns"""
+    data = gint_import.read_project(gint.open_reader(csv_project), chunksize=2)
+    assert data.project == "Plant A"
+
+    assert set(data.wells.columns) <= set(Well.__table__.columns.keys())
+    well = data.wells.iloc[0]
+    assert well["sample_name"] == "MW-1"
+    assert well["boring_id"] == "Plant A/MW-1"
+    assert (well["top_screen"], well["bottom_screen"]) == (8.0, 18.0)
+    assert well["bottom_boring"] == 22.0
+    assert well["notes"] == "Flush mount"
+
+    assert set(data.lithology.columns) <= set(Lithology.__table__.columns.keys())
+    # the later of two intervals at a depth is kept
+    mw1 = data.lithology[data.lithology["boring_id"] == "Plant A/MW-1"]
+    assert mw1["top_depth"].tolist() == [0.0, 5.0]
+    assert mw1["graphic"].tolist() == ["CL", "SW"]
+
+
+def test_read_project_without_wells(app, tmp_path):
+    """Test a project with no well construction has no wells"""
+    path = tmp_path / "Plant B"
+    path.mkdir()
+    LITHOLOGY.to_csv(path / "LITHOLOGY.csv", index=False)
+    WELLS.iloc[:0].to_csv(path / "MON_WELL_CONSTR.csv", index=False)
+    data = gint_import.read_project(gint.open_reader(str(path)), chunksize=2)
+    assert data.wells.empty
+    assert len(data.lithology) == 3
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Records the writes of an import instead of running them."""
+    calls = {"bulk_load": [], "update": [], "invalidate": []}
+
+    def bulk_load(table, data, conflict, **kwargs):
+        calls["bulk_load"].append((table, data.copy(), conflict, kwargs))
+        return LoadReport(len(data), 0, None, None, 0)
+
+    def update(table, items):
+        calls["update"].append((table, items))
+        return pd.Series(["updated"] * len(items))
+
+    monkeypatch.setattr(gint_import.ingest, "bulk_load", bulk_load)
+    monkeypatch.setattr(gint_import.ingest, "update", update)
+    monkeypatch.setattr(
+        gint_import.response_cache, "invalidate", calls["invalidate"].append
+    )
+    monkeypatch.setattr(gint_import, "_stored_wells", lambda facility_id, names: {})
+    return calls
+
+
+def test_import_gint_adds_wells(app, csv_project, loads, monkeypatch):
+    """Test a project's borings, lithology and new wells are written"""
+    monkeypatch.setattr(gint_import, "_facility_id", lambda project: 7)
+    (report,) = gint_import.import_gint([csv_project], workers=2, chunksize=2)
+    assert report == ("Plant A", 7, 2, 0, 1, 3)
+
+    borings, lithology, wells = loads["bulk_load"]
+    assert borings[0] is Boring.__table__
+    assert sorted(borings[1]["boring_id"]) == ["Plant A/B-2", "Plant A/MW-1"]
+    assert lithology[0] is Lithology.__table__
+    assert lithology[3]["replace"] == ("boring_id",)
+    assert wells[0] is Well.__table__
+    assert wells[1]["facility_id"].tolist() == [7]
+    assert wells[1]["sample_type"].tolist() == ["monitoring_well"]
+    assert loads["update"] == []
+    assert loads["invalidate"] == ["sample_id"]
+
+
+def test_import_gint_updates_stored_wells(app, csv_project, loads, monkeypatch):
+    """Test a well of a stored location updates it with its known values"""
+    monkeypatch.setattr(
+        gint_import, "_stored_wells", lambda facility_id, names: {"MW-1": 42}
+    )
+    (report,) = gint_import.import_gint([csv_project], facility_id=3)
+    assert (report.facility_id, report.wells_updated, report.wells_added) == (3, 1, 0)
+    ((table, (item,)),) = loads["update"]
+    assert table is Well.__table__
+    assert item["sample_id"] == 42
+    assert item["sample_type"] == "monitoring_well"
+    assert item["top_screen"] == 8.0
+    # empty gINT fields do not clear stored values
+    assert "spacer_depths" not in item
+    assert len(loads["bulk_load"]) == 2
+
+
+def test_import_gint_without_facility(app, csv_project, loads, monkeypatch):
+    """Test a project with no matching facility loads only its logs"""
+    monkeypatch.setattr(gint_import, "_facility_id", lambda project: None)
+    (report,) = gint_import.import_gint([csv_project])
+    assert report == ("Plant A", None, 2, 0, 0, 3)
+    assert [call[0] for call in loads["bulk_load"]] == [
+        Boring.__table__,
+        Lithology.__table__,
+    ]
+    assert loads["invalidate"] == []
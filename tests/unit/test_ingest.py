@@ -0,0 +1,212 @@
+"""
+This file (test_ingest.py) contains the unit tests for the ingest.py file.
+"""
+
+from types import SimpleNamespace
+
+import pandas as pd
+from app import ingest
+from app.ingest import (
+    _iter_chunks,
+    _load_columns,
+    _merge_sql,
+    _update_sql,
+    _write_csv,
+)
+from app.models import SampleResult, StorageTank
+
+
+def test_load_columns_skip_serial_and_audit():
+    """Test the COPY column list leaves out the serial key and audit stamps"""
+    names = [column.name for column in _load_columns(SampleResult.__table__)]
+    assert "result_id" not in names
+    assert "created_on" not in names
+    assert "updated_on" not in names
+    assert names[:3] == ["lab_id", "facility_id", "sample_id"]
+
+
+def test_iter_chunks_dataframe():
+    """Test a DataFrame is split into chunks of at most chunksize rows"""
+    df = pd.DataFrame({"lab_id": [str(i) for i in range(5)]})
+    chunks = list(_iter_chunks(df, 2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+def test_iter_chunks_mixed_iterable():
+    """Test an iterable of DataFrames and row mappings is rechunked"""
+    rows = [{"lab_id": "a"}, {"lab_id": "b"}, pd.DataFrame({"lab_id": ["c"]})]
+    chunks = list(_iter_chunks(iter(rows), 2))
+    assert [list(chunk["lab_id"]) for chunk in chunks] == [["a", "b"], ["c"]]
+
+
+def test_write_csv_integer_columns():
+    """Test integer columns are written without a decimal when NaN is present"""
+    columns = _load_columns(SampleResult.__table__)
+    chunk = pd.DataFrame(
+        {"lab_id": ["L1", "L2"], "sample_id": [12, None], "param_cd": ["00400"] * 2}
+    )
+    lines = _write_csv(chunk, columns).read().splitlines()
+    assert lines[0].startswith("0,L1,,12,00400,")
+    assert lines[1].startswith("1,L2,,,00400,")
+
+
+def test_write_csv_row_numbers_continue():
+    """Test row numbers continue from the start offset of the chunk"""
+    columns = _load_columns(SampleResult.__table__)
+    chunk = pd.DataFrame({"lab_id": ["L3", "L4"]})
+    lines = _write_csv(chunk, columns, start=10).read().splitlines()
+    assert [line.split(",")[0] for line in lines] == ["10", "11"]
+
+
+def test_merge_sql_reports_each_row():
+    """Test the batch upsert returns every staged row's key and outcome"""
+    table = StorageTank.__table__
+    columns = [table.c.facility_id, table.c.tank_registration_id, table.c.capacity]
+    sql = _merge_sql(table, "staging", columns, ["tank_registration_id", "facility_id"])
+    assert "ON CONFLICT (tank_registration_id, facility_id) DO UPDATE" in sql
+    assert "RETURNING storage_tank.tank_id" in sql
+    assert "coalesce(u.tank_id, t.tank_id)" in sql
+    assert "FROM staging s LEFT JOIN upserted u" in sql
+
+
+def test_update_sql_only_writes_changed_rows():
+    """Test the batch update sets the staged columns of changed rows only"""
+    table = StorageTank.__table__
+    sql = _update_sql(table, "staging", [table.c.tank_id, table.c.capacity])
+    assert sql.startswith("UPDATE storage_tank t SET capacity = s.capacity")
+    assert "updated_on = now()" in sql
+    assert "(t.capacity) IS DISTINCT FROM (s.capacity)" in sql
+    assert sql.endswith("RETURNING s.row_number")
+
+
+class _Cursor(object):
+    """Records the statements of a bulk load in place of psycopg2."""
+
+    def __init__(self, rows=()):
+        self.statements = []
+        self.copied = []
+        self.rows = list(rows)
+        self.rowcount = 2
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, data):
+        self.statements.append(sql)
+        self.copied.append(data.read())
+
+    def fetchall(self):
+        return self.rows
+
+
+class _Connection(object):
+    def __init__(self, rows=()):
+        self.cursor_ = _Cursor(rows)
+        self.committed = False
+
+    def cursor(self):
+        return self.cursor_
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+RESULTS = pd.DataFrame(
+    {
+        "lab_id": ["L1", "L1", "L2"],
+        "facility_id": [3, 3, 3],
+        "sample_id": [10, 10, 11],
+        "param_cd": ["01002", "00940", "01002"],
+    }
+)
+
+
+def _bulk_load(monkeypatch, rows=(), **kwargs):
+    """Run bulk_load of RESULTS into sample_result against a _Connection."""
+    connection = _Connection(rows)
+    engine = SimpleNamespace(raw_connection=lambda: connection)
+    monkeypatch.setattr(type(ingest.db), "engine", engine)
+    report = ingest.bulk_load(
+        SampleResult.__table__,
+        RESULTS,
+        conflict=("lab_id", "sample_id", "param_cd"),
+        chunksize=2,
+        **kwargs,
+    )
+    return connection, report
+
+
+def test_bulk_load_stages_with_copy(monkeypatch):
+    """Test rows are copied in chunks into a staging table, then merged"""
+    connection, report = _bulk_load(monkeypatch)
+    names = ", ".join(column.name for column in _load_columns(SampleResult.__table__))
+    create, alter, first, second, merge = connection.cursor_.statements
+    assert create == (
+        "CREATE TEMP TABLE sample_result_staging ON COMMIT DROP AS "
+        f"SELECT {names} FROM sample_result WITH NO DATA"
+    )
+    assert alter == "ALTER TABLE sample_result_staging ADD COLUMN row_number BIGINT"
+    assert (
+        first
+        == second
+        == (
+            f"COPY sample_result_staging (row_number, {names}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+    )
+    copied = [data.splitlines() for data in connection.cursor_.copied]
+    assert [[line.split(",")[0] for line in lines] for lines in copied] == [
+        ["0", "1"],
+        ["2"],
+    ]
+    assert merge == (
+        f"INSERT INTO sample_result ({names}, created_on) "
+        f"SELECT {names}, now() FROM sample_result_staging "
+        "ON CONFLICT (lab_id, sample_id, param_cd) DO NOTHING"
+    )
+    assert connection.committed
+    assert (report.inserted, report.skipped, report.rejected) == (2, 1, None)
+
+
+def test_bulk_load_reports_touched_groups(monkeypatch):
+    """Test validation runs on the staged rows and inserted groups are counted"""
+    calls = []
+
+    def validator(cursor, staging):
+        calls.append(staging)
+        return pd.DataFrame({"row_number": [2]})
+
+    connection, report = _bulk_load(
+        monkeypatch,
+        rows=[(10, "01002", 1), (10, "00940", 1)],
+        validator=validator,
+        touched=("sample_id", "param_cd"),
+    )
+    assert calls == ["sample_result_staging"]
+    merge = connection.cursor_.statements[-1]
+    assert merge.startswith("WITH inserted AS (INSERT INTO sample_result (")
+    assert merge.endswith(
+        "ON CONFLICT (lab_id, sample_id, param_cd) DO NOTHING "
+        "RETURNING sample_id, param_cd) "
+        "SELECT sample_id, param_cd, count(*) FROM inserted "
+        "GROUP BY sample_id, param_cd"
+    )
+    assert (report.inserted, report.skipped, len(report.rejected)) == (2, 0, 1)
+    assert sorted(report.touched) == [(10, "00940"), (10, "01002")]
+
+
+def test_bulk_load_replace_without_touched(monkeypatch):
+    """Test groups are replaced without RETURNING when nothing is touched"""
+    connection, report = _bulk_load(monkeypatch, replace=("facility_id", "lab_id"))
+    delete, merge = connection.cursor_.statements[-2:]
+    assert delete.startswith("DELETE FROM sample_result t USING")
+    assert delete.endswith("t.facility_id = s.facility_id AND t.lab_id = s.lab_id")
+    assert merge.startswith("INSERT INTO sample_result")
+    assert connection.committed
+    assert (report.inserted, report.replaced, report.touched) == (2, 2, None)
@@ -0,0 +1,94 @@
+"""
+This file (test_loading.py) contains the unit tests for the loading.py file.
+"""
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+from app import db
+from app.loading import EAGER, eager_load
+from app.models import Facility, SampleResult, StorageTank, Well
+
+
+def _sql(query):
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+def test_eager_load_joins_facility():
+    """Test a listing loads each row's facility in the same query"""
+    sql = _sql(eager_load(Query(StorageTank), StorageTank))
+    assert "LEFT OUTER JOIN facility AS facility_1" in sql
+    assert "facility_1.name" in sql
+
+
+def test_eager_load_reuses_existing_join():
+    """Test a relationship the query already joins is not joined again"""
+    query = Query(StorageTank).outerjoin(StorageTank.facility)
+    sql = _sql(eager_load(query, StorageTank, joined=("facility",)))
+    assert sql.count("JOIN facility") == 1
+    assert "SELECT facility.created_on" in sql
+
+
+def test_eager_load_subclass_uses_base_options():
+    """Test a subclass listing gets the eager loads of its base class"""
+    assert "JOIN facility AS facility_1" in _sql(eager_load(Query(Well), Well))
+
+
+def test_sample_result_skips_reference_tables():
+    """Test sample results join samples and facilities but load no code tables"""
+    sql = _sql(eager_load(Query(SampleResult), SampleResult))
+    assert "JOIN sample_id AS sample_id_1" in sql
+    assert "JOIN facility AS facility_1" in sql
+    assert "sample_parameter" not in sql
+    assert "medium_code" not in sql
+    assert sorted(EAGER[SampleResult]) == ["facility", "sample"]
+
+
+def test_base_query_loads_subclass_columns():
+    """Test querying a base class selects the columns of its subclasses"""
+    sql = _sql(Query(StorageTank))
+    assert "storage_tank.tank_double_wall" in sql
+    assert "storage_tank.tank_type IN" not in sql
+
+
+class _QueryCounter(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        db.event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        db.event.remove(self.engine, "before_cursor_execute", self._count)
+
+
+def test_listing_query_count_is_constant(postgis_app, init_database):
+    """Test listing pages cost the same number of queries however many rows"""
+    test_client = postgis_app.test_client()
+    facility = Facility.query.first()
+    counts = []
+    for rows in (2, 10):
+        for i in range(rows):
+            db.session.add(
+                StorageTank(
+                    facility_id=facility.facility_id,
+                    tank_registration_id=f"T{rows}-{i}",
+                    tank_type="ust",
+                )
+            )
+        db.session.commit()
+        db.session.expunge_all()
+        with _QueryCounter(db.engine) as html:
+            assert test_client.get("/storage-tanks?per_page=100").status_code == 200
+        with _QueryCounter(db.engine) as api:
+            response = test_client.get("/api/v1/storage-tanks/?per_page=100")
+            assert response.status_code == 200
+        counts.append((html.count, api.count))
+        StorageTank.query.delete()
+        db.session.commit()
+
+    assert counts[0] == counts[1]
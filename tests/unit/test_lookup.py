@@ -0,0 +1,78 @@
+"""
+This file (test_lookup.py) contains the unit tests for the lookup.py file.
+"""
+
+from collections import namedtuple
+import pandas as pd
+from app.ingest import check_units
+from app.lookup import ReferenceCache, _Table, reference_cache
+
+Parameter = namedtuple("Parameter", ["param_cd", "srsname", "parameter_unit"])
+
+_PARAMETERS = [
+    Parameter("00400", "pH", "std units"),
+    Parameter("01002", "Arsenic", "ug/L"),
+    Parameter("99999", "Unknown", None),
+]
+
+
+def _cache(version=0):
+    cache = ReferenceCache()
+    cache._tables["sample_parameter"] = _Table(_PARAMETERS, "param_cd", version)
+    return cache
+
+
+def test_reference_cache_hits(test_client):
+    """Test cached codes are served from memory and counted as hits"""
+    cache = _cache()
+    assert cache.parameter("01002").srsname == "Arsenic"
+    assert cache.parameter("00400").parameter_unit == "std units"
+    assert cache.hits == 2
+    assert cache.misses == 0
+    assert cache.loads == 0
+
+
+def test_reference_cache_invalidate(test_client):
+    """Test invalidating bumps the version and drops the cached tables"""
+    cache = _cache()
+    cache.invalidate()
+    assert cache.version == 1
+    assert cache.stats()["rows"] == {}
+
+
+def test_reference_cache_units(test_client):
+    """Test parameters are indexed by their USGS unit"""
+    cache = _cache()
+    assert cache.parameters_with_unit("ug/L") == ["01002"]
+
+
+def test_unit_mismatches(test_client):
+    """Test the in-memory unit check follows the check_unit() trigger"""
+    cache = _cache()
+    data = pd.DataFrame(
+        {
+            "param_cd": ["00400", "01002", "01002", "99999", "12345"],
+            "analysis_unit": ["std units", "mg/L", None, "mg/L", "mg/L"],
+        }
+    )
+    assert list(cache.unit_mismatches(data)) == [False, True, False, False, False]
+
+
+def test_check_units_row_numbers(test_client, monkeypatch):
+    """Test rejected rows are reported by their position in the input"""
+    monkeypatch.setitem(
+        reference_cache._tables,
+        "sample_parameter",
+        _Table(_PARAMETERS, "param_cd", reference_cache.version),
+    )
+    data = pd.DataFrame(
+        {
+            "lab_id": ["L1", "L2", "L3"],
+            "param_cd": ["01002", "00400", "01002"],
+            "analysis_unit": ["ug/L", "std units", "mg/L"],
+        }
+    )
+    rejected = check_units(data, chunksize=2)
+    assert list(rejected["row_number"]) == [2]
+    assert list(rejected["lab_id"]) == ["L3"]
+    assert list(rejected["parameter_unit"]) == ["ug/L"]
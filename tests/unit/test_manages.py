@@ -0,0 +1,185 @@
+"""
+This file (test_manages.py) contains the unit tests for the external/manages.py
+file, run against a SQLite stand-in for a MANAGES 4.x database.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import pytest
+import external.manages
+from external.manages import (
+    AsyncManages,
+    Manages,
+    ManagesPool,
+    _read_config,
+    read_manages4,
+)
+
+
+@pytest.fixture(scope="module")
+def manages_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("manages") / "manages.db")
+    conxn = sqlite3.connect(path)
+    conxn.executescript("""
+        CREATE TABLE site (site_id INTEGER, name TEXT);
+        CREATE TABLE locations (site_id INTEGER, location_id TEXT);
+        CREATE TABLE site_parameters (
+            site_id INTEGER, storet_code TEXT, param_name TEXT, default_unit TEXT
+        );
+        CREATE TABLE sample_results (
+            site_id INTEGER, lab_id TEXT, location_id TEXT, sample_date TEXT,
+            storet_code TEXT, lt_measure TEXT, analysis_result REAL,
+            detection_limit REAL, RL REAL, flags TEXT
+        );
+        INSERT INTO site VALUES (1, 'Site A'), (2, 'Site B');
+        INSERT INTO locations VALUES (1, 'MW-1'), (2, 'MW-2');
+        INSERT INTO site_parameters VALUES
+            (1, '00400', 'pH', 'SU'), (2, '00400', 'pH', 'SU'),
+            (2, '01002', 'Arsenic', 'mg/L');
+        INSERT INTO sample_results VALUES
+            (1, 'L1', 'MW-1', '2018-03-01', '00400', NULL, 7.1, NULL, NULL, NULL),
+            (1, 'L2', 'MW-1', '2019-03-01', '00400', NULL, 7.3, NULL, NULL, NULL),
+            (2, 'L3', 'MW-2', '2018-06-01', '00400', NULL, 6.8, NULL, NULL, NULL),
+            (2, 'L4', 'MW-2', '2020-06-01', '01002', '<', 0.001, 0.001, 0.005, 'U'),
+            (2, 'L5', 'MW-2', NULL, '01002', NULL, 0.01, 0.001, 0.005, NULL);
+        """)
+    conxn.commit()
+    conxn.close()
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+def test_read_manages4_single_query(manages_db):
+    """Test all sites are read in one query with compact dtypes"""
+    data = read_manages4(manages_db)
+    assert sorted(data["lab_id"]) == ["L1", "L2", "L3", "L4", "L5"]
+    assert data["param_name"].dtype == "category"
+    assert data["default_unit"].dtype == "category"
+    assert data["analysis_result"].dtype == "float32"
+
+
+def test_read_manages4_parallel_chunks(manages_db):
+    """Test splitting by site and window reads every result exactly once"""
+    data = read_manages4(manages_db, window="365D", site_batch=1, workers=3)
+    assert sorted(data["lab_id"]) == ["L1", "L2", "L3", "L4", "L5"]
+    assert set(data["param_name"].cat.categories) == {"pH", "Arsenic"}
+
+
+def test_read_manages4_chunksize(manages_db):
+    """Test results are streamed as DataFrames of at most chunksize rows"""
+    chunks = list(read_manages4(manages_db, site=["Site B"], chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+
+
+def test_read_manages4_date_range(manages_db):
+    """Test start and end bound the sample dates read"""
+    data = read_manages4(
+        manages_db, start="2018-01-01", end="2019-01-01", window="QS", workers=2
+    )
+    assert sorted(data["lab_id"]) == ["L1", "L3"]
+
+
+def test_read_manages4_lab_ids(manages_db, monkeypatch):
+    """Test only the given lab reports are read, in batches of lab_ids"""
+    monkeypatch.setattr(external.manages, "_LAB_BATCH", 1)
+    data = read_manages4(manages_db, lab_id=["L2", "L4", "L5"])
+    assert sorted(data["lab_id"]) == ["L2", "L4", "L5"]
+    assert read_manages4(manages_db, lab_id=[]).empty
+
+
+def test_read_manages4_from_pool(manages_db):
+    """Test more workers than pooled connections share the pool"""
+    pool = ManagesPool(manages_db, size=2)
+    data = read_manages4(pool, window="QS", site_batch=1, workers=4)
+    assert sorted(data["lab_id"]) == ["L1", "L2", "L3", "L4", "L5"]
+    assert pool.opened <= 2
+    pool.close()
+    assert pool.opened == 0
+
+
+def test_pool_reuses_connections(manages_db):
+    """Test a released connection is handed out again"""
+    pool = ManagesPool(manages_db, size=1)
+    with pool.connection() as first:
+        with pool.connection() as nested:
+            assert nested is first
+    with pool.connection() as second:
+        assert second is first
+    assert pool.opened == 1
+
+
+def test_pool_reconnects_stale_connection(manages_db):
+    """Test a connection failing its health check is replaced"""
+    pool = ManagesPool(manages_db, size=1, ping_after=0)
+    with pool.connection() as stale:
+        pass
+    stale.close()
+    with pool.connection() as fresh:
+        assert fresh is not stale
+        assert fresh.execute("SELECT count(*) FROM site").fetchone() == (2,)
+    assert pool.opened == 1
+
+
+def test_pool_close_with_checked_out_connection(manages_db):
+    """Test a connection checked out when the pool closes is closed on release"""
+    pool = ManagesPool(manages_db, size=2)
+    idle, held = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert pool.opened == 1
+    pool.release(held)
+    assert pool.opened == 0
+    assert pool._idle.empty()
+    for conxn in (idle, held):
+        with pytest.raises(sqlite3.ProgrammingError):
+            conxn.execute("SELECT 1")
+
+
+def test_pool_checkout_per_thread(manages_db):
+    """Test concurrent threads never share a checked-out connection"""
+    pool = ManagesPool(manages_db, size=3)
+    held = []
+    barrier = threading.Barrier(3)
+
+    def work():
+        with pool.connection() as conxn:
+            held.append(conxn)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(conxn) for conxn in held}) == 3
+
+
+def test_read_config(tmp_path):
+    """Test connection arguments are read from a section of an ini file"""
+    path = tmp_path / "database.ini"
+    path.write_text("[manages]\ndsn = MANAGES\nuid = reader\n")
+    assert _read_config(str(path)) == {"dsn": "MANAGES", "uid": "reader"}
+    with pytest.raises(KeyError):
+        _read_config(str(path), section="other")
+
+
+def test_async_manages(manages_db):
+    """Test results are read through the executor and in chunks"""
+    manages = object.__new__(Manages)
+    manages._pool = ManagesPool(manages_db, size=2)
+    db = AsyncManages(manages)
+
+    async def read():
+        sites = await db.site_names()
+        chunks = [chunk async for chunk in db.iter_results(chunksize=2)]
+        return sites, chunks
+
+    # asyncio.run needs Python 3.7
+    loop = asyncio.new_event_loop()
+    try:
+        sites, chunks = loop.run_until_complete(read())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        loop.close()
+    assert sorted(sites.iloc[:, 0]) == ["Site A", "Site B"]
+    assert sum(len(chunk) for chunk in chunks) == 5
@@ -0,0 +1,131 @@
+"""
+This file (test_manages_sync.py) contains the unit tests for the
+manages_sync.py file.
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+import external.manages
+from app import manages_sync
+from app.ingest import LoadReport
+from app.manages_sync import lab_checksums, to_sample_results
+
+
+def _manages_results():
+    return pd.DataFrame(
+        {
+            "lab_id": ["L1", "L1", "L2"],
+            "location_id": ["MW-1", "MW-2", "MW-9"],
+            "sample_date": pd.to_datetime(["2019-03-01", "2019-03-02", "2019-04-01"]),
+            "storet_code": ["400", "1002", "99999"],
+            "param_name": ["pH", "Arsenic", "Arsenic"],
+            "lt_measure": [None, "<", None],
+            "analysis_result": pd.Series([7.1, 0.001, 0.02], dtype="float32"),
+            "detection_limit": pd.Series([None, 0.001, 0.001], dtype="float32"),
+            "RL": pd.Series([None, 0.005, 0.005], dtype="float32"),
+            "flags": [None, "U", None],
+            "default_unit": ["SU", "mg/L", "mg/L"],
+        }
+    )
+
+
+def test_lab_checksums_ignore_row_order():
+    """Test a lab report's checksum does not depend on the row order"""
+    data = _manages_results()
+    checksums = lab_checksums(data)
+    reordered = lab_checksums(data.iloc[::-1].reset_index(drop=True))
+    assert checksums["checksum"].equals(reordered["checksum"])
+    assert list(checksums["result_count"]) == [2, 1]
+    assert checksums.loc["L1", "max_sample_date"] == pd.Timestamp("2019-03-02")
+
+
+def test_lab_checksums_detect_changes():
+    """Test a corrected result changes the checksum of its lab report only"""
+    data = _manages_results()
+    before = lab_checksums(data)
+    data.loc[1, "analysis_result"] = 0.002
+    after = lab_checksums(data)
+    assert before.loc["L1", "checksum"] != after.loc["L1", "checksum"]
+    assert before.loc["L2", "checksum"] == after.loc["L2", "checksum"]
+
+
+def test_to_sample_results_mapping():
+    """Test storet codes, parameter names and locations are mapped"""
+    results, unmapped = to_sample_results(
+        _manages_results(),
+        facility_id=3,
+        sample_ids={"MW-1": 10, "MW-2": 11},
+        codes={"00400"},
+        names={"arsenic": "01002"},
+    )
+    assert list(unmapped) == [False, False, True]
+    assert list(results["param_cd"]) == ["00400", "01002"]
+    assert list(results["sample_id"]) == [10, 11]
+    assert list(results["analysis_flag"].fillna("")) == ["", "<"]
+    assert (results["facility_id"] == 3).all()
+
+
+def test_sync_site_replaces_whole_lab_reports(monkeypatch):
+    """Test changed reports are re-read in full and retried when rejected"""
+    stored = _manages_results()
+    # L1 was sampled across the start of the incremental read
+    stored["sample_date"] = pd.to_datetime(["2019-03-01", "2019-03-05", "2019-04-01"])
+    stored.loc[2, "location_id"] = "MW-1"
+    reads = []
+
+    def read_manages4(connect, site, start=None, lab_id=None, **options):
+        reads.append((start, lab_id, options))
+        data = stored
+        if start is not None:
+            data = data[data["sample_date"] >= pd.Timestamp(start)]
+        if lab_id is not None:
+            data = data[data["lab_id"].isin(lab_id)]
+        return data.reset_index(drop=True)
+
+    loads, recorded = [], []
+
+    def bulk_load(data, replace=None):
+        loads.append(data)
+        rejected = pd.DataFrame({"lab_id": ["L2"], "reason": ["unit"]})
+        return LoadReport(len(data) - 1, 0, rejected, None, 0)
+
+    monkeypatch.setattr(external.manages, "read_manages4", read_manages4)
+    monkeypatch.setattr(manages_sync, "_facility_id", lambda site: 3)
+    monkeypatch.setattr(
+        manages_sync, "_high_water_mark", lambda site: date(2019, 3, 10)
+    )
+    monkeypatch.setattr(manages_sync, "_changed", lambda site, checksums: checksums)
+    monkeypatch.setattr(
+        manages_sync, "_sample_ids", lambda facility_id: {"MW-1": 10, "MW-2": 11}
+    )
+    monkeypatch.setattr(
+        manages_sync,
+        "_parameter_codes",
+        lambda: ({"00400"}, {"arsenic": "01002"}),
+    )
+    monkeypatch.setattr(manages_sync.SampleResult, "bulk_load", bulk_load)
+    monkeypatch.setattr(
+        manages_sync,
+        "_record_sync",
+        lambda site, facility_id, complete: recorded.append(complete),
+    )
+
+    report = manages_sync._sync_site(
+        None, "Site A", False, timedelta(days=7), window="365D"
+    )
+
+    window_read, full_read = reads
+    assert window_read == (date(2019, 3, 3), None, {"window": "365D"})
+    assert full_read == (None, ["L1", "L2"], {})
+    (results,) = loads
+    assert results["sample_date"].tolist() == [
+        date(2019, 3, 1),
+        date(2019, 3, 5),
+        date(2019, 4, 1),
+    ]
+    # L2 had a rejected result, so only L1 is recorded as synced
+    (complete,) = recorded
+    assert complete.index.tolist() == ["L1"]
+    assert complete.loc["L1", "result_count"] == 2
+    assert report == ("Site A", 2, 2, 1, 2, 0)
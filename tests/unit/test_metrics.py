@@ -0,0 +1,63 @@
+"""
+This file (test_metrics.py) contains the unit tests for the metrics.py file.
+"""
+
+import logging
+from flask_sqlalchemy import _DebugQueryTuple
+from app.metrics import Histogram, Metrics, log_slow_queries
+
+
+def test_histogram_cumulative_buckets():
+    """Test histogram buckets count every observation at or below their bound"""
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+    assert histogram.sum == 3.65
+
+
+def test_exposition_format():
+    """Test metrics are written in the Prometheus text format"""
+    metrics = Metrics()
+    metrics.observe("api.get_wells", "GET", 200, 0.02, queries=3, query_seconds=0.01)
+    text = metrics.exposition()
+    assert "# TYPE envirobase_request_duration_seconds histogram" in text
+    assert (
+        'envirobase_requests_total{endpoint="api.get_wells",method="GET",status="200"} 1'
+        in text
+    )
+    assert (
+        'envirobase_request_duration_seconds_bucket{endpoint="api.get_wells",'
+        'method="GET",le="0.025"} 1' in text
+    )
+    assert 'envirobase_db_queries_bucket{endpoint="api.get_wells",le="2"} 0' in text
+    assert 'envirobase_db_queries_bucket{endpoint="api.get_wells",le="5"} 1' in text
+    assert text.endswith("\n")
+
+
+def test_log_slow_queries(test_client, caplog):
+    """Test only queries at or over the threshold are logged, with their context"""
+    queries = [
+        _DebugQueryTuple(("SELECT 1", {}, 0.0, 0.1, "views.py:10 (fast)")),
+        _DebugQueryTuple(("SELECT 2", {"x": 1}, 0.0, 0.7, "views.py:20 (slow)")),
+    ]
+    with caplog.at_level(logging.WARNING):
+        assert log_slow_queries(queries, 0.5, "main.wells") == 1
+    assert "SELECT 2" in caplog.text
+    assert "views.py:20 (slow)" in caplog.text
+    assert "main.wells" in caplog.text
+    assert "SELECT 1" not in caplog.text
+
+
+def test_metrics_endpoint(test_client):
+    """Test requests are counted on /metrics and timed in debug mode"""
+    response = test_client.get("/")
+    assert response.status_code == 200
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert 'envirobase_requests_total{endpoint="main.index",method="GET"' in text
@@ -2,6 +2,8 @@
 This file (test_models.py) contains the unit tests for the models.py file.
 """
 
+import pytest
+
 
 def test_new_facility(new_facility):
     """Test Facility model when a new Facility is created"""
@@ -12,3 +14,130 @@ def test_new_facility(new_facility):
     assert new_facility.zipcode == "12345"
     assert new_facility.longitude == -80.0
     assert new_facility.latitude == 40.0
+
+
+def test_sample_result_non_detect():
+    """Test SampleResult.non_detect from the flag and the detection limit"""
+    from app.models import SampleResult
+
+    assert SampleResult(analysis_flag="<").non_detect
+    assert SampleResult(analysis_result=0.1, detection_limit=0.5).non_detect
+    assert SampleResult(detection_limit=0.5).non_detect
+    assert not SampleResult(analysis_result=1.0, detection_limit=0.5).non_detect
+    assert not SampleResult(analysis_result=1.0).non_detect
+
+
+def test_summary_query_skips_results_without_keys(app):
+    """Test results lacking a well or parameter are left out of the summary"""
+    from sqlalchemy.dialects import postgresql
+    from app.models import SampleResult
+
+    query = SampleResult._summary_query([(10, "01002")])
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    assert (
+        "WHERE sample_result.sample_id IS NOT NULL "
+        "AND sample_result.param_cd IS NOT NULL "
+        "AND (sample_result.sample_id, sample_result.param_cd) IN"
+    ) in sql
+    assert sql.endswith("GROUP BY sample_result.sample_id, sample_result.param_cd")
+
+
+def _update_geometries(app, monkeypatch, **kwargs):
+    from types import SimpleNamespace
+    from sqlalchemy.dialects import postgresql
+    from app import db
+    from app.models import Facility
+
+    statements = []
+
+    def execute(statement):
+        statements.append(statement)
+        return SimpleNamespace(rowcount=3)
+
+    monkeypatch.setattr(db.session, "execute", execute)
+    monkeypatch.setattr(db.session, "commit", lambda: None)
+    assert Facility.update_geometries(**kwargs) == 3
+    (statement,) = statements
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_update_geometries(app, monkeypatch):
+    """Test stale geometries are rewritten and unlocated rows only cleared"""
+    sql = _update_geometries(app, monkeypatch)
+    assert sql.startswith(
+        "UPDATE facility SET geometry=ST_SetSRID(ST_MakePoint(facility.longitude, "
+        "facility.latitude), %(ST_SetSRID_1)s) WHERE "
+    )
+    assert (
+        "facility.longitude IS NOT NULL AND facility.latitude IS NOT NULL AND "
+        "(ST_X(facility.geometry) IS DISTINCT FROM facility.longitude OR "
+        "ST_Y(facility.geometry) IS DISTINCT FROM facility.latitude)"
+    ) in sql
+    # a row missing a coordinate keeps matching only while it has a geometry
+    assert (
+        "NOT (facility.longitude IS NOT NULL AND facility.latitude IS NOT NULL) "
+        "AND facility.geometry IS NOT NULL"
+    ) in sql
+
+
+def test_update_geometries_full(app, monkeypatch):
+    """Test a full update rewrites every row"""
+    sql = _update_geometries(app, monkeypatch, incremental=False)
+    assert "WHERE" not in sql
+
+
+@pytest.fixture
+def summaries(app):
+    """A sample_result_summary table holding rows for wells 10 and 11."""
+    from app import db
+    from app.models import SampleResultSummary
+
+    SampleResultSummary.__table__.create(db.engine)
+    db.session.add_all(
+        SampleResultSummary(
+            sample_id=sample_id, param_cd="01002", result_count=1, non_detect_count=0
+        )
+        for sample_id in (10, 11)
+    )
+    db.session.commit()
+    yield SampleResultSummary.query
+    db.session.remove()
+    SampleResultSummary.__table__.drop(db.engine)
+
+
+def _refresh_summary(monkeypatch, keys):
+    from sqlalchemy.dialects import postgresql
+    from app import db
+    from app.models import SampleResult
+
+    statements = []
+
+    def execute(statement, *args, **kwargs):
+        statements.append(str(statement.compile(dialect=postgresql.dialect())))
+
+    # the recomputed rows are read with PostgreSQL aggregates, so the INSERT
+    # is recorded rather than run
+    monkeypatch.setattr(db.session, "execute", execute)
+    SampleResult.refresh_summary(keys)
+    return statements
+
+
+def test_refresh_summary_replaces_keys(summaries, monkeypatch):
+    """Test the summary rows of the given keys are deleted and recomputed"""
+    (insert,) = _refresh_summary(monkeypatch, [(10, "01002")])
+    assert [row.sample_id for row in summaries] == [11]
+    assert insert.startswith(
+        "INSERT INTO sample_result_summary (sample_id, param_cd, facility_id, "
+    )
+    assert "SELECT sample_result.sample_id, sample_result.param_cd" in insert
+    assert "(sample_result.sample_id, sample_result.param_cd) IN" in insert
+    assert insert.endswith("GROUP BY sample_result.sample_id, sample_result.param_cd")
+
+
+def test_refresh_summary_all_and_none(summaries, monkeypatch):
+    """Test no keys refresh nothing and None rebuilds every row"""
+    assert _refresh_summary(monkeypatch, []) == []
+    assert summaries.count() == 2
+    (insert,) = _refresh_summary(monkeypatch, None)
+    assert summaries.count() == 0
+    assert ") IN" not in insert
@@ -0,0 +1,108 @@
+"""
+This file (test_pagination.py) contains the unit tests for the pagination.py
+file.
+"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from werkzeug.exceptions import BadRequest
+from app import db
+from app.models import Facility, SampleResult, TrendResult
+from app.pagination import KeysetPagination, filter_query, paginate
+
+
+@pytest.fixture(scope="module")
+def trends(app):
+    """Five trend_result rows keyed 1 to 5, in facilities 1 and 2."""
+    TrendResult.__table__.create(db.engine)
+    db.session.add_all(
+        TrendResult(
+            trend_id=trend_id,
+            run_id="run",
+            facility_id=1 + trend_id % 2,
+            result_count=1,
+            detect_count=1,
+        )
+        for trend_id in range(1, 6)
+    )
+    db.session.commit()
+    yield TrendResult.query
+    db.session.remove()
+    TrendResult.__table__.drop(db.engine)
+
+
+def _ids(pagination):
+    return [item.trend_id for item in pagination.items]
+
+
+def test_keyset_pages_forward(trends):
+    """Test pages seek past the cursor and know whether more follow"""
+    first = KeysetPagination(trends, TrendResult.trend_id, 2)
+    assert (_ids(first), first.has_prev, first.has_next) == ([1, 2], False, True)
+    assert first.next_cursor == 2
+    assert first.prev_cursor is None
+
+    last = KeysetPagination(trends, TrendResult.trend_id, 2, after=4)
+    assert (_ids(last), last.has_prev, last.has_next) == ([5], True, False)
+    assert last.next_cursor is None
+    assert last.prev_cursor == 5
+
+
+def test_keyset_pages_backward(trends):
+    """Test pages before a cursor come back in key order"""
+    page = KeysetPagination(trends, TrendResult.trend_id, 2, before=5)
+    assert (_ids(page), page.has_prev, page.has_next) == ([3, 4], True, True)
+    first = KeysetPagination(trends, TrendResult.trend_id, 2, before=3)
+    assert (_ids(first), first.has_prev) == ([1, 2], False)
+    empty = KeysetPagination(trends, TrendResult.trend_id, 2, before=1)
+    assert _ids(empty) == []
+    assert empty.next_cursor is None and empty.prev_cursor is None
+
+
+def test_paginate_arguments(app, trends):
+    """Test the cursor, per_page and filters come from the request"""
+    with app.test_request_context("/?after=1&per_page=2&facility_id=1"):
+        page = paginate(trends, TrendResult.trend_id, TrendResult)
+    assert _ids(page) == [2, 4]
+    with app.test_request_context("/?facility_id=1"):
+        page = paginate(trends, TrendResult.trend_id)
+    assert _ids(page) == [1, 2, 3, 4, 5]
+
+
+def test_paginate_caps_per_page(app, trends, monkeypatch):
+    """Test per_page falls back to the default and is capped"""
+    monkeypatch.setitem(app.config, "ENVIROBASE_PER_PAGE", 3)
+    monkeypatch.setitem(app.config, "ENVIROBASE_MAX_PER_PAGE", 4)
+    for query, count in [("per_page=0", 3), ("per_page=100", 4), ("", 3)]:
+        with app.test_request_context(f"/?{query}"):
+            assert len(paginate(trends, TrendResult.trend_id).items) == count
+
+
+@pytest.mark.parametrize("query", ["after=x", "per_page=many", "facility_id=one"])
+def test_paginate_invalid_arguments(app, trends, query):
+    """Test arguments that cannot be parsed are rejected with 400"""
+    with app.test_request_context(f"/?{query}"):
+        with pytest.raises(BadRequest):
+            paginate(trends, TrendResult.trend_id, TrendResult)
+
+
+def test_filter_query(app):
+    """Test the facility, parameter and date filters of a results query"""
+    url = "/?facility_id=3&param_cd=01002&param_cd=00400&start=2020-01-01"
+    with app.test_request_context(url + "&end=2020-12-31"):
+        query = filter_query(SampleResult.query, SampleResult)
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    assert "sample_result.facility_id = %(facility_id_1)s" in sql
+    assert "sample_result.param_cd IN (%(param_cd_1)s, %(param_cd_2)s)" in sql
+    assert "sample_result.sample_date >= %(sample_date_1)s" in sql
+    assert "sample_result.sample_date <= %(sample_date_2)s" in sql
+
+
+def test_filter_query_only_known_columns(app):
+    """Test filters on columns a model does not have are ignored"""
+    with app.test_request_context("/?facility_id=3&param_cd=01002&start=2020-01-01"):
+        query = filter_query(Facility.query, Facility)
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    assert "facility.facility_id = %(facility_id_1)s" in sql
+    assert "param_cd" not in sql
+    assert "sample_date" not in sql
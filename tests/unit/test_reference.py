@@ -0,0 +1,63 @@
+"""
+This file (test_reference.py) contains the unit tests for the reference.py file.
+"""
+
+import gzip
+import pandas as pd
+import pytest
+from app import reference
+from app.ingest import _load_columns, _upsert_sql
+from app.models import SampleParameter
+from app.reference import read_snapshot, save_snapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Test a snapshot keeps leading zeros and is recorded in the manifest"""
+    df = pd.DataFrame({"medium_cd": ["WG", "WS"], "medium_name": ["Groundwater", None]})
+    entry = save_snapshot("medium_code", df, str(tmp_path), version="2020-01-01")
+    assert entry["rows"] == 2
+    assert entry["version"] == "2020-01-01"
+
+    params = pd.DataFrame({"param_cd": ["00400", "01002"]})
+    save_snapshot("sample_parameter", params, str(tmp_path))
+    assert list(read_snapshot("sample_parameter", str(tmp_path))["param_cd"]) == [
+        "00400",
+        "01002",
+    ]
+    assert read_snapshot("medium_code", str(tmp_path))["medium_name"].isna()[1]
+
+
+def test_snapshot_checksum_mismatch(tmp_path):
+    """Test a snapshot edited after it was recorded is refused"""
+    save_snapshot("medium_code", pd.DataFrame({"medium_cd": ["WG"]}), str(tmp_path))
+    with gzip.open(tmp_path / "medium_code.csv.gz", "wt") as f:
+        f.write("medium_cd\nWS\n")
+    with pytest.raises(ValueError):
+        read_snapshot("medium_code", str(tmp_path))
+
+
+def test_missing_snapshot(tmp_path):
+    """Test a missing snapshot names the command that creates it"""
+    with pytest.raises(FileNotFoundError, match="reference-snapshot"):
+        read_snapshot("sample_parameter", str(tmp_path))
+
+
+def test_load_without_snapshot_fails(app, tmp_path, monkeypatch):
+    """Test a table without a snapshot is an error, not fetched from USGS"""
+
+    def fetch(table):
+        raise AssertionError("fetched from USGS")
+
+    monkeypatch.setattr(reference, "fetch", fetch)
+    with pytest.raises(FileNotFoundError, match="reference-snapshot"):
+        reference.load("medium_code", str(tmp_path))
+
+
+def test_upsert_sql_skips_unchanged_rows():
+    """Test the upsert only updates rows that differ from the stored ones"""
+    table = SampleParameter.__table__
+    sql = _upsert_sql(table, "staging", _load_columns(table), ["param_cd"])
+    assert "ON CONFLICT (param_cd) DO UPDATE" in sql
+    assert "param_cd = EXCLUDED.param_cd" not in sql
+    assert "IS DISTINCT FROM" in sql
+    assert "updated_on = now()" in sql
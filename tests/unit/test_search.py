@@ -0,0 +1,70 @@
+"""
+This file (test_search.py) contains the unit tests for the search.py file.
+"""
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from app.ingest import _load_columns
+from app.models import Facility, _search_triggers
+from app.search import match, rank
+
+
+def _sql(clause):
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_match_uses_indexed_operators():
+    """Test the search filter uses operators the GIN indexes serve"""
+    sql = _sql(match("parameters", "arsenic"))
+    assert "sample_parameter.srsname ILIKE %(srsname_1)s" in sql
+    assert "(sample_parameter.srsname %% %(srsname_2)s)" in sql
+    assert sql.count(" %% ") == 3
+    assert "sample_parameter.search_vector @@ plainto_tsquery" in sql
+
+
+def test_match_runs_on_postgresql_95():
+    """Test only pg_trgm operators of PostgreSQL 9.5 are used"""
+    for kind in ("parameters", "mediums", "facilities"):
+        sql = _sql(match(kind, "arsenic")) + _sql(rank(kind, "arsenic"))
+        assert "<%" not in sql
+        assert "word_similarity" not in sql
+
+
+def test_rank_combines_similarity_and_text_rank():
+    """Test results are ranked by trigram similarity plus full text rank"""
+    sql = _sql(rank("facilities", "cardinal"))
+    assert "greatest(coalesce(similarity(facility.name" in sql
+    assert "ts_rank(facility.search_vector" in sql
+
+
+def test_search_vector_set_by_trigger():
+    """Test search vectors are plain columns kept up to date by a trigger"""
+    table = Facility.__table__
+    assert "GENERATED" not in str(
+        CreateTable(table).compile(dialect=postgresql.dialect())
+    )
+    assert "search_vector" not in [column.name for column in _load_columns(table)]
+    function, trigger = _search_triggers(table)
+    assert "NEW.search_vector := (SELECT to_tsvector('simple'" in function
+    assert "FROM (SELECT NEW.*) AS new_row" in function
+    assert trigger.startswith(
+        "CREATE TRIGGER facility_search_vector_update BEFORE INSERT OR UPDATE"
+    )
+    assert trigger.endswith("EXECUTE PROCEDURE facility_search_vector_update()")
+
+
+def test_search_endpoint_short_term(test_client):
+    """Test terms too short for typeahead return no results"""
+    response = test_client.get("/api/v1/search?q=a")
+    assert response.status_code == 200
+    assert response.get_json()["results"] == {
+        "parameters": [],
+        "mediums": [],
+        "facilities": [],
+    }
+
+
+def test_search_endpoint_unknown_type(test_client):
+    """Test an unknown search type is rejected"""
+    response = test_client.get("/api/v1/search?q=arsenic&type=wells")
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+"""
+This file (test_spatial.py) contains the unit tests for the spatial.py file.
+"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from werkzeug.exceptions import BadRequest
+from app.models import Well
+from app.spatial import _degrees, spatial_filter
+
+
+def _filtered(app, url):
+    with app.test_request_context(url):
+        query = spatial_filter(Well.query, Well.geometry)
+    compiled = query.statement.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+def test_no_spatial_filter(app):
+    """Test a request without spatial arguments is left unfiltered"""
+    sql, _ = _filtered(app, "/?bbox=&near=")
+    assert "ST_" not in sql.split("WHERE")[1]
+
+
+def test_bbox_filter(app):
+    """Test bbox keeps rows intersecting the envelope"""
+    sql, params = _filtered(app, "/?bbox=-81.5,39,-80,40.5")
+    assert (
+        "ST_Intersects(sample_id.geometry, ST_MakeEnvelope(%(ST_MakeEnvelope_1)s, "
+        "%(ST_MakeEnvelope_2)s, %(ST_MakeEnvelope_3)s, %(ST_MakeEnvelope_4)s, "
+        "%(ST_MakeEnvelope_5)s))"
+    ) in sql
+    assert [params[f"ST_MakeEnvelope_{i}"] for i in range(1, 6)] == [
+        -81.5,
+        39.0,
+        -80.0,
+        40.5,
+        4326,
+    ]
+
+
+def test_radius_filter(app):
+    """Test near/radius narrows by box, then measures on the spheroid"""
+    sql, params = _filtered(app, "/?near=-80.5,40&radius=2.5")
+    assert "sample_id.geometry && ST_Expand(ST_SetSRID(ST_MakePoint(" in sql
+    assert (
+        "ST_DWithin(CAST(sample_id.geometry AS geography(GEOMETRY,4326)), "
+        "CAST(ST_SetSRID(ST_MakePoint("
+    ) in sql
+    assert params["ST_DWithin_1"] == 2500.0
+    assert params["ST_Expand_1"] == pytest.approx(_degrees(2500.0, 40))
+
+
+def test_degrees_cover_radius():
+    """Test the box around a point widens with latitude"""
+    assert _degrees(110574.0, 0) == pytest.approx(1.0)
+    assert _degrees(110574.0, 60) == pytest.approx(2.0)
+    assert _degrees(110574.0, 90) == pytest.approx(100.0)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "bbox=-81,39,-80",
+        "bbox=west,39,-80,40",
+        "near=-80.5",
+        "near=-80.5,40",
+        "near=-80.5,40&radius=0",
+        "near=-80.5,40&radius=far",
+    ],
+)
+def test_invalid_spatial_arguments(app, query):
+    """Test a malformed bbox, point or radius is rejected with 400"""
+    with app.test_request_context(f"/?{query}"):
+        with pytest.raises(BadRequest):
+            spatial_filter(Well.query, Well.geometry)
+
+
+@pytest.mark.parametrize("query", ["bbox=1,2,3", "near=-80.5,40&radius=-1"])
+def test_wells_invalid_spatial_arguments(app, query):
+    """Test the wells collection answers a bad bbox or radius with 400"""
+    response = app.test_client().get(f"/api/v1/wells/?{query}")
+    assert response.status_code == 400
@@ -0,0 +1,134 @@
+"""
+This file (test_stats.py) contains the unit tests for the stats.py file.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from app import stats
+
+pytest.importorskip("scipy")
+
+
+def _series(values, years=None, **columns):
+    years = range(len(values)) if years is None else years
+    return pd.DataFrame(
+        {
+            "sample_id": 1,
+            "param_cd": "01002",
+            "sample_date": [pd.Timestamp(2000 + year, 1, 1) for year in years],
+            "analysis_result": values,
+            **columns,
+        }
+    )
+
+
+def test_censored_values_match_non_detect():
+    """Test censoring follows SampleResult.non_detect and takes the limit"""
+    values, censored = stats.censored_values(
+        [1.0, np.nan, 5.0, 0.2, 4.0],
+        ["", "", "<", "", ""],
+        [0.5, 0.5, np.nan, np.nan, 2.0],
+        [1.0, 1.0, 5.0, np.nan, np.nan],
+    )
+    assert censored.tolist() == [False, True, True, False, False]
+    assert values.tolist() == [1.0, 0.5, 5.0, 0.2, 4.0]
+
+
+def test_kaplan_meier_uncensored_is_sample_mean():
+    """Test Kaplan-Meier without censoring gives the sample mean and sd"""
+    values = np.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0])
+    mean, sd = stats.kaplan_meier(
+        values, np.zeros(8, dtype=bool), stats.Groups(np.zeros(8))
+    )
+    assert mean[0] == pytest.approx(values.mean())
+    assert sd[0] == pytest.approx(values.std(ddof=1))
+
+
+def test_kaplan_meier_censored_groups():
+    """Test Kaplan-Meier means of left-censored groups in one call"""
+    values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 2.0, 2.0])
+    censored = np.array([True, False, True, False, False, True, True])
+    groups = stats.Groups(np.array(["a", "a", "a", "a", "a", "b", "b"]))
+    mean, sd = stats.kaplan_meier(values, censored, groups)
+    # F(5) = 1, F(4) = 4/5, F(2) = 4/5 * 3/4 = 3/5, the rest is put on 2
+    assert mean[0] == pytest.approx(5 * 0.2 + 4 * 0.2 + 2 * 0.6)
+    assert np.isnan(mean[1]) and np.isnan(sd[1])
+
+
+def test_mann_kendall_and_sen_slope():
+    """Test a steady rise is a significant trend of its slope per year"""
+    data = _series([2.0 * year for year in range(10)])
+    summary = stats.summarize(data)
+    row = summary.loc[(1, "01002")]
+    assert row["mk_s"] == 45
+    assert row["mk_z"] == pytest.approx(44 / np.sqrt(125))
+    assert row["mk_p"] < 0.001
+    assert row["sen_slope"] == pytest.approx(2.0, rel=0.01)
+
+
+def test_mann_kendall_ties_and_non_detects():
+    """Test non-detects are tied below the detects in the trend test"""
+    data = _series([4.0, 1.0, 2.0, 3.0, 5.0], detection_limit=[5.0, 5.0, 1.0, 1.0, 1.0])
+    groups = stats.Groups(data["sample_id"])
+    values, censored = stats.censored_values(
+        data["analysis_result"], None, data["detection_limit"]
+    )
+    s, variance, _, _ = stats.mann_kendall(
+        data["sample_date"], values, censored, groups
+    )
+    assert s[0] == 9
+    assert variance[0] == pytest.approx((5 * 4 * 15 - 2 * 1 * 9) / 18)
+
+
+def test_prediction_limit():
+    """Test the prediction limit uses the Bonferroni adjusted t quantile"""
+    scipy_stats = pytest.importorskip("scipy.stats")
+    limit = stats.prediction_limit(np.array([10.0]), np.array([2.0]), [8], k=2)
+    t = scipy_stats.t.ppf(1 - 0.05 / 2, 7)
+    assert limit[0] == pytest.approx(10 + t * 2 * np.sqrt(1 + 1 / 8))
+    assert np.isnan(stats.prediction_limit([1.0], [0.0], [1])[0])
+
+
+def test_undated_results_are_dropped():
+    """Test a result without a date is left out of the trend statistics"""
+    data = _series([2.0 * year for year in range(10)])
+    undated = _series([100.0], years=[0])
+    undated["sample_date"] = pd.NaT
+    row = stats.summarize(pd.concat([data, undated])).loc[(1, "01002")]
+    assert row["n"] == 11
+    assert row["mk_s"] == 45
+    assert row["sen_slope"] == pytest.approx(2.0, rel=0.01)
+
+
+def test_large_groups_match_blocks(monkeypatch):
+    """Test groups too big for a block get the same trend statistics"""
+    rng = np.random.default_rng(2)
+    data = pd.concat(
+        [
+            _series(rng.lognormal(size=size), param_cd=param)
+            for size, param in ((3, "00940"), (12, "01002"))
+        ],
+        ignore_index=True,
+    )
+    # two results of the large group share a date
+    data.loc[4, "sample_date"] = data.loc[3, "sample_date"]
+    blocked = stats.summarize(data)
+    monkeypatch.setattr(stats, "_MAX_WIDTH", 4)
+    pd.testing.assert_frame_equal(blocked, stats.summarize(data))
+
+
+def test_summarize_in_processes(monkeypatch):
+    """Test groups spread across processes give the same statistics"""
+    monkeypatch.setattr(stats, "_MIN_PARALLEL_ROWS", 0)
+    rng = np.random.default_rng(1)
+    data = pd.concat(
+        [
+            _series(rng.lognormal(size=12), sample_id=well, param_cd=param)
+            for well in range(6)
+            for param in ("01002", "00940")
+        ]
+    )
+    serial = stats.summarize(data)
+    assert len(serial) == 12
+    pd.testing.assert_frame_equal(serial, stats.summarize(data, workers=2))
@@ -0,0 +1,152 @@
+"""
+This file (test_store.py) contains the unit tests for the store.py file.
+"""
+
+import datetime
+import os
+import pytest
+from sqlalchemy.dialects import postgresql
+from app import export, store
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _table(rows, changed_on=None):
+    """A table of store COLUMNS from (result_id, sample_id, param_cd, date),
+    changed on day result_id of 2021 unless `changed_on` is given."""
+    columns = {name: [None] * len(rows) for name, _ in store.COLUMNS}
+    for index, (result_id, sample_id, param_cd, sample_date) in enumerate(rows):
+        columns["result_id"][index] = result_id
+        columns["sample_id"][index] = sample_id
+        columns["param_cd"][index] = param_cd
+        columns["sample_date"][index] = sample_date
+        columns["analysis_result"][index] = float(result_id)
+        columns["non_detect"][index] = False
+        columns["changed_on"][index] = changed_on or datetime.datetime(
+            2021, 1, result_id
+        )
+    arrow_schema = export.schema(store.COLUMNS)
+    return pa.table(
+        {
+            name: pa.array(values, arrow_schema.field(name).type)
+            for name, values in columns.items()
+        },
+        schema=arrow_schema,
+    )
+
+
+def test_save_and_load_snapshot(tmp_path):
+    """Test a snapshot is stamped, sorted into series and read back mapped"""
+    day = datetime.date(2020, 1, 1)
+    table = _table(
+        [(3, 11, "00940", day), (1, 10, "01002", day), (2, 10, "00940", day)]
+    )
+    saved = store._save(7, table, str(tmp_path))
+    assert saved.facility_id == 7
+    assert saved.watermark == datetime.datetime(2021, 1, 3)
+    assert saved.table["result_id"].to_pylist() == [2, 1, 3]
+
+    allocated = pa.total_allocated_bytes()
+    snapshot = store.load(7, str(tmp_path))
+    assert pa.total_allocated_bytes() == allocated
+    assert snapshot.table.equals(saved.table)
+    assert len(snapshot) == 3
+
+
+def test_watermark_keeps_microseconds(tmp_path):
+    """Test the watermark is stored in a format strptime reads back exactly"""
+    changed_on = datetime.datetime(2021, 3, 4, 5, 6, 7, 89)
+    day = datetime.date(2020, 1, 1)
+    saved = store._save(7, _table([(1, 10, "01002", day)], changed_on), str(tmp_path))
+    assert saved.table.schema.metadata[b"watermark"] == b"2021-03-04T05:06:07.000089"
+    assert store.load(7, str(tmp_path)).watermark == changed_on
+
+
+def test_load_missing_snapshot(tmp_path):
+    """Test a facility without a snapshot raises FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        store.load(1, str(tmp_path))
+
+
+def test_snapshot_query_joins_metadata(app):
+    """Test snapshots read screen depths and parameter metadata in one query"""
+    sql = str(
+        store._query(7, since=datetime.datetime(2021, 1, 1)).statement.compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "sample_id.top_screen" in sql
+    assert "LEFT OUTER JOIN sample_parameter" in sql
+    assert "sample_result.facility_id = %(facility_id_1)s" in sql
+    assert "coalesce(sample_result.updated_on, sample_result.created_on) >=" in sql
+    assert "sample_type IN" not in sql
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """A stored snapshot of three results, current to 2021-01-03."""
+    day = datetime.date(2020, 1, 1)
+    rows = [(1, 10, "01002", day), (2, 10, "01002", day), (3, 11, "00940", day)]
+    return store._save(7, _table(rows), str(tmp_path))
+
+
+def _refresh(monkeypatch, snapshot, changed, count):
+    reads, builds = [], []
+
+    def read(facility_id, since=None, batch_size=None):
+        reads.append(since)
+        return changed
+
+    def build(facility_id, directory=None, batch_size=None):
+        builds.append(facility_id)
+
+    monkeypatch.setattr(store, "_read", read)
+    monkeypatch.setattr(store, "build", build)
+    monkeypatch.setattr(store, "_count", lambda facility_id: count)
+    return store.refresh(7, os.path.dirname(snapshot.path)), reads, builds
+
+
+def test_refresh_merges_changed_rows(monkeypatch, snapshot):
+    """Test rows changed since the watermark replace their stored copies"""
+    day = datetime.date(2020, 1, 1)
+    updated = datetime.datetime(2021, 2, 1)
+    changed = _table([(2, 10, "01002", day), (5, 11, "00940", day)], updated)
+    refreshed, reads, builds = _refresh(monkeypatch, snapshot, changed, 4)
+    assert reads == [datetime.datetime(2021, 1, 3)]
+    assert builds == []
+    assert refreshed.watermark == updated
+    assert refreshed.table["result_id"].to_pylist() == [1, 2, 3, 5]
+    assert refreshed.table["changed_on"].to_pylist()[1] == updated
+
+
+def test_refresh_skips_rows_seen_at_the_watermark(monkeypatch, snapshot):
+    """Test a snapshot with nothing new is returned without rewriting it"""
+    day = datetime.date(2020, 1, 1)
+    changed = _table([(3, 11, "00940", day)])
+    refreshed, _, builds = _refresh(monkeypatch, snapshot, changed, 3)
+    assert builds == []
+    assert refreshed.created == snapshot.created
+    assert len(refreshed) == 3
+
+
+def test_refresh_rebuilds_after_deletes(monkeypatch, snapshot):
+    """Test a snapshot is rebuilt when rows were deleted from the database"""
+    _, _, builds = _refresh(monkeypatch, snapshot, _table([]), 2)
+    assert builds == [7]
+
+
+def test_count_reads_through_the_snapshot_query(monkeypatch):
+    """Test rows are counted through the query a snapshot is read with"""
+    calls = []
+
+    class Query(object):
+        def count(self):
+            return 4
+
+    def filtered(facility=None):
+        calls.append(facility)
+        return Query()
+
+    monkeypatch.setattr(store.SampleResult, "filtered", filtered)
+    assert store._count(7) == 4
+    assert calls == [7]
@@ -0,0 +1,33 @@
+"""
+This file (test_tiles.py) contains the unit tests for the api/tiles.py file.
+"""
+
+from app.api.tiles import TileCache, tile_envelope
+
+
+def test_tile_envelope_world():
+    """Test tile 0/0/0 covers the whole web mercator world"""
+    xmin, ymin, xmax, ymax = tile_envelope(0, 0, 0)
+    assert xmin == -ymax
+    assert ymin == -xmax
+    assert round(xmax) == 20037508
+
+
+def test_tile_envelope_quadrant():
+    """Test tile 1/1/1 is the south-east quadrant"""
+    xmin, ymin, xmax, ymax = tile_envelope(1, 1, 1)
+    assert xmin == 0.0
+    assert ymax == 0.0
+    assert xmax > 0 and ymin < 0
+
+
+def test_tile_cache_invalidate(test_client):
+    """Test invalidating a table moves its layers to a new generation"""
+    cache = TileCache()
+    counter, _ = cache.generation("facilities")
+    cache.set(("facilities", counter, 0, 0, 0), (b"tile", "etag"))
+    cache.invalidate("storage_tank")
+    assert cache.generation("facilities")[0] == counter
+    cache.invalidate("facility")
+    assert cache.generation("facilities")[0] == counter + 1
+    assert cache.get(("facilities", counter + 1, 0, 0, 0)) is None
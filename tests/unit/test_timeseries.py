@@ -0,0 +1,85 @@
+"""
+This file (test_timeseries.py) contains the unit tests for the timeseries API
+and SampleResult.timeseries.
+"""
+
+import datetime
+import pandas as pd
+import pytest
+from sqlalchemy.dialects import postgresql
+from app import models
+from app.models import SampleResult
+
+
+@pytest.fixture
+def read_sql(monkeypatch):
+    """Records the statements timeseries reads and returns two results."""
+    statements = []
+
+    def read_sql(statement, engine, parse_dates=None):
+        statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return pd.DataFrame(
+            {
+                "facility_id": [1, 1],
+                "sample_id": [10, 10],
+                "sample_name": ["MW-1", "MW-1"],
+                "param_cd": ["01002", "01002"],
+                "sample_date": pd.to_datetime(["2020-01-01", "2020-04-01"]),
+                "analysis_result": [1.5, None],
+            }
+        )
+
+    monkeypatch.setattr(models.pd, "read_sql", read_sql)
+    return statements
+
+
+def test_timeseries_filters_in_sql(app, read_sql):
+    """Test the filters and ordering of the tidy time series"""
+    df = SampleResult.timeseries(
+        facility=1, wells=[10], params=["01002"], start=datetime.date(2020, 1, 1)
+    )
+    (sql,) = read_sql
+    assert "sample_result.facility_id = %(facility_id_1)s" in sql
+    assert "sample_result.sample_id IN" in sql
+    assert "sample_result.sample_date >= %(sample_date_1)s" in sql
+    assert "GROUP BY" not in sql
+    assert sql.endswith(
+        "ORDER BY sample_result.sample_id, sample_result.param_cd, "
+        "sample_result.sample_date"
+    )
+    assert len(df) == 2
+
+
+def test_timeseries_aggregates_by_period(app, read_sql):
+    """Test results are averaged per period in the database"""
+    SampleResult.timeseries(facility=1, freq="quarter")
+    (sql,) = read_sql
+    assert "date_trunc(%(date_trunc_1)s, sample_result.sample_date)" in sql
+    assert "avg(sample_result.analysis_result) AS analysis_result" in sql
+    assert "GROUP BY" in sql
+
+
+def test_timeseries_wide(app, read_sql):
+    """Test the wide frame has a column per well and parameter"""
+    df = SampleResult.timeseries(facility=1, wide=True)
+    assert list(df.columns) == [("MW-1", "01002")]
+
+
+def test_timeseries_endpoint(app, read_sql):
+    """Test the endpoint returns columns of JSON values"""
+    response = app.test_client().get("/api/v1/timeseries?facility_id=1&sample_id=10")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["sample_date"] == ["2020-01-01", "2020-04-01"]
+    assert data["analysis_result"] == [1.5, None]
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["facility_id=abc", "sample_id=x", "start=2020-13-01", "end=soon", "freq=hour"],
+)
+def test_timeseries_endpoint_invalid_arguments(app, read_sql, query):
+    """Test arguments that cannot be parsed are rejected before any query"""
+    response = app.test_client().get(f"/api/v1/timeseries?{query}")
+    assert response.status_code == 400
+    assert read_sql == []
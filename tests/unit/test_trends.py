@@ -0,0 +1,84 @@
+"""
+This file (test_trends.py) contains the unit tests for the trends.py file.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.dialects import postgresql
+from app import trends
+from app.models import TrendResult
+
+pytest.importorskip("scipy")
+
+
+def _sql(query):
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+def test_series_reads_monitoring_wells(app):
+    """Test a facility's series are read from its monitoring wells only"""
+    sql = _sql(trends._series_query(3))
+    assert "sample_result.facility_id = %(facility_id_1)s" in sql
+    assert "sample_id.sample_type IN (%(sample_type_1)s)" in sql
+
+
+def test_analyze_rows_fit_trend_result():
+    """Test a facility's statistics come back as trend_result rows"""
+    dates = pd.date_range("2015-01-01", periods=8, freq="QS")
+    data = pd.DataFrame(
+        {
+            "sample_id": np.repeat([1, 2], 8),
+            "param_cd": "01002",
+            "sample_date": np.tile(dates, 2),
+            "analysis_result": np.r_[np.arange(8.0), np.full(8, 3.0)],
+            "analysis_flag": None,
+            "detection_limit": np.r_[np.full(8, np.nan), np.full(8, 5.0)],
+            "reporting_limit": np.nan,
+        }
+    )
+    facility_id, rows = trends.analyze(4, data)
+    assert facility_id == 4
+    columns = set(TrendResult.__table__.columns.keys())
+    assert set(rows.columns) <= columns
+    assert rows["facility_id"].tolist() == [4, 4]
+    assert rows["detect_count"].tolist() == [8, 0]
+    assert rows["first_sample_date"].tolist() == [dates[0].date()] * 2
+    assert rows.loc[0, "mk_p"] < 0.05
+    assert np.isnan(rows.loc[1, "km_mean"])
+
+
+def test_analyze_trends_writes_each_facility(app, monkeypatch):
+    """Test each facility's trends are written under the run and reported"""
+    dates = pd.date_range("2015-01-01", periods=6, freq="QS")
+    data = pd.DataFrame(
+        {
+            "sample_id": 1,
+            "param_cd": "01002",
+            "sample_date": dates,
+            "analysis_result": np.arange(6.0),
+            "analysis_flag": None,
+            "detection_limit": np.nan,
+            "reporting_limit": np.nan,
+        }
+    )
+    monkeypatch.setattr(
+        trends, "series", lambda facility_id: data if facility_id == 1 else data[:0]
+    )
+    loads = []
+
+    def bulk_load(table, rows, **kwargs):
+        loads.append((table, rows.copy(), kwargs))
+
+    monkeypatch.setattr(trends.ingest, "bulk_load", bulk_load)
+    reports = list(trends.analyze_trends("run-1", [1, 2], workers=1))
+
+    assert sorted(reports) == [(1, 1, 6), (2, 0, 0)]
+    ((table, rows, kwargs),) = loads
+    assert table is TrendResult.__table__
+    assert kwargs["conflict"] == ("run_id", "sample_id", "param_cd")
+    assert kwargs["replace"] == ("run_id", "facility_id")
+    assert set(rows.columns) <= set(table.columns.keys())
+    assert rows["run_id"].tolist() == ["run-1"]
+    assert rows["result_count"].tolist() == [6]
+    assert rows["computed_on"].notna().all()